@@ -0,0 +1,104 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import db
+from collections import deque
+import json
+import threading
+import time
+
+# Events kept in memory for streams to catch up from. A stream that falls
+# further behind than this gets a reset event and reloads instead, so memory
+# stays bounded however many dashboards are connected.
+BUFFER_SIZE = 1000
+
+# Stream settings, overridable through the ADMIN_EVENTS_* app config keys
+DEFAULT_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+DEFAULT_MAX_STREAM = 300  # seconds before a stream is closed, the browser reconnects with Last-Event-ID
+RECONNECT_DELAY = 3000  # milliseconds, sent to the browser as the SSE retry field
+
+_buffer = deque(maxlen=BUFFER_SIZE)  # (event id, kind, JSON data)
+_condition = threading.Condition()
+_last_id = 0
+_streams = 0
+
+
+def publish_admin_event(kind, data):
+    """Queue an event for the admin dashboards in the caller's transaction; it is sent once that commits"""
+    db.session.info.setdefault('admin_events', []).append((kind, data))
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_after_commit(session):
+    events = session.info.pop('admin_events', None)
+    if not events:
+        return
+    global _last_id
+    with _condition:
+        for kind, data in events:
+            _last_id += 1
+            _buffer.append((_last_id, kind, json.dumps(data)))
+        _condition.notify_all()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_rolled_back_events(session):
+    session.info.pop('admin_events', None)
+
+
+def read_admin_events(after_id, timeout):
+    """Wait up to timeout for events newer than after_id.
+
+    Returns (events, reset_id): events is a list of (event id, kind, JSON
+    data), and reset_id is set instead when the events after after_id are no
+    longer buffered (or after_id is from before a restart), in which case the
+    reader has to reload and carry on from reset_id.
+    """
+    with _condition:
+        if after_id == _last_id:
+            _condition.wait(timeout)
+        if after_id > _last_id or (_buffer and _buffer[0][0] > after_id + 1):
+            return [], _last_id
+        return [item for item in _buffer if item[0] > after_id], None
+
+
+def _sse(event_id, kind, data):
+    return f'id: {event_id}\nevent: {kind}\ndata: {data}\n\n'
+
+
+def stream_admin_events(last_event_id, heartbeat=DEFAULT_HEARTBEAT, max_seconds=DEFAULT_MAX_STREAM):
+    """Server-sent event stream of admin events after last_event_id (or from now), ending after max_seconds.
+
+    The stream never touches the database, so it holds no connection while
+    it waits.
+    """
+    global _streams
+    with _condition:
+        cursor = _last_id if last_event_id is None else last_event_id
+        _streams += 1
+    try:
+        yield f'retry: {RECONNECT_DELAY}\n\n'
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            events, reset_id = read_admin_events(cursor, min(heartbeat, max(0, deadline - time.monotonic())))
+            if reset_id is not None:
+                cursor = reset_id
+                yield _sse(cursor, 'reset', '{}')
+            elif events:
+                cursor = events[-1][0]
+                yield ''.join(_sse(*item) for item in events)
+            else:
+                yield ': keep-alive\n\n'
+    finally:
+        with _condition:
+            _streams -= 1
+
+
+def get_admin_event_stats():
+    """Get the event bus position, buffer fill and number of open streams in this process"""
+    with _condition:
+        return {
+            'last_event_id': _last_id,
+            'buffered': len(_buffer),
+            'buffer_size': BUFFER_SIZE,
+            'streams': _streams
+        }
@@ -0,0 +1,976 @@
+from src.routes.static_assets import build_in_memory_asset
+
+# Admin login and dashboard pages. The styles and scripts are served as
+# separate content-hashed resources under /api/admin/assets/ so browsers
+# cache them for good and only revalidate the small HTML shell.
+
+LOGIN_STYLES = """
+* { margin: 0; padding: 0; box-sizing: border-box; }
+body { 
+    font-family: "Segoe UI", Tahoma, Geneva, Verdana, sans-serif;
+    background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%);
+    min-height: 100vh;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    color: #fff;
+}
+.login-container {
+    background: rgba(255, 255, 255, 0.1);
+    backdrop-filter: blur(10px);
+    border-radius: 20px;
+    padding: 40px;
+    width: 400px;
+    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
+    border: 1px solid rgba(255, 255, 255, 0.2);
+}
+.logo {
+    text-align: center;
+    margin-bottom: 30px;
+}
+.logo h1 {
+    color: #FFD700;
+    font-size: 2.5rem;
+    margin-bottom: 10px;
+}
+.logo p {
+    color: #ccc;
+    font-size: 1.1rem;
+}
+.form-group {
+    margin-bottom: 20px;
+}
+.form-group label {
+    display: block;
+    margin-bottom: 8px;
+    color: #fff;
+    font-weight: 500;
+}
+.form-group input {
+    width: 100%;
+    padding: 12px 16px;
+    border: 1px solid rgba(255, 255, 255, 0.3);
+    border-radius: 10px;
+    background: rgba(255, 255, 255, 0.1);
+    color: #fff;
+    font-size: 16px;
+    transition: all 0.3s ease;
+}
+.form-group input:focus {
+    outline: none;
+    border-color: #FFD700;
+    box-shadow: 0 0 0 2px rgba(255, 215, 0, 0.2);
+}
+.form-group input::placeholder {
+    color: #aaa;
+}
+.login-btn {
+    width: 100%;
+    padding: 14px;
+    background: linear-gradient(135deg, #FFD700 0%, #FFA500 100%);
+    color: #000;
+    border: none;
+    border-radius: 10px;
+    font-size: 16px;
+    font-weight: 600;
+    cursor: pointer;
+    transition: all 0.3s ease;
+    margin-top: 10px;
+}
+.login-btn:hover {
+    transform: translateY(-2px);
+    box-shadow: 0 8px 25px rgba(255, 215, 0, 0.3);
+}
+.error {
+    color: #ff6b6b;
+    text-align: center;
+    margin-top: 15px;
+    padding: 10px;
+    background: rgba(255, 107, 107, 0.1);
+    border-radius: 8px;
+    border: 1px solid rgba(255, 107, 107, 0.3);
+}
+"""
+
+LOGIN_SCRIPT = """
+document.getElementById("loginForm").addEventListener("submit", async (e) => {
+    e.preventDefault();
+    const username = document.getElementById("username").value;
+    const password = document.getElementById("password").value;
+    const errorDiv = document.getElementById("error");
+
+    try {
+        const response = await fetch("/api/admin/login", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ username, password }),
+            credentials: "include"
+        });
+
+        const data = await response.json();
+
+        if (response.ok) {
+            window.location.href = "/api/admin/dashboard";
+        } else {
+            errorDiv.textContent = data.error;
+            errorDiv.style.display = "block";
+        }
+    } catch (error) {
+        errorDiv.textContent = "حدث خطأ في الاتصال";
+        errorDiv.style.display = "block";
+    }
+});
+"""
+
+LOGIN_TEMPLATE = """
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>لوحة تحكم المدير - GoldEarn</title>
+    <link rel="stylesheet" href="{styles_url}">
+</head>
+<body>
+    <div class="login-container">
+        <div class="logo">
+            <h1>GoldEarn</h1>
+            <p>لوحة تحكم المدير</p>
+        </div>
+        <form id="loginForm">
+            <div class="form-group">
+                <label for="username">اسم المستخدم</label>
+                <input type="text" id="username" name="username" placeholder="أدخل اسم المستخدم" required>
+            </div>
+            <div class="form-group">
+                <label for="password">كلمة المرور</label>
+                <input type="password" id="password" name="password" placeholder="أدخل كلمة المرور" required>
+            </div>
+            <button type="submit" class="login-btn">تسجيل الدخول</button>
+            <div id="error" class="error" style="display: none;"></div>
+        </form>
+    </div>
+
+    <script src="{script_url}"></script>
+</body>
+</html>
+"""
+
+DASHBOARD_STYLES = """
+* { margin: 0; padding: 0; box-sizing: border-box; }
+body { 
+    font-family: "Segoe UI", Tahoma, Geneva, Verdana, sans-serif;
+    background: #f5f5f5;
+    color: #333;
+}
+.header {
+    background: linear-gradient(135deg, #1a1a1a 0%, #2d2d2d 100%);
+    color: #fff;
+    padding: 20px;
+    box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+}
+.header h1 {
+    color: #FFD700;
+    display: inline-block;
+}
+.logout-btn {
+    float: left;
+    background: #ff4757;
+    color: white;
+    border: none;
+    padding: 10px 20px;
+    border-radius: 5px;
+    cursor: pointer;
+    font-size: 14px;
+}
+.logout-btn:hover {
+    background: #ff3742;
+}
+.container {
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 20px;
+}
+.stats-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+    gap: 20px;
+    margin-bottom: 30px;
+}
+.stat-card {
+    background: white;
+    padding: 25px;
+    border-radius: 15px;
+    box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+    border-left: 5px solid #FFD700;
+    transition: transform 0.3s ease;
+}
+.stat-card:hover {
+    transform: translateY(-5px);
+}
+.stat-card h3 {
+    color: #666;
+    font-size: 14px;
+    margin-bottom: 10px;
+    text-transform: uppercase;
+    letter-spacing: 1px;
+}
+.stat-card .value {
+    font-size: 2.5rem;
+    font-weight: bold;
+    color: #2c3e50;
+    margin-bottom: 5px;
+}
+.stat-card .change {
+    font-size: 14px;
+    color: #27ae60;
+}
+.section {
+    background: white;
+    border-radius: 15px;
+    padding: 25px;
+    margin-bottom: 20px;
+    box-shadow: 0 4px 15px rgba(0,0,0,0.1);
+}
+.section h2 {
+    color: #2c3e50;
+    margin-bottom: 20px;
+    padding-bottom: 10px;
+    border-bottom: 2px solid #FFD700;
+}
+.tabs {
+    display: flex;
+    margin-bottom: 20px;
+    border-bottom: 1px solid #eee;
+}
+.tab {
+    padding: 12px 24px;
+    cursor: pointer;
+    border-bottom: 3px solid transparent;
+    transition: all 0.3s ease;
+    font-weight: 500;
+}
+.tab.active {
+    border-bottom-color: #FFD700;
+    color: #FFD700;
+}
+.tab:hover {
+    background: #f8f9fa;
+}
+.tab-content {
+    display: none;
+}
+.tab-content.active {
+    display: block;
+}
+.table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-top: 15px;
+}
+.table th, .table td {
+    padding: 12px;
+    text-align: right;
+    border-bottom: 1px solid #eee;
+}
+.table th {
+    background: #f8f9fa;
+    font-weight: 600;
+    color: #2c3e50;
+}
+.table tr:hover {
+    background: #f8f9fa;
+}
+.status {
+    padding: 4px 12px;
+    border-radius: 20px;
+    font-size: 12px;
+    font-weight: 500;
+}
+.status.pending {
+    background: #fff3cd;
+    color: #856404;
+}
+.status.completed {
+    background: #d4edda;
+    color: #155724;
+}
+.status.rejected {
+    background: #f8d7da;
+    color: #721c24;
+}
+.btn {
+    padding: 8px 16px;
+    border: none;
+    border-radius: 5px;
+    cursor: pointer;
+    font-size: 12px;
+    margin: 0 2px;
+    transition: all 0.3s ease;
+}
+.btn-approve {
+    background: #28a745;
+    color: white;
+}
+.btn-approve:hover {
+    background: #218838;
+}
+.btn-reject {
+    background: #dc3545;
+    color: white;
+}
+.btn-reject:hover {
+    background: #c82333;
+}
+.btn-view {
+    background: #007bff;
+    color: white;
+}
+.btn-view:hover {
+    background: #0056b3;
+}
+.filters {
+    margin-bottom: 15px;
+}
+.filters select {
+    padding: 8px;
+    border: 1px solid #ddd;
+    border-radius: 5px;
+    margin-left: 10px;
+}
+.load-more {
+    display: block;
+    margin: 15px auto 0;
+}
+.loading {
+    text-align: center;
+    padding: 40px;
+    color: #666;
+}
+.no-data {
+    text-align: center;
+    padding: 40px;
+    color: #999;
+}
+"""
+
+DASHBOARD_SCRIPT = """
+function showTab(tabId) {
+    document.querySelectorAll(".tab-content").forEach(content => {
+        content.classList.remove("active");
+    });
+    document.querySelectorAll(".tab").forEach(tab => {
+        tab.classList.remove("active");
+    });
+    document.getElementById(tabId).classList.add("active");
+    document.querySelector(`.tab[onclick="showTab('${tabId}')"]`).classList.add("active");
+
+    if (tabId === "users") {
+        fetchUsers();
+    } else if (tabId === "transactions") {
+        fetchTransactions();
+    } else if (tabId === "vip") {
+        fetchVIPPackages();
+    } else if (tabId === "reports") {
+        fetchReports();
+    } else if (tabId === "account_info") {
+        fetchAccountInfo();
+    }
+}
+
+function userStatusCell(isActive) {
+    return `<span class="status ${isActive ? "completed" : "rejected"}">${isActive ? "نشط" : "مجمد"}</span>`;
+}
+
+function userActionsCell(userId, isActive) {
+    return `
+        <button class="btn btn-view" onclick="viewUser(${userId})">عرض</button>
+        <button class="btn ${isActive ? "btn-reject" : "btn-approve"}" onclick="toggleUserStatus(${userId}, ${isActive})">${isActive ? "تجميد" : "تنشيط"}</button>
+    `;
+}
+
+function setUserStatus(userId, isActive) {
+    const row = document.getElementById(`user-${userId}`);
+    if (!row) return;
+    row.querySelector(".user-status").innerHTML = userStatusCell(isActive);
+    row.querySelector(".user-actions").innerHTML = userActionsCell(userId, isActive);
+}
+
+async function fetchUsers() {
+    const usersLoading = document.getElementById("usersLoading");
+    const usersContent = document.getElementById("usersContent");
+    const usersTable = document.getElementById("usersTable");
+
+    usersLoading.style.display = "block";
+    usersContent.style.display = "none";
+    usersTable.innerHTML = "";
+
+    try {
+        const response = await fetch("/api/admin/users");
+        const users = await response.json();
+
+        if (users.length > 0) {
+            users.forEach(user => {
+                const row = usersTable.insertRow();
+                row.id = `user-${user.id}`;
+                row.innerHTML = `
+                    <td>${user.phone_number}</td>
+                    <td>${user.vip_level}</td>
+                    <td>${user.balance.toFixed(2)} EGP</td>
+                    <td>${new Date(user.registration_date).toLocaleDateString("ar-EG")}</td>
+                    <td class="user-status">${userStatusCell(user.is_active)}</td>
+                    <td class="user-actions">${userActionsCell(user.id, user.is_active)}</td>
+                `;
+            });
+            usersContent.style.display = "block";
+        } else {
+            usersTable.innerHTML = '<tr><td colspan="6" class="no-data">لا يوجد مستخدمون لعرضهم.</td></tr>';
+            usersContent.style.display = "block";
+        }
+    } catch (error) {
+        console.error("Error fetching users:", error);
+        usersTable.innerHTML = '<tr><td colspan="6" class="no-data">حدث خطأ أثناء تحميل المستخدمين.</td></tr>';
+        usersContent.style.display = "block";
+    } finally {
+        usersLoading.style.display = "none";
+    }
+}
+
+async function toggleUserStatus(userId, currentStatus) {
+    const action = currentStatus ? "freeze" : "unfreeze";
+    try {
+        const response = await fetch("/api/admin/users/toggle_status", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ user_id: userId, action: action }),
+            credentials: "include"
+        });
+        const data = await response.json();
+        if (response.ok) {
+            alert(data.message);
+            setUserStatus(userId, !currentStatus);
+        } else {
+            alert(data.error);
+        }
+    } catch (error) {
+        console.error("Error toggling user status:", error);
+        alert("حدث خطأ أثناء تغيير حالة المستخدم.");
+    }
+}
+
+async function viewUser(userId) {
+    alert(`عرض تفاصيل المستخدم رقم: ${userId}`);
+    // Implement detailed user view logic here
+}
+
+const transactionTypeLabels = {
+    topup: "إيداع",
+    withdrawal: "سحب",
+    task_reward: "مكافأة مهمة",
+    referral_commission: "عمولة إحالة",
+    vip_subscription: "اشتراك VIP"
+};
+let transactionsCursor = null;
+
+function transactionStatusCell(status) {
+    const label = status === "completed" ? "مكتمل" : status === "pending" ? "قيد الانتظار" : "مرفوض";
+    return `<span class="status ${status}">${label}</span>`;
+}
+
+function renderTransactionRow(t, prepend = false) {
+    const row = document.getElementById("transactionsTable").insertRow(prepend ? 0 : -1);
+    row.id = `transaction-${t.id}`;
+    row.innerHTML = `
+        <td>${t.id}</td>
+        <td>${t.user_id}</td>
+        <td>${transactionTypeLabels[t.type] || t.type}</td>
+        <td>${t.amount.toFixed(2)} EGP</td>
+        <td class="transaction-status">${transactionStatusCell(t.status)}</td>
+        <td>${new Date(t.created_at).toLocaleDateString("ar-EG")}</td>
+        <td class="transaction-actions">
+            ${t.status === "pending" ? `
+                <button class="btn btn-approve" onclick="approveTransaction(${t.id})">قبول</button>
+                <button class="btn btn-reject" onclick="rejectTransaction(${t.id})">رفض</button>
+            ` : ""}
+        </td>
+    `;
+}
+
+function setTransactionStatus(transactionId, status) {
+    const row = document.getElementById(`transaction-${transactionId}`);
+    if (!row) return;
+    row.querySelector(".transaction-status").innerHTML = transactionStatusCell(status);
+    row.querySelector(".transaction-actions").innerHTML = "";
+}
+
+async function fetchTransactions(loadMore = false) {
+    const transactionsLoading = document.getElementById("transactionsLoading");
+    const transactionsContent = document.getElementById("transactionsContent");
+    const transactionsTable = document.getElementById("transactionsTable");
+    const transactionsMore = document.getElementById("transactionsMore");
+
+    const params = new URLSearchParams({ limit: 50 });
+    const status = document.getElementById("transactionsStatus").value;
+    const type = document.getElementById("transactionsType").value;
+    if (status) params.set("status", status);
+    if (type) params.set("type", type);
+    if (loadMore && transactionsCursor) {
+        params.set("cursor", transactionsCursor);
+    } else {
+        transactionsCursor = null;
+        transactionsTable.innerHTML = "";
+        transactionsLoading.style.display = "block";
+        transactionsContent.style.display = "none";
+    }
+
+    try {
+        const response = await fetch(`/api/admin/transactions?${params}`);
+        const data = await response.json();
+
+        data.transactions.forEach(renderTransactionRow);
+        if (transactionsTable.rows.length === 0) {
+            transactionsTable.innerHTML = '<tr><td colspan="7" class="no-data">لا يوجد معاملات لعرضها.</td></tr>';
+        }
+        transactionsCursor = data.next_cursor;
+        transactionsMore.style.display = transactionsCursor ? "block" : "none";
+        transactionsContent.style.display = "block";
+    } catch (error) {
+        console.error("Error fetching transactions:", error);
+        transactionsTable.innerHTML = '<tr><td colspan="7" class="no-data">حدث خطأ أثناء تحميل المعاملات.</td></tr>';
+        transactionsContent.style.display = "block";
+    } finally {
+        transactionsLoading.style.display = "none";
+    }
+}
+
+async function approveTransaction(transactionId) {
+    try {
+        const response = await fetch("/api/admin/transactions/approve", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ transaction_id: transactionId }),
+            credentials: "include"
+        });
+        const data = await response.json();
+        if (response.ok) {
+            alert(data.message);
+            setTransactionStatus(transactionId, "completed");
+        } else {
+            alert(data.error);
+        }
+    } catch (error) {
+        console.error("Error approving transaction:", error);
+        alert("حدث خطأ أثناء قبول المعاملة.");
+    }
+}
+
+async function rejectTransaction(transactionId) {
+    try {
+        const response = await fetch("/api/admin/transactions/reject", {
+            method: "POST",
+            headers: {
+                "Content-Type": "application/json",
+            },
+            body: JSON.stringify({ transaction_id: transactionId }),
+            credentials: "include"
+        });
+        const data = await response.json();
+        if (response.ok) {
+            alert(data.message);
+            setTransactionStatus(transactionId, "rejected");
+        } else {
+            alert(data.error);
+        }
+    } catch (error) {
+        console.error("Error rejecting transaction:", error);
+        alert("حدث خطأ أثناء رفض المعاملة.");
+    }
+}
+
+async function fetchVIPPackages() {
+    const vipLoading = document.getElementById("vipLoading");
+    const vipContent = document.getElementById("vipContent");
+    const vipTable = document.getElementById("vipTable");
+
+    vipLoading.style.display = "block";
+    vipContent.style.display = "none";
+    vipTable.innerHTML = "";
+
+    try {
+        const response = await fetch("/api/admin/vip_packages");
+        const packages = await response.json();
+
+        if (packages.length > 0) {
+            packages.forEach(p => {
+                const row = vipTable.insertRow();
+                row.innerHTML = `
+                    <td>${p.level}</td>
+                    <td>${p.price.toFixed(2)} EGP</td>
+                    <td>${p.daily_earnings.toFixed(2)} EGP</td>
+                    <td>
+                        <button class="btn btn-view" onclick="editVIPPackage(${p.id})">تعديل</button>
+                    </td>
+                `;
+            });
+            vipContent.style.display = "block";
+        } else {
+            vipTable.innerHTML = '<tr><td colspan="4" class="no-data">لا توجد باقات VIP لعرضها.</td></tr>';
+            vipContent.style.display = "block";
+        }
+    } catch (error) {
+        console.error("Error fetching VIP packages:", error);
+        vipTable.innerHTML = '<tr><td colspan="4" class="no-data">حدث خطأ أثناء تحميل باقات VIP.</td></tr>';
+        vipContent.style.display = "block";
+    } finally {
+        vipLoading.style.display = "none";
+    }
+}
+
+async function editVIPPackage(packageId) {
+    alert(`تعديل باقة VIP رقم: ${packageId}`);
+    // Implement VIP package edit logic here
+}
+
+let reportTotals = null;
+
+function renderReports() {
+    document.getElementById("reportTotalUsers").textContent = reportTotals.total_users;
+    document.getElementById("reportActiveUsers").textContent = reportTotals.active_users;
+    document.getElementById("reportTotalDeposits").textContent = reportTotals.total_deposits.toFixed(2) + " EGP";
+    document.getElementById("reportTotalWithdrawals").textContent = reportTotals.total_withdrawals.toFixed(2) + " EGP";
+}
+
+async function fetchReports() {
+    const reportsLoading = document.getElementById("reportsLoading");
+    const reportsContent = document.getElementById("reportsContent");
+
+    reportsLoading.style.display = "block";
+    reportsContent.style.display = "none";
+
+    try {
+        const response = await fetch("/api/admin/reports");
+        reportTotals = await response.json();
+        renderReports();
+
+        reportsContent.style.display = "block";
+    } catch (error) {
+        console.error("Error fetching reports:", error);
+        reportsContent.innerHTML = '<p class="no-data">حدث خطأ أثناء تحميل التقارير.</p>';
+        reportsContent.style.display = "block";
+    } finally {
+        reportsLoading.style.display = "none";
+    }
+}
+
+async function fetchAccountInfo() {
+    const accountInfoLoading = document.getElementById("accountInfoLoading");
+    const accountInfoContent = document.getElementById("accountInfoContent");
+    const accountInfoTable = document.getElementById("accountInfoTable");
+
+    accountInfoLoading.style.display = "block";
+    accountInfoContent.style.display = "none";
+    accountInfoTable.innerHTML = "";
+
+    try {
+        const response = await fetch("/api/admin/account_info");
+        const accounts = await response.json();
+
+        if (accounts.length > 0) {
+            accounts.forEach(account => {
+                const row = accountInfoTable.insertRow();
+                row.innerHTML = `
+                    <td>${account.user_id}</td>
+                    <td>${account.phone_number}</td>
+                    <td>${account.balance.toFixed(2)} EGP</td>
+                    <td>${account.vip_level}</td>
+                    <td>${new Date(account.registration_date).toLocaleDateString("ar-EG")}</td>
+                    <td><span class="status ${account.is_active ? "completed" : "rejected"}">${account.is_active ? "نشط" : "مجمد"}</span></td>
+                    <td>${account.total_deposits.toFixed(2)} EGP</td>
+                    <td>${account.total_withdrawals.toFixed(2)} EGP</td>
+                    <td>${account.total_task_earnings.toFixed(2)} EGP</td>
+                    <td>${account.total_referral_earnings.toFixed(2)} EGP</td>
+                `;
+            });
+            accountInfoContent.style.display = "block";
+        } else {
+            accountInfoTable.innerHTML = '<tr><td colspan="10" class="no-data">لا توجد معلومات حسابات لعرضها.</td></tr>';
+            accountInfoContent.style.display = "block";
+        }
+    } catch (error) {
+        console.error("Error fetching account info:", error);
+        accountInfoTable.innerHTML = '<tr><td colspan="10" class="no-data">حدث خطأ أثناء تحميل معلومات الحسابات.</td></tr>';
+        accountInfoContent.style.display = "block";
+    } finally {
+        accountInfoLoading.style.display = "none";
+    }
+}
+
+async function logout() {
+    try {
+        const response = await fetch("/api/admin/logout", {
+            method: "POST",
+            credentials: "include"
+        });
+        if (response.ok) {
+            window.location.href = "/api/admin/login";
+        } else {
+            alert("فشل تسجيل الخروج.");
+        }
+    } catch (error) {
+        console.error("Error logging out:", error);
+        alert("حدث خطأ أثناء تسجيل الخروج.");
+    }
+}
+
+// Live updates: the server pushes changes as server-sent events and the open
+// lists are patched in place instead of being fetched again
+function transactionMatchesFilters(t) {
+    const status = document.getElementById("transactionsStatus").value;
+    const type = document.getElementById("transactionsType").value;
+    return (!status || status === t.status) && (!type || type === t.type);
+}
+
+function addTransaction(t) {
+    const transactionsTable = document.getElementById("transactionsTable");
+    if (document.getElementById("transactionsContent").style.display !== "block") return;
+    if (document.getElementById(`transaction-${t.id}`) || !transactionMatchesFilters(t)) return;
+    const empty = transactionsTable.querySelector(".no-data");
+    if (empty) transactionsTable.innerHTML = "";
+    renderTransactionRow(t, true);
+}
+
+function applyReportDelta(delta) {
+    if (!reportTotals) return;
+    if (delta.metric === "signups") {
+        reportTotals.total_users += delta.count;
+        reportTotals.active_users += delta.count;
+    } else if (delta.metric === "deactivations") {
+        reportTotals.active_users -= delta.count;
+    } else if (delta.metric === "topups") {
+        reportTotals.total_deposits += delta.amount;
+    } else if (delta.metric === "withdrawals") {
+        reportTotals.total_withdrawals += delta.amount;
+    } else {
+        return;
+    }
+    renderReports();
+}
+
+function startEventStream() {
+    // The browser reconnects on its own, resuming after the last event it got
+    const events = new EventSource("/api/admin/events");
+    const on = (kind, handler) => events.addEventListener(kind, e => handler(JSON.parse(e.data)));
+    on("transaction_created", addTransaction);
+    on("transaction_status", t => setTransactionStatus(t.id, t.status));
+    on("user_status", u => setUserStatus(u.user_id, u.is_active));
+    on("report_delta", applyReportDelta);
+    // Too far behind for the buffered events, reload the open tab
+    on("reset", () => showTab(document.querySelector(".tab-content.active").id));
+}
+
+// Initial load
+document.addEventListener("DOMContentLoaded", () => {
+    startEventStream();
+    showTab("users");
+});
+"""
+
+DASHBOARD_TEMPLATE = """
+<!DOCTYPE html>
+<html dir="rtl" lang="ar">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>لوحة تحكم المدير - GoldEarn</title>
+    <link rel="stylesheet" href="{styles_url}">
+</head>
+<body>
+    <div class="header">
+        <h1>لوحة تحكم المدير - GoldEarn</h1>
+        <button class="logout-btn" onclick="logout()">تسجيل الخروج</button>
+        <div style="clear: both;"></div>
+    </div>
+
+    <div class="container">
+        <!-- Statistics Cards -->
+        <div class="stats-grid">
+            <div class="stat-card">
+                <h3>إجمالي المستخدمين</h3>
+                <div class="value" id="totalUsers">-</div>
+                <div class="change">+12% من الشهر الماضي</div>
+            </div>
+            <div class="stat-card">
+                <h3>المعاملات المعلقة</h3>
+                <div class="value" id="pendingTransactions">-</div>
+                <div class="change">تحتاج مراجعة</div>
+            </div>
+            <div class="stat-card">
+                <h3>إجمالي الإيداعات</h3>
+                <div class="value" id="totalDeposits">-</div>
+                <div class="change">هذا الشهر</div>
+            </div>
+            <div class="stat-card">
+                <h3>المستخدمين النشطين</h3>
+                <div class="value" id="activeUsers">-</div>
+                <div class="change">آخر 7 أيام</div>
+            </div>
+        </div>
+
+        <!-- Main Content -->
+        <div class="section">
+            <h2>إدارة النظام</h2>
+            <div class="tabs">
+                <div class="tab active" onclick="showTab('users')">المستخدمين</div>
+                <div class="tab" onclick="showTab('transactions')">المعاملات</div>
+                <div class="tab" onclick="showTab('vip')">باقات VIP</div>
+                <div class="tab" onclick="showTab('account_info')">معلومات الحسابات</div>
+                <div class="tab" onclick="showTab('reports')">التقارير</div>
+            </div>
+
+            <!-- Users Tab -->
+            <div id="users" class="tab-content active">
+                <div class="loading" id="usersLoading">جاري تحميل المستخدمين...</div>
+                <div id="usersContent" style="display: none;">
+                    <table class="table">
+                        <thead>
+                            <tr>
+                                <th>رقم الهاتف</th>
+                                <th>مستوى VIP</th>
+                                <th>الرصيد</th>
+                                <th>تاريخ التسجيل</th>
+                                <th>الحالة</th>
+                                <th>الإجراءات</th>
+                            </tr>
+                        </thead>
+                        <tbody id="usersTable">
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+
+            <!-- Transactions Tab -->
+            <div id="transactions" class="tab-content">
+                <div class="filters">
+                    <select id="transactionsStatus" onchange="fetchTransactions()">
+                        <option value="pending">قيد الانتظار</option>
+                        <option value="completed">مكتمل</option>
+                        <option value="rejected">مرفوض</option>
+                        <option value="">الكل</option>
+                    </select>
+                    <select id="transactionsType" onchange="fetchTransactions()">
+                        <option value="">كل الأنواع</option>
+                        <option value="topup">إيداع</option>
+                        <option value="withdrawal">سحب</option>
+                    </select>
+                </div>
+                <div class="loading" id="transactionsLoading">جاري تحميل المعاملات...</div>
+                <div id="transactionsContent" style="display: none;">
+                    <table class="table">
+                        <thead>
+                            <tr>
+                                <th>المعرف</th>
+                                <th>المستخدم</th>
+                                <th>النوع</th>
+                                <th>المبلغ</th>
+                                <th>الحالة</th>
+                                <th>التاريخ</th>
+                                <th>الإجراءات</th>
+                            </tr>
+                        </thead>
+                        <tbody id="transactionsTable">
+                        </tbody>
+                    </table>
+                    <button class="btn btn-view load-more" id="transactionsMore" style="display: none;" onclick="fetchTransactions(true)">تحميل المزيد</button>
+                </div>
+            </div>
+
+            <!-- VIP Packages Tab -->
+            <div id="vip" class="tab-content">
+                <div class="loading" id="vipLoading">جاري تحميل باقات VIP...</div>
+                <div id="vipContent" style="display: none;">
+                    <table class="table">
+                        <thead>
+                            <tr>
+                                <th>المستوى</th>
+                                <th>السعر</th>
+                                <th>الأرباح اليومية</th>
+                                <th>الإجراءات</th>
+                            </tr>
+                        </thead>
+                        <tbody id="vipTable">
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+
+            <!-- Account Info Tab -->
+            <div id="account_info" class="tab-content">
+                <div class="loading" id="accountInfoLoading">جاري تحميل معلومات الحسابات...</div>
+                <div id="accountInfoContent" style="display: none;">
+                    <table class="table">
+                        <thead>
+                            <tr>
+                                <th>معرف المستخدم</th>
+                                <th>رقم الهاتف</th>
+                                <th>الرصيد</th>
+                                <th>مستوى VIP</th>
+                                <th>تاريخ التسجيل</th>
+                                <th>الحالة</th>
+                                <th>إجمالي الإيداعات</th>
+                                <th>إجمالي السحوبات</th>
+                                <th>أرباح المهام</th>
+                                <th>أرباح الإحالات</th>
+                            </tr>
+                        </thead>
+                        <tbody id="accountInfoTable">
+                        </tbody>
+                    </table>
+                </div>
+            </div>
+
+            <!-- Reports Tab -->
+            <div id="reports" class="tab-content">
+                <div class="loading" id="reportsLoading">جاري تحميل التقارير...</div>
+                <div id="reportsContent" style="display: none;">
+                    <p>إجمالي المستخدمين: <span id="reportTotalUsers">-</span></p>
+                    <p>المستخدمون النشطون: <span id="reportActiveUsers">-</span></p>
+                    <p>إجمالي الإيداعات: <span id="reportTotalDeposits">-</span></p>
+                    <p>إجمالي السحوبات: <span id="reportTotalWithdrawals">-</span></p>
+                </div>
+            </div>
+        </div>
+    </div>
+
+    <script src="{script_url}"></script>
+</body>
+</html>
+"""
+
+
+def build_page(name, template, styles, script):
+    """Build an HTML page and its hashed styles/script assets, returns (page, {asset name: asset})"""
+    styles_asset = build_in_memory_asset(styles.lstrip().encode(), 'text/css')
+    script_asset = build_in_memory_asset(script.lstrip().encode(), 'application/javascript')
+    styles_name = f'{name}-{styles_asset.etag[:8]}.css'
+    script_name = f'{name}-{script_asset.etag[:8]}.js'
+
+    html = template.lstrip().replace(
+        '{styles_url}', f'/api/admin/assets/{styles_name}'
+    ).replace(
+        '{script_url}', f'/api/admin/assets/{script_name}'
+    )
+    return build_in_memory_asset(html.encode(), 'text/html'), {
+        styles_name: styles_asset,
+        script_name: script_asset
+    }
+
+
+LOGIN_PAGE, login_assets = build_page('login', LOGIN_TEMPLATE, LOGIN_STYLES, LOGIN_SCRIPT)
+DASHBOARD_PAGE, dashboard_assets = build_page('dashboard', DASHBOARD_TEMPLATE, DASHBOARD_STYLES, DASHBOARD_SCRIPT)
+ADMIN_ASSETS = {**login_assets, **dashboard_assets}
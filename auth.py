@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, session
-from src.models.user import db, User, Referral
+from src.models.user import db, User, Referral, get_referral_max_depth, get_commission_rate, add_team_member
+from src.models.passwords import PasswordHashingBusy
+from src.models.reports import record_report
 from datetime import datetime
 import re
 
@@ -11,43 +13,50 @@ def validate_phone(phone):
     return re.match(pattern, phone) is not None
 
 def create_referral_chain(new_user, referrer):
-    """Create referral chain for up to 3 levels"""
+    """Create the new user's referral closure rows in one INSERT ... SELECT.
+
+    The referrer becomes the level 1 ancestor and every ancestor of the
+    referrer is copied one level deeper, up to the configured max depth.
+    Each ancestor's team rollup then counts the new member.
+    """
     if not referrer:
         return
     
+    max_depth = get_referral_max_depth()
+    now = datetime.utcnow()
+    
     # Level 1: Direct referral
-    referral_1 = Referral(
-        referrer_id=referrer.id,
-        referred_id=new_user.id,
-        level=1,
-        commission_rate=0.10
+    direct = db.select(
+        db.literal(referrer.id),
+        db.literal(new_user.id),
+        db.literal(1),
+        db.literal(get_commission_rate(1)),
+        db.literal(now)
     )
-    db.session.add(referral_1)
     
-    # Level 2: Referrer's referrer
-    level_2_referrer = None
-    if referrer.referred_by:
-        level_2_referrer = User.query.filter_by(referral_code=referrer.referred_by).first()
-        if level_2_referrer:
-            referral_2 = Referral(
-                referrer_id=level_2_referrer.id,
-                referred_id=new_user.id,
-                level=2,
-                commission_rate=0.03
-            )
-            db.session.add(referral_2)
+    # Level 2 and up: the referrer's own upline, shifted one level down
+    inherited = db.select(
+        Referral.referrer_id,
+        db.literal(new_user.id),
+        Referral.level + 1,
+        db.case(
+            {level: get_commission_rate(level) for level in range(2, max_depth + 1)},
+            value=Referral.level + 1,
+            else_=0.0
+        ),
+        db.literal(now)
+    ).where(
+        Referral.referred_id == referrer.id,
+        Referral.level < max_depth
+    )
     
-    # Level 3: Level 2 referrer's referrer
-    if level_2_referrer and level_2_referrer.referred_by:
-        level_3_referrer = User.query.filter_by(referral_code=level_2_referrer.referred_by).first()
-        if level_3_referrer:
-            referral_3 = Referral(
-                referrer_id=level_3_referrer.id,
-                referred_id=new_user.id,
-                level=3,
-                commission_rate=0.01
-            )
-            db.session.add(referral_3)
+    db.session.execute(
+        db.insert(Referral).from_select(
+            ['referrer_id', 'referred_id', 'level', 'commission_rate', 'created_at'],
+            db.union_all(direct, inherited)
+        )
+    )
+    add_team_member(new_user.id)
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
@@ -89,6 +98,7 @@ def register():
         
         # Create referral chain
         create_referral_chain(new_user, referrer)
+        record_report('signups')
         
         db.session.commit()
         
@@ -101,6 +111,8 @@ def register():
             'user': new_user.to_dict()
         }), 201
         
+    except PasswordHashingBusy:
+        raise  # answered with a 503 by the app's errorhandler
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'حدث خطأ في التسجيل'}), 500
@@ -138,6 +150,8 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except PasswordHashingBusy:
+        raise  # answered with a 503 by the app's errorhandler
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في تسجيل الدخول'}), 500
 
@@ -181,6 +195,8 @@ def change_password():
         
         return jsonify({'message': 'تم تغيير كلمة المرور بنجاح'}), 200
         
+    except PasswordHashingBusy:
+        raise  # answered with a 503 by the app's errorhandler
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'حدث خطأ في تغيير كلمة المرور'}), 500
@@ -205,6 +221,8 @@ def set_payment_password():
         
         return jsonify({'message': 'تم تعيين كلمة مرور الدفع بنجاح'}), 200
         
+    except PasswordHashingBusy:
+        raise  # answered with a 503 by the app's errorhandler
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'حدث خطأ في تعيين كلمة مرور الدفع'}), 500
@@ -0,0 +1,29 @@
+from flask import current_app, request, Response
+from collections import namedtuple
+import hashlib
+
+# Serialized JSON body with its strong ETag
+CachedJSON = namedtuple('CachedJSON', ['body', 'etag'])
+
+# Cache-Control for public catalog data: browsers and proxies may reuse it for
+# a minute, after that they revalidate and get a 304 while it is unchanged
+PUBLIC_CATALOG_CACHE = 'public, max-age=60'
+# Per-user data that must be revalidated on every use
+PRIVATE_REVALIDATE_CACHE = 'private, no-cache'
+
+
+def build_cached_json(data):
+    """Serialize data once, the same way jsonify does, and fingerprint the bytes"""
+    body = (current_app.json.dumps(data) + '\n').encode()
+    return CachedJSON(body, hashlib.sha256(body).hexdigest()[:32])
+
+
+def cached_json_response(cached, cache_control=PUBLIC_CATALOG_CACHE):
+    """Send a pre-serialized body, or a bodyless 304 when If-None-Match already has it"""
+    if cached.etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(cached.body, mimetype='application/json')
+    response.set_etag(cached.etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,269 @@
+from flask import current_app
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db, User, UserTask, Transaction, Referral, record_earnings, get_upline
+from src.models.user import get_commission_rate, get_referral_max_depth
+from src.models.reports import record_reports
+from src.models.ledger import post_balance_changes, apply_rate, from_piasters, REFERRAL_COMMISSIONS_ACCOUNT
+from datetime import datetime
+import re
+
+# Store commissions as one running Transaction per referrer, level and day
+# instead of one per commission, overridable through REFERRAL_COMMISSION_ROLLUP
+DEFAULT_COMMISSION_ROLLUP = False
+
+
+class CommissionRollup(db.Model):
+    """A referrer's commissions from one level of their team on one (UTC) day, backing one running Transaction"""
+    referrer_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    level = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    day = db.Column(db.Date, primary_key=True)
+    amount_piasters = db.Column(db.BigInteger, nullable=False, default=0)
+    commissions = db.Column(db.Integer, nullable=False, default=0)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'referrer_id': self.referrer_id,
+            'level': self.level,
+            'day': self.day.isoformat(),
+            'amount': from_piasters(self.amount_piasters),
+            'commissions': self.commissions,
+            'transaction_id': self.transaction_id,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+def rollup_description(level, day, commissions):
+    return f'عمولات إحالة من المستوى {level} - {day.isoformat()} ({commissions} مهمة)'
+
+
+def pay_referral_commissions(sources):
+    """Pay referral commissions on amounts earned by users, in the caller's transaction.
+
+    ``sources`` is an iterable of ``(user_id, phone, amount_piasters, day, task_id)``,
+    day being the UTC date the amount was earned and task_id the UserTask
+    that earned it, or None. The uplines come from
+    get_upline() and the referrers' balances are credited through one
+    post_balance_changes() call, so the number of statements stays the same
+    however deep the referral tree is and however many sources are paid
+    together. Commissions are written as one Transaction each, or folded
+    into the daily roll-ups when REFERRAL_COMMISSION_ROLLUP is on.
+    Returns a list of (referrer_id, level, commission_piasters).
+    """
+    commissions = []
+    task_days = []
+    for user_id, phone, amount_piasters, day, task_id in sources:
+        if task_id is not None:
+            task_days.append({'b_id': task_id, 'b_day': day})
+        for referrer_id, level, commission_rate in get_upline(user_id):
+            commission_piasters = apply_rate(amount_piasters, commission_rate) if commission_rate else 0
+            if commission_piasters > 0:
+                commissions.append((referrer_id, level, commission_piasters, phone, day))
+    if not commissions:
+        return []
+
+    if current_app.config.get('REFERRAL_COMMISSION_ROLLUP', DEFAULT_COMMISSION_ROLLUP):
+        _pay_rolled_up(commissions)
+        # Mark the tasks folded in, commission_details_query() itemizes a roll-up from them
+        if task_days:
+            db.session.execute(
+                db.update(UserTask.__table__).where(
+                    UserTask.__table__.c.id == db.bindparam('b_id')
+                ).values(commission_day=db.bindparam('b_day')),
+                task_days
+            )
+    else:
+        _pay_itemized(commissions)
+
+    record_reports(
+        ('referral_commissions', day, 1, commission_piasters)
+        for referrer_id, level, commission_piasters, phone, day in commissions
+    )
+    record_earnings(
+        (referrer_id, 'referral_commission', commission_piasters)
+        for referrer_id, level, commission_piasters, phone, day in commissions
+    )
+
+    return [(referrer_id, level, commission_piasters) for referrer_id, level, commission_piasters, phone, day in commissions]
+
+
+def _insert_transactions(rows):
+    """Insert Transactions with one multi-row INSERT, returns their ids in the order of rows.
+
+    Asking SQLite for the ids in parameter order makes SQLAlchemy insert one
+    row at a time, so the new rows are matched back on their contents
+    instead; rows that match exactly are interchangeable.
+    """
+    table = Transaction.__table__
+    key = (table.c.user_id, table.c.referral_level, table.c.amount_piasters, table.c.description)
+    ids = {}
+    for row in db.session.execute(table.insert().returning(table.c.id, *key), rows):
+        ids.setdefault(tuple(row[1:]), []).append(row.id)
+    return [
+        ids[(row['user_id'], row['referral_level'], row['amount_piasters'], row['description'])].pop()
+        for row in rows
+    ]
+
+
+def _pay_itemized(commissions):
+    """One commission Transaction per commission, in one bulk insert"""
+    now = datetime.utcnow()
+
+    # Create commission transactions
+    transaction_ids = _insert_transactions([
+        {
+            'user_id': referrer_id,
+            'type': 'referral_commission',
+            'amount': from_piasters(commission_piasters),
+            'amount_piasters': commission_piasters,
+            'status': 'completed',
+            'description': f'عمولة إحالة من المستوى {level} - مهمة {phone}',
+            'referral_level': level,
+            'created_at': now,
+            'updated_at': now
+        }
+        for referrer_id, level, commission_piasters, phone, day in commissions
+    ])
+
+    # Add to referrers' balances
+    post_balance_changes('referral_commission', REFERRAL_COMMISSIONS_ACCOUNT, [
+        (referrer_id, commission_piasters, transaction_id)
+        for (referrer_id, level, commission_piasters, phone, day), transaction_id in zip(commissions, transaction_ids)
+    ])
+
+
+def _pay_rolled_up(commissions):
+    """Fold commissions into the (referrer, level, day) roll-ups and their running Transactions"""
+    totals = {}
+    for referrer_id, level, commission_piasters, phone, day in commissions:
+        total = totals.setdefault((referrer_id, level, day), [0, 0])
+        total[0] += commission_piasters
+        total[1] += 1
+
+    now = datetime.utcnow()
+    stmt = sqlite_insert(CommissionRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CommissionRollup.referrer_id, CommissionRollup.level, CommissionRollup.day],
+        set_={
+            'amount_piasters': CommissionRollup.amount_piasters + stmt.excluded.amount_piasters,
+            'commissions': CommissionRollup.commissions + stmt.excluded.commissions,
+            'updated_at': stmt.excluded.updated_at
+        }
+    ).returning(
+        CommissionRollup.referrer_id, CommissionRollup.level, CommissionRollup.day,
+        CommissionRollup.amount_piasters, CommissionRollup.commissions, CommissionRollup.transaction_id
+    )
+    rollups = [
+        db.session.execute(stmt, {
+            'referrer_id': referrer_id, 'level': level, 'day': day,
+            'amount_piasters': amount, 'commissions': count, 'updated_at': now
+        }).one()
+        for (referrer_id, level, day), (amount, count) in totals.items()
+    ]
+
+    # First commission of the day at this level: open the running Transaction
+    opened = [rollup for rollup in rollups if rollup.transaction_id is None]
+    transaction_ids = {}
+    if opened:
+        ids = _insert_transactions([
+            {
+                'user_id': rollup.referrer_id,
+                'type': 'referral_commission',
+                'amount': from_piasters(rollup.amount_piasters),
+                'amount_piasters': rollup.amount_piasters,
+                'status': 'completed',
+                'description': rollup_description(rollup.level, rollup.day, rollup.commissions),
+                'referral_level': rollup.level,
+                'created_at': now,
+                'updated_at': now
+            }
+            for rollup in opened
+        ])
+        transaction_ids = {(r.referrer_id, r.level, r.day): id_ for r, id_ in zip(opened, ids)}
+        db.session.execute(
+            db.update(CommissionRollup.__table__).where(
+                CommissionRollup.__table__.c.referrer_id == db.bindparam('b_referrer_id'),
+                CommissionRollup.__table__.c.level == db.bindparam('b_level'),
+                CommissionRollup.__table__.c.day == db.bindparam('b_day')
+            ).values(transaction_id=db.bindparam('b_transaction_id')),
+            [
+                {'b_referrer_id': referrer_id, 'b_level': level, 'b_day': day, 'b_transaction_id': id_}
+                for (referrer_id, level, day), id_ in transaction_ids.items()
+            ]
+        )
+
+    # Later ones: bring the running Transaction up to the new total
+    running = [rollup for rollup in rollups if rollup.transaction_id is not None]
+    if running:
+        db.session.execute(
+            db.update(Transaction.__table__).where(
+                Transaction.__table__.c.id == db.bindparam('b_id')
+            ).values(
+                amount=db.bindparam('b_amount'),
+                amount_piasters=db.bindparam('b_amount_piasters'),
+                description=db.bindparam('b_description'),
+                updated_at=now
+            ),
+            [
+                {
+                    'b_id': rollup.transaction_id,
+                    'b_amount': from_piasters(rollup.amount_piasters),
+                    'b_amount_piasters': rollup.amount_piasters,
+                    'b_description': rollup_description(rollup.level, rollup.day, rollup.commissions)
+                }
+                for rollup in running
+            ]
+        )
+        transaction_ids.update({(r.referrer_id, r.level, r.day): r.transaction_id for r in running})
+
+    # Add to referrers' balances, one journal per roll-up touched
+    post_balance_changes('referral_commission', REFERRAL_COMMISSIONS_ACCOUNT, [
+        (referrer_id, amount, transaction_ids[(referrer_id, level, day)])
+        for (referrer_id, level, day), (amount, count) in totals.items()
+    ])
+
+
+def commission_details_query(referrer_id, level, day):
+    """Query the task rewards behind a roll-up: the level members' tasks that were folded into that day's roll-ups.
+
+    The commission on each row is apply_rate(reward_piasters, commission_rate)
+    at the level's configured rate, the same as pay_referral_commissions() paid, so nothing per commission
+    has to be stored for the roll-up to be itemized on demand. Tasks whose
+    commissions are still in the outbox, or were paid itemized, are not
+    included; commissions delivered from events queued without a task id
+    cannot be itemized and only show in the roll-up total.
+    """
+    commission_rate = get_commission_rate(level) if level <= get_referral_max_depth() else 0.0
+    query = db.session.query(
+        UserTask.id, UserTask.completed_at, UserTask.reward_amount, UserTask.reward_piasters,
+        User.phone, db.literal(commission_rate).label('commission_rate')
+    ).join(
+        Referral, Referral.referred_id == UserTask.user_id
+    ).join(
+        User, User.id == UserTask.user_id
+    ).filter(
+        Referral.referrer_id == referrer_id,
+        Referral.level == level,
+        UserTask.commission_day == day
+    )
+    return query if commission_rate > 0 else query.filter(db.false())
+
+
+def backfill_commission_levels():
+    """Set referral_level on commission transactions written before it was stored, from their description"""
+    rows = db.session.execute(db.select(Transaction.id, Transaction.description).where(
+        Transaction.type == 'referral_commission', Transaction.referral_level.is_(None)
+    )).all()
+    levels = []
+    for transaction_id, description in rows:
+        match = re.search(r'المستوى (\d+)', description or '')
+        if match:
+            levels.append({'b_id': transaction_id, 'b_level': int(match.group(1))})
+    if levels:
+        db.session.execute(
+            db.update(Transaction.__table__).where(
+                Transaction.__table__.c.id == db.bindparam('b_id')
+            ).values(referral_level=db.bindparam('b_level')),
+            levels
+        )
@@ -0,0 +1,196 @@
+from flask import current_app, request, session, g, jsonify, make_response
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db
+from datetime import datetime, timedelta
+from functools import wraps
+import hashlib
+import threading
+import time
+
+# Key store settings, overridable through the IDEMPOTENCY_* app config keys
+DEFAULT_KEY_TTL = 86400  # seconds a stored response is replayed for
+DEFAULT_WAIT_TIMEOUT = 10  # seconds a duplicate waits for the first request before getting a 409
+DEFAULT_PENDING_TIMEOUT = 60  # seconds before an unfinished claim counts as abandoned
+DEFAULT_PURGE_INTERVAL = 300  # seconds between expired-key purges in each process
+PURGE_BATCH_SIZE = 500
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05  # seconds
+
+# Requests in this process waiting on a key another thread is running
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_last_purge = 0.0
+
+
+class IdempotencyKey(db.Model):
+    """A client Idempotency-Key and, once the first request finished, its response"""
+    __table_args__ = (
+        db.Index('ix_idempotency_key_expires', 'expires_at'),
+    )
+
+    # sha256 of user id and key, so the row size does not depend on the client's key
+    key_hash = db.Column(db.String(32), primary_key=True)
+    fingerprint = db.Column(db.String(32), nullable=False)  # method, path and body of the first request
+    state = db.Column(db.String(10), nullable=False, default='pending')  # pending, done
+    response_status = db.Column(db.Integer, nullable=True)
+    response_mimetype = db.Column(db.String(100), nullable=True)
+    response_body = db.Column(db.LargeBinary, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+idempotency_table = IdempotencyKey.__table__
+
+
+def _digest(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+def _claim(key_hash, fingerprint, now):
+    """Insert a pending row for the key, True if this request got it"""
+    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', DEFAULT_KEY_TTL)
+    result = db.session.execute(
+        sqlite_insert(IdempotencyKey).values(
+            key_hash=key_hash,
+            fingerprint=fingerprint,
+            state='pending',
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl)
+        ).on_conflict_do_nothing(index_elements=[IdempotencyKey.key_hash])
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _release(key_hash):
+    """Drop an unfinished claim so the client can retry with the same key"""
+    db.session.rollback()
+    db.session.execute(db.delete(idempotency_table).where(
+        idempotency_table.c.key_hash == key_hash, idempotency_table.c.state == 'pending'
+    ))
+    db.session.commit()
+
+
+def _store(key_hash, response):
+    db.session.execute(db.update(idempotency_table).where(
+        idempotency_table.c.key_hash == key_hash
+    ).values(
+        state='done',
+        response_status=response.status_code,
+        response_mimetype=response.mimetype,
+        response_body=response.get_data()
+    ))
+    db.session.commit()
+
+
+def _replay(row):
+    response = make_response(row.response_body, row.response_status)
+    response.mimetype = row.response_mimetype
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _finish(key_hash):
+    with _in_flight_lock:
+        event = _in_flight.pop(key_hash, None)
+    if event:
+        event.set()
+
+
+def purge_expired_idempotency_keys(limit=PURGE_BATCH_SIZE):
+    """Delete up to limit expired keys, returns how many were deleted"""
+    expired = db.select(idempotency_table.c.key_hash).where(
+        idempotency_table.c.expires_at < datetime.utcnow()
+    ).limit(limit).scalar_subquery()
+    result = db.session.execute(db.delete(idempotency_table).where(idempotency_table.c.key_hash.in_(expired)))
+    db.session.commit()
+    return result.rowcount
+
+
+def _maybe_purge():
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= current_app.config.get('IDEMPOTENCY_PURGE_INTERVAL', DEFAULT_PURGE_INTERVAL):
+        _last_purge = now
+        purge_expired_idempotency_keys()
+
+
+def idempotent(view):
+    """Honour an Idempotency-Key header on a money-moving endpoint.
+
+    The first request with a key claims it and runs the view; its response
+    (anything below 500) is stored for IDEMPOTENCY_KEY_TTL seconds and
+    replayed to later requests with the same key without running the view
+    again. A duplicate that arrives while the first is still running waits
+    for it, up to IDEMPOTENCY_WAIT_TIMEOUT. Keys are scoped to the logged-in
+    user; reusing a key for a different request gets a 422. Requests
+    without the header run as before.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        # Without a key, logged out (the view answers 401), or nested inside another idempotent view
+        if not key or 'user_id' not in session or g.get('idempotency_key'):
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': 'مفتاح التكرار طويل جداً'}), 400
+
+        key_hash = _digest(session['user_id'], key)
+        fingerprint = _digest(request.method, request.path, request.get_data())
+        config = current_app.config
+        deadline = time.monotonic() + config.get('IDEMPOTENCY_WAIT_TIMEOUT', DEFAULT_WAIT_TIMEOUT)
+        pending_timeout = timedelta(seconds=config.get('IDEMPOTENCY_PENDING_TIMEOUT', DEFAULT_PENDING_TIMEOUT))
+
+        _maybe_purge()
+        while True:
+            now = datetime.utcnow()
+            if _claim(key_hash, fingerprint, now):
+                break
+
+            row = db.session.execute(
+                db.select(idempotency_table).where(idempotency_table.c.key_hash == key_hash)
+            ).first()
+            if row is None:
+                continue  # the first request failed and released the key, claim it now
+            if row.fingerprint != fingerprint:
+                return jsonify({'error': 'مفتاح التكرار مستخدم لطلب مختلف'}), 422
+            if row.expires_at < now or (row.state == 'pending' and row.created_at < now - pending_timeout):
+                # Expired, or left behind by a request that died mid-way
+                db.session.execute(db.delete(idempotency_table).where(
+                    idempotency_table.c.key_hash == key_hash, idempotency_table.c.created_at == row.created_at
+                ))
+                db.session.commit()
+                continue
+            if row.state == 'done':
+                return _replay(row)
+
+            if time.monotonic() >= deadline:
+                return jsonify({'error': 'الطلب الأصلي ما زال قيد التنفيذ'}), 409, {'Retry-After': '1'}
+            with _in_flight_lock:
+                event = _in_flight.get(key_hash)
+            if event:
+                event.wait(min(1, max(0, deadline - time.monotonic())))
+            else:
+                time.sleep(POLL_INTERVAL)
+
+        with _in_flight_lock:
+            _in_flight[key_hash] = threading.Event()
+        g.idempotency_key = key_hash
+        try:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code >= 500:
+                _release(key_hash)
+            else:
+                _store(key_hash, response)
+            return response
+        except Exception:
+            _release(key_hash)
+            raise
+        finally:
+            _finish(key_hash)
+
+    return wrapper
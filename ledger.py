@@ -0,0 +1,251 @@
+from src.models.user import db, User, Transaction, UserTask, UserEarnings
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import datetime
+import uuid
+
+# Money is held in integer piasters (1 EGP = 100 piasters). The float columns
+# (User.balance, Transaction.amount, UserTask.reward_amount, UserEarnings.*) are kept as
+# display mirrors, always written as piasters / 100 next to the integer column.
+PIASTERS_PER_POUND = 100
+
+# Account of a user's wallet; every other account is a system counter-account
+USER_ACCOUNT = 'user'
+TASK_REWARDS_ACCOUNT = 'system:task_rewards'
+REFERRAL_COMMISSIONS_ACCOUNT = 'system:referral_commissions'
+DEPOSITS_ACCOUNT = 'system:deposits'
+WITHDRAWALS_ACCOUNT = 'system:withdrawals'
+VIP_SALES_ACCOUNT = 'system:vip_sales'
+OPENING_BALANCES_ACCOUNT = 'system:opening_balances'
+
+DEFAULT_CONVERSION_CHUNK_SIZE = 1000
+
+# Set once this process knows every user balance is held in piasters
+_balances_converted = False
+
+
+class InsufficientBalance(Exception):
+    """A debit would take a balance below zero"""
+
+
+class LedgerEntry(db.Model):
+    """One leg of a journal; the legs of a journal sum to zero. Rows are never updated or deleted."""
+    __table_args__ = (
+        # Statement of a user's wallet, in posting order
+        db.Index('ix_ledger_entry_user', 'user_id', 'id'),
+        db.Index('ix_ledger_entry_journal', 'journal_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    journal_id = db.Column(db.String(32), nullable=False)
+    account = db.Column(db.String(50), nullable=False)  # USER_ACCOUNT or a system:* account
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # set on USER_ACCOUNT legs
+    amount = db.Column(db.BigInteger, nullable=False)  # signed piasters, positive credits the account
+    kind = db.Column(db.String(50), nullable=False)  # task_reward, referral_commission, topup, ...
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'journal_id': self.journal_id,
+            'account': self.account,
+            'user_id': self.user_id,
+            'amount': from_piasters(self.amount),
+            'kind': self.kind,
+            'transaction_id': self.transaction_id,
+            'created_at': self.created_at.isoformat()
+        }
+
+
+def to_piasters(amount):
+    """Convert an amount in pounds to integer piasters, rounding half up"""
+    return int((Decimal(str(amount)) * PIASTERS_PER_POUND).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_piasters(piasters):
+    """Convert integer piasters to pounds for display"""
+    return piasters / PIASTERS_PER_POUND
+
+
+def apply_rate(piasters, rate):
+    """Take a rate of an amount in piasters, rounding half up to whole piasters"""
+    return int((Decimal(piasters) * Decimal(str(rate))).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def transaction_piasters(transaction):
+    """Get a transaction's amount in piasters, converting rows written before the ledger"""
+    if transaction.amount_piasters is not None:
+        return transaction.amount_piasters
+    return to_piasters(transaction.amount)
+
+
+user_table = User.__table__
+
+# A balance in piasters, converted on the fly for rows the migration has not reached
+current_balance = db.func.coalesce(
+    user_table.c.balance_piasters,
+    db.cast(db.func.round(user_table.c.balance * PIASTERS_PER_POUND), db.BigInteger)
+)
+
+# Conditional increment: the row only changes when the balance stays >= 0, so
+# concurrent debits can never overdraw and concurrent credits are never lost
+change_balance = db.update(user_table).where(
+    user_table.c.id == db.bindparam('user_id'),
+    current_balance + db.bindparam('delta') >= 0
+).values(
+    balance_piasters=current_balance + db.bindparam('delta'),
+    balance=(current_balance + db.bindparam('delta')) / float(PIASTERS_PER_POUND)
+)
+
+
+def post_balance_changes(kind, system_account, changes):
+    """Move money between user wallets and a system account, in the caller's transaction.
+
+    ``changes`` is an iterable of ``(user_id, delta_piasters, transaction_id)``;
+    a positive delta credits the user. Every balance is changed by one
+    executemany of conditional increments, and every change is journaled as
+    two LedgerEntry legs (user and system_account) that sum to zero. Raises
+    InsufficientBalance, leaving the caller to roll back, when a debit would
+    overdraw or a user does not exist.
+    """
+    changes = [change for change in changes if change[1]]
+    if not changes:
+        return
+
+    user_ids = {user_id for user_id, _, _ in changes}
+    if not _balances_converted:
+        convert_user_balances(user_ids)
+
+    result = db.session.execute(change_balance, [
+        {'user_id': user_id, 'delta': delta} for user_id, delta, _ in changes
+    ])
+    if result.rowcount != len(changes):
+        raise InsufficientBalance()
+
+    now = datetime.utcnow()
+    entries = []
+    for user_id, delta, transaction_id in changes:
+        journal_id = uuid.uuid4().hex
+        entries.append({
+            'journal_id': journal_id, 'account': USER_ACCOUNT, 'user_id': user_id, 'amount': delta,
+            'kind': kind, 'transaction_id': transaction_id, 'created_at': now
+        })
+        entries.append({
+            'journal_id': journal_id, 'account': system_account, 'user_id': None, 'amount': -delta,
+            'kind': kind, 'transaction_id': transaction_id, 'created_at': now
+        })
+    # A Core insert, so the legs without a user_id go in the same executemany
+    db.session.execute(LedgerEntry.__table__.insert(), entries)
+
+
+def convert_user_balances(user_ids):
+    """Move the given users' float balances into piasters, journaling each as an opening balance.
+
+    Users already converted are skipped, so this is safe to run from the
+    online migration and from post_balance_changes at the same time.
+    """
+    unconverted = db.select(User.id, current_balance.label('opening')).where(
+        User.id.in_(user_ids), User.balance_piasters.is_(None), current_balance != 0
+    ).subquery()
+
+    # Both legs share a journal id derived from the user id
+    journal_id = db.func.printf('opening-%d', unconverted.c.id)
+    now = datetime.utcnow()
+    user_leg = db.select(
+        journal_id, db.literal(USER_ACCOUNT), unconverted.c.id, unconverted.c.opening,
+        db.literal('opening_balance'), db.literal(now)
+    )
+    system_leg = db.select(
+        journal_id, db.literal(OPENING_BALANCES_ACCOUNT), db.null(), -unconverted.c.opening,
+        db.literal('opening_balance'), db.literal(now)
+    )
+    db.session.execute(db.insert(LedgerEntry).from_select(
+        ['journal_id', 'account', 'user_id', 'amount', 'kind', 'created_at'],
+        db.union_all(user_leg, system_leg)
+    ))
+    db.session.execute(db.update(user_table).where(
+        user_table.c.id.in_(user_ids), user_table.c.balance_piasters.is_(None)
+    ).values(
+        balance_piasters=current_balance,
+        balance=current_balance / float(PIASTERS_PER_POUND)
+    ))
+
+
+def check_balances_converted():
+    """Check once whether any float-only balance is left; afterwards posts skip the conversion step"""
+    global _balances_converted
+    if not _balances_converted:
+        _balances_converted = db.session.query(User.id).filter(User.balance_piasters.is_(None)).first() is None
+    return _balances_converted
+
+
+def _convert_column_chunk(model, float_column, piasters_column, chunk_size):
+    """Convert one chunk of a float money column, returns the number of rows converted"""
+    table = model.__table__
+    key = table.primary_key.columns.values()[0]
+    chunk = db.select(key).where(table.c[piasters_column].is_(None)).limit(chunk_size).scalar_subquery()
+    result = db.session.execute(db.update(table).where(key.in_(chunk)).values({
+        piasters_column: db.cast(db.func.round(table.c[float_column] * PIASTERS_PER_POUND), db.BigInteger)
+    }))
+    db.session.commit()
+    return result.rowcount
+
+
+def convert_money_columns(chunk_size=DEFAULT_CONVERSION_CHUNK_SIZE, progress=None):
+    """Online migration of the float money columns to piasters, returns rows converted per table.
+
+    Works in chunks of ``chunk_size`` rows, one short transaction each, so the
+    app keeps serving while it runs; rows touched by the app in the meantime
+    are converted on the spot and skipped here. ``progress`` is called with
+    (table name, rows converted so far) after each chunk.
+    """
+    converted = {'user': 0, 'transaction': 0, 'user_task': 0, 'user_earnings': 0}
+
+    while True:
+        user_ids = db.session.scalars(
+            db.select(User.id).where(User.balance_piasters.is_(None)).order_by(User.id).limit(chunk_size)
+        ).all()
+        if not user_ids:
+            break
+        convert_user_balances(user_ids)
+        db.session.commit()
+        converted['user'] += len(user_ids)
+        if progress:
+            progress('user', converted['user'])
+
+    for model, float_column, piasters_column in (
+        (Transaction, 'amount', 'amount_piasters'),
+        (UserTask, 'reward_amount', 'reward_piasters'),
+        (UserEarnings, 'task_earnings', 'task_earnings_piasters'),
+        (UserEarnings, 'referral_earnings', 'referral_earnings_piasters'),
+        (UserEarnings, 'total_earnings', 'total_earnings_piasters'),
+    ):
+        table_name = model.__table__.name
+        while True:
+            count = _convert_column_chunk(model, float_column, piasters_column, chunk_size)
+            if not count:
+                break
+            converted[table_name] += count
+            if progress:
+                progress(table_name, converted[table_name])
+
+    check_balances_converted()
+    return converted
+
+
+def verify_ledger():
+    """Check the books, returns (unbalanced journal ids, [(user_id, balance, ledger total)] mismatches)"""
+    unbalanced = db.session.scalars(
+        db.select(LedgerEntry.journal_id).group_by(LedgerEntry.journal_id).having(db.func.sum(LedgerEntry.amount) != 0)
+    ).all()
+
+    totals = db.select(
+        LedgerEntry.user_id, db.func.sum(LedgerEntry.amount).label('total')
+    ).where(LedgerEntry.account == USER_ACCOUNT).group_by(LedgerEntry.user_id).subquery()
+    ledger_total = db.func.coalesce(totals.c.total, 0)
+    mismatches = db.session.execute(
+        db.select(User.id, User.balance_piasters, ledger_total).outerjoin(
+            totals, totals.c.user_id == User.id
+        ).where(User.balance_piasters.is_not(None), User.balance_piasters != ledger_total)
+    ).all()
+    return unbalanced, [tuple(row) for row in mismatches]
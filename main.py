@@ -3,15 +3,25 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, redirect
+import click
+from flask import Flask, redirect, jsonify
 from flask_cors import CORS
-from src.models.user import db
+from src.models.passwords import PasswordHashingBusy
+from src.models.user import db, get_ancestors, rebuild_user_earnings, rebuild_daily_task_counts, rebuild_user_counters, rebuild_team_stats
+from src.models.migrations import run_migrations, get_schema_version, find_full_scans
+from src.models.sqlite_profile import configure_engine_options, apply_sqlite_profile
+from src.models.referral_codes import start_referral_code_refiller
+from src.models.reports import rebuild_daily_reports
+from src.models.outbox import start_outbox_worker, run_outbox_worker, process_outbox_once
+from src.models.vip_catalog import load_vip_catalog, invalidate_vip_catalog
+from src.models.ledger import check_balances_converted, convert_money_columns, verify_ledger, DEFAULT_CONVERSION_CHUNK_SIZE
 from src.routes.user import user_bp
 from src.routes.auth import auth_bp
 from src.routes.transactions import transactions_bp
 from src.routes.tasks import tasks_bp
-from src.routes.vip import vip_bp
+from src.routes.vip import vip_bp, initialize_vip_packages
 from src.routes.admin import admin_bp
+from src.routes.static_assets import StaticAssetIndex, compress_static_assets
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
@@ -27,30 +37,207 @@ app.register_blueprint(tasks_bp, url_prefix='/api/tasks')
 app.register_blueprint(vip_bp, url_prefix='/api/vip')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
+@app.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    """The password hashing pool is saturated: drop the request's writes and ask the client to retry"""
+    db.session.rollback()
+    return jsonify({'error': 'الخادم مشغول حالياً، حاول مرة أخرى بعد قليل'}), 503, {'Retry-After': '1'}
+
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+# DATABASE_URL points the app at another database, e.g. a scratch one for stress runs
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Engine profile: pool sizing plus the pragmas run on every connection.
+# Override SQLALCHEMY_ENGINE_OPTIONS / SQLITE_PRAGMAS entries here to tune.
+configure_engine_options(app)
 db.init_app(app)
 
+# Password hashing: werkzeug method with its cost, and the size of the hashing
+# process pool (0 hashes inline on the request thread)
+app.config['PASSWORD_HASH_METHOD'] = 'scrypt:32768:8:1'
+app.config['PASSWORD_HASH_WORKERS'] = 2
+app.config['PASSWORD_HASH_MAX_PENDING'] = 16
+app.config['PASSWORD_HASH_TIMEOUT'] = 10
+
+# Referral tree depth and commission rate per level (level 1 first)
+app.config['REFERRAL_MAX_DEPTH'] = 3
+app.config['REFERRAL_COMMISSION_RATES'] = (0.10, 0.03, 0.01)
+# Set to fold commissions into one running transaction per referrer, level and
+# day instead of one per task; the per-task detail is then served on demand by
+# /api/transactions/commissions/<day>/<level>
+app.config['REFERRAL_COMMISSION_ROLLUP'] = False
+
+# Pre-generated referral code pool handed out at registration
+app.config['REFERRAL_CODE_POOL_TARGET'] = 5000
+app.config['REFERRAL_CODE_POOL_LOW_WATER'] = 1000
+app.config['REFERRAL_CODE_POOL_REFILL_INTERVAL'] = 5
+# Refill thread in each serving process; registration generates codes inline without it
+app.config['REFERRAL_CODE_REFILLER_THREAD'] = True
+
+# VIP catalog cached per worker; touching the stamp file makes every worker reload it
+app.config['VIP_CATALOG_STAMP_FILE'] = os.path.join(os.path.dirname(__file__), 'database', 'vip_catalog.stamp')
+app.config['VIP_CATALOG_CHECK_INTERVAL'] = 1
+
+# Idempotency-Key store: how long responses are replayed, how long a duplicate
+# waits for the first request, and when an unfinished claim counts as abandoned
+app.config['IDEMPOTENCY_KEY_TTL'] = 86400
+app.config['IDEMPOTENCY_WAIT_TIMEOUT'] = 10
+app.config['IDEMPOTENCY_PENDING_TIMEOUT'] = 60
+app.config['IDEMPOTENCY_PURGE_INTERVAL'] = 300
+
+# Task and transaction history totals are recounted at most this often per user
+app.config['HISTORY_TOTAL_CACHE_TTL'] = 30
+
+# Outbox worker paying referral commissions after task completion. Run it as
+# its own process with `flask outbox-worker`, or set OUTBOX_WORKER_THREAD=1 in
+# the environment to run it as a thread in every serving process instead;
+# leases keep them from colliding. The dev server below always runs the thread.
+app.config['OUTBOX_WORKER_THREAD'] = os.environ.get('OUTBOX_WORKER_THREAD') == '1'
+app.config['OUTBOX_BATCH_SIZE'] = 200
+app.config['OUTBOX_POLL_INTERVAL'] = 1
+app.config['OUTBOX_LEASE'] = 30
+app.config['OUTBOX_MAX_ATTEMPTS'] = 10
+app.config['OUTBOX_RETENTION'] = 7 * 86400
+
+# Admin dashboard event stream: keep-alive interval on idle streams, and how
+# long a stream stays open before the browser reconnects with Last-Event-ID
+app.config['ADMIN_EVENTS_HEARTBEAT'] = 15
+app.config['ADMIN_EVENTS_MAX_STREAM'] = 300
+
+# Admin review queue: how long a claimed batch of pending transactions stays
+# reserved for its admin, and the largest batch one claim can take
+app.config['TRANSACTION_QUEUE_LEASE'] = 300
+app.config['TRANSACTION_QUEUE_MAX_CLAIM'] = 100
+
+# Cached ancestors are per database, drop any left from an app configured before this one
+get_ancestors.cache_clear()
+
 with app.app_context():
+    apply_sqlite_profile(app, db.engine)
     db.create_all()
+    run_migrations()
+    check_balances_converted()
+    initialize_vip_packages()
+    load_vip_catalog()
+
+@app.before_request
+def start_background_threads():
+    """Start the background threads with the first request, so only serving processes run them, not CLI commands or scripts"""
+    start_referral_code_refiller(app)
+    start_outbox_worker(app)
+
+@app.cli.command('rebuild-earnings')
+def rebuild_earnings_command():
+    """Recompute the stored per-user earnings summaries from the transactions"""
+    count = rebuild_user_earnings()
+    click.echo(f'Rebuilt earnings summaries for {count} users')
+
+@app.cli.command('rebuild-task-counts')
+def rebuild_task_counts_command():
+    """Recompute the per-user daily task counters from the task history"""
+    count = rebuild_daily_task_counts()
+    click.echo(f'Rebuilt {count} daily task counters')
+
+@app.cli.command('rebuild-counters')
+def rebuild_counters_command():
+    """Recompute the per-user transaction and task counters behind the summary screens"""
+    count = rebuild_user_counters()
+    click.echo(f'Rebuilt counters for {count} users')
+
+@app.cli.command('rebuild-team-stats')
+def rebuild_team_stats_command():
+    """Recompute the per-referrer team size and topup rollups"""
+    count = rebuild_team_stats()
+    click.echo(f'Rebuilt {count} team rollups')
+
+@app.cli.command('rebuild-reports')
+def rebuild_reports_command():
+    """Recompute the daily admin report rollups from the user, transaction and task tables"""
+    count = rebuild_daily_reports()
+    click.echo(f'Rebuilt {count} daily report rows')
+
+@app.cli.command('outbox-worker')
+@click.option('--once', is_flag=True, help='Deliver what is due now and exit')
+def outbox_worker_command(once):
+    """Deliver outbox events (referral commissions) in batches"""
+    if not once:
+        click.echo('Outbox worker running, Ctrl+C to stop')
+        run_outbox_worker(app)
+        return
+    delivered = 0
+    while True:
+        claimed, count = process_outbox_once(app)
+        delivered += count
+        if not claimed:
+            break
+    click.echo(f'Delivered {delivered} outbox events')
+
+@app.cli.command('invalidate-vip-catalog')
+def invalidate_vip_catalog_command():
+    """Make every worker reload the VIP catalog after a manual VIPPackage edit"""
+    invalidate_vip_catalog()
+    click.echo('VIP catalog invalidated')
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations"""
+    applied = run_migrations()
+    click.echo(f'Applied migrations: {applied}' if applied else 'No pending migrations')
+    click.echo(f'Schema version: {get_schema_version()}')
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Report hot queries whose plans still scan a whole table"""
+    full_scans = find_full_scans()
+    for name, detail in full_scans:
+        click.echo(f'{name}: {detail}')
+    if full_scans:
+        raise SystemExit(1)
+    click.echo('All hot queries use an index')
+
+@app.cli.command('convert-money')
+@click.option('--chunk-size', default=DEFAULT_CONVERSION_CHUNK_SIZE, show_default=True, help='Rows per transaction')
+def convert_money_command(chunk_size):
+    """Convert float balances and amounts to integer piasters, online and in chunks"""
+    converted = convert_money_columns(chunk_size, progress=lambda table, count: click.echo(f'{table}: {count} rows'))
+    for table, count in converted.items():
+        click.echo(f'Converted {count} {table} rows')
+
+@app.cli.command('verify-ledger')
+def verify_ledger_command():
+    """Check that every journal balances and every wallet matches its ledger entries"""
+    unbalanced, mismatches = verify_ledger()
+    for journal_id in unbalanced:
+        click.echo(f'Unbalanced journal {journal_id}')
+    for user_id, balance, ledger_total in mismatches:
+        click.echo(f'User {user_id}: balance {balance} != ledger {ledger_total} piasters')
+    if unbalanced or mismatches:
+        raise SystemExit(1)
+    click.echo('Ledger is consistent')
+
+# Static files are indexed once; restart after deploying a new frontend build
+static_assets = StaticAssetIndex(app.static_folder)
+
+@app.cli.command('compress-static')
+def compress_static_command():
+    """Build precompressed .gz/.br variants of the static files"""
+    written = compress_static_assets(app.static_folder)
+    click.echo(f'Wrote {len(written)} compressed files')
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
-            return "index.html not found", 404
+    return static_assets.serve(path)
 
 
 if __name__ == '__main__':
+    # Single dev process, no separate `flask outbox-worker`
+    app.config['OUTBOX_WORKER_THREAD'] = True
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,177 @@
+from src.models.user import db, User, Transaction, UserTask, Referral, TeamStats
+from src.models.user import compute_team_stats, compute_user_earnings, compute_daily_task_counts
+from src.models.reports import DailyReport, compute_daily_reports
+from src.models.commissions import backfill_commission_levels
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
+
+
+def add_column(table, column, ddl):
+    """Migration step adding a column unless the table already has it"""
+    def step():
+        columns = {row[1] for row in db.session.execute(db.text(f'PRAGMA table_info("{table}")'))}
+        if column not in columns:
+            db.session.execute(db.text(f'ALTER TABLE "{table}" ADD COLUMN {column} {ddl}'))
+    return step
+
+
+# Schema changes for databases that already exist. db.create_all() only
+# creates missing tables, so anything that alters an existing table goes
+# here as (version, description, statements). Statements must be safe to run
+# on a fresh database too, where create_all has already built the tables
+# from the models. A statement is either SQL or a callable run with no
+# arguments, for changes SQLite has no IF NOT EXISTS form of. Never edit or
+# reorder an entry once it has shipped.
+MIGRATIONS = [
+    (1, 'transaction listing indexes', [
+        'CREATE INDEX IF NOT EXISTS ix_transaction_created ON "transaction" (created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_transaction_status_created ON "transaction" (status, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_transaction_type_status_created ON "transaction" (type, status, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_created ON "transaction" (user_id, created_at, id)',
+    ]),
+    (2, 'hot path indexes', [
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_status ON "transaction" (user_id, type, status)',
+        'CREATE INDEX IF NOT EXISTS ix_user_task_user_completed ON user_task (user_id, completed_at)',
+        'CREATE INDEX IF NOT EXISTS ix_referral_referred_level ON referral (referred_id, level)',
+        'CREATE INDEX IF NOT EXISTS ix_referral_referrer_level ON referral (referrer_id, level)',
+    ]),
+    # Existing rows stay NULL until `flask convert-money` (or their next balance change) converts them
+    (3, 'integer piaster money columns', [
+        add_column('user', 'balance_piasters', 'BIGINT'),
+        add_column('transaction', 'amount_piasters', 'BIGINT'),
+        add_column('user_task', 'reward_piasters', 'BIGINT'),
+    ]),
+    (4, 'user transaction history by type index', [
+        'CREATE INDEX IF NOT EXISTS ix_transaction_user_type_created ON "transaction" (user_id, type, created_at, id)',
+    ]),
+    # Rollups are kept up to date from here on, this fills them in for existing teams
+    (5, 'team stats backfill', [
+        compute_team_stats,
+    ]),
+    # Same for the admin report rollups. The backfill reads decided_at, so the
+    # column is added here already for databases that have not run this yet
+    (6, 'daily report backfill', [
+        add_column('transaction', 'decided_at', 'DATETIME'),
+        compute_daily_reports,
+    ]),
+    (7, 'transaction review leases', [
+        add_column('transaction', 'claimed_by', 'VARCHAR(50)'),
+        add_column('transaction', 'claimed_until', 'DATETIME'),
+    ]),
+    (8, 'referral commission source level', [
+        add_column('transaction', 'referral_level', 'INTEGER'),
+        backfill_commission_levels,
+    ]),
+    # Tasks folded into commission roll-ups before this stay unmarked and cannot be itemized
+    (9, 'task commission roll-up day', [
+        add_column('user_task', 'commission_day', 'DATE'),
+    ]),
+    # Existing rows stay NULL until `flask convert-money` (or their next earning) converts them
+    (10, 'integer piaster earnings columns', [
+        add_column('user_earnings', 'task_earnings_piasters', 'BIGINT'),
+        add_column('user_earnings', 'referral_earnings_piasters', 'BIGINT'),
+        add_column('user_earnings', 'total_earnings_piasters', 'BIGINT'),
+    ]),
+    # Rows decided before this stay NULL, the report backfill falls back to updated_at for them.
+    # Databases that ran migration 6 after this was added already have the column
+    (11, 'transaction decision time', [
+        add_column('transaction', 'decided_at', 'DATETIME'),
+    ]),
+    # Earnings summaries were only ever written going forward, this fills them in
+    # for existing users (after migration 10, it writes the piaster columns)
+    (12, 'earnings summary backfill', [
+        compute_user_earnings,
+    ]),
+    # Same for the daily task counters, so users who already finished today's
+    # tasks before the upgrade do not get a fresh quota
+    (13, 'daily task counter backfill', [
+        compute_daily_task_counts,
+    ]),
+]
+
+
+class SchemaMigration(db.Model):
+    """A migration from MIGRATIONS that has been applied to this database"""
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def get_schema_version():
+    """Get the highest applied migration version, 0 if none"""
+    return db.session.query(db.func.max(SchemaMigration.version)).scalar() or 0
+
+
+def run_migrations():
+    """Apply pending migrations in order, returns the versions that were applied.
+
+    Each migration runs in its own transaction together with its
+    SchemaMigration row, so a failed migration leaves nothing behind and
+    another worker applying the same version concurrently is harmless.
+    """
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    current = get_schema_version()
+    applied = []
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement()
+                else:
+                    db.session.execute(db.text(statement))
+            db.session.add(SchemaMigration(version=version, description=description))
+            db.session.commit()
+            applied.append(version)
+        except IntegrityError:
+            # Another worker got there first
+            db.session.rollback()
+
+    return applied
+
+
+def get_hot_queries():
+    """Representative statements for every hot query shape, by name"""
+    return {
+        'user by phone': db.select(User).where(User.phone == '01000000000'),
+        'user by referral code': db.select(User).where(User.referral_code == 'ABCDEF'),
+        'user transactions by type and status': db.select(Transaction).where(
+            Transaction.user_id == 1, Transaction.type == 'topup', Transaction.status == 'completed'
+        ),
+        'user transaction history': db.select(Transaction).where(Transaction.user_id == 1).order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).limit(20),
+        'admin transaction queue': db.select(Transaction).where(Transaction.status == 'pending').order_by(
+            Transaction.created_at.desc(), Transaction.id.desc()
+        ).limit(50),
+        'user transaction history by type': db.select(Transaction).where(
+            Transaction.user_id == 1, Transaction.type == 'task_reward'
+        ).order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(20),
+        'user task history': db.select(UserTask).where(UserTask.user_id == 1).order_by(
+            UserTask.completed_at.desc(), UserTask.id.desc()
+        ).limit(20),
+        'upline': db.select(Referral).where(Referral.referred_id == 1).order_by(Referral.level),
+        'team by level': db.select(Referral).where(Referral.referrer_id == 1, Referral.level == 1),
+        'team stats': db.select(TeamStats).where(TeamStats.referrer_id == 1),
+        'admin work queue claim': db.select(Transaction.id).where(
+            Transaction.type == 'withdrawal', Transaction.status == 'pending',
+            db.or_(Transaction.claimed_until.is_(None), Transaction.claimed_until < '2024-01-01')
+        ).order_by(Transaction.created_at, Transaction.id).limit(20),
+        'daily report series': db.select(DailyReport).where(
+            DailyReport.metric.in_(['signups', 'topups']), DailyReport.day >= '2024-01-01', DailyReport.day <= '2024-01-31'
+        ),
+    }
+
+
+def find_full_scans():
+    """EXPLAIN every hot query, returns (name, plan detail) for each step that scans a whole table"""
+    full_scans = []
+    for name, statement in get_hot_queries().items():
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')):
+            detail = row[-1]
+            if detail.startswith('SCAN ') and ' USING ' not in detail:
+                full_scans.append((name, detail))
+    return full_scans
@@ -0,0 +1,309 @@
+from sqlalchemy import event, tuple_
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.commissions import pay_referral_commissions
+from datetime import date, datetime, timedelta
+import json
+import threading
+import time
+
+# Worker settings, overridable through the OUTBOX_* app config keys
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_POLL_INTERVAL = 1  # seconds between polls when the outbox is empty
+DEFAULT_LEASE = 30  # seconds a claimed batch is reserved for its worker
+DEFAULT_MAX_ATTEMPTS = 10  # deliveries before an event is marked failed
+DEFAULT_RETENTION = 7 * 86400  # seconds delivered events are kept
+MAX_RETRY_DELAY = 300  # seconds
+PURGE_BATCH_SIZE = 1000
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    'delivered': 0,
+    'duplicates': 0,
+    'retried': 0,
+    'failed': 0,
+    'batches': 0,
+    'last_batch_at': None,
+    'last_batch_seconds': None
+}
+
+
+class OutboxEvent(db.Model):
+    """A side effect committed together with the change that caused it, delivered later by the outbox worker"""
+    __table_args__ = (
+        # Oldest undelivered events first
+        db.Index('ix_outbox_event_status_id', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # a key of HANDLERS
+    payload = db.Column(db.Text, nullable=False)  # JSON
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # also the fencing token of the current claim
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': json.loads(self.payload),
+            'status': self.status,
+            'attempts': self.attempts,
+            'available_at': self.available_at.isoformat(),
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
+
+
+def _deliver_referral_commissions(payloads):
+    today = datetime.utcnow().date()
+    pay_referral_commissions(
+        (
+            payload['user_id'],
+            payload['phone'],
+            payload['amount_piasters'],
+            date.fromisoformat(payload['day']) if 'day' in payload else today,
+            payload.get('task_id')
+        )
+        for payload in payloads
+    )
+
+
+# Event kind -> function delivering a list of payloads in the worker's transaction
+HANDLERS = {
+    'referral_commission': _deliver_referral_commissions
+}
+
+
+def enqueue_event(kind, payload):
+    """Add an event in the caller's transaction; the worker delivers it once that commits"""
+    now = datetime.utcnow()
+    db.session.execute(db.insert(OutboxEvent).values(
+        kind=kind,
+        payload=json.dumps(payload),
+        status='pending',
+        attempts=0,
+        available_at=now,
+        created_at=now
+    ))
+    db.session.info['outbox_enqueued'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_worker_after_enqueue(session):
+    if session.info.pop('outbox_enqueued', False):
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_enqueue(session):
+    session.info.pop('outbox_enqueued', None)
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def claim_outbox_batch(batch_size, lease_seconds):
+    """Reserve up to batch_size due events for this worker, returns their rows.
+
+    A claim bumps each event's attempts, which then acts as a fencing
+    token: only the holder of the latest claim can mark the event done, so
+    a worker whose lease ran out cannot deliver it a second time.
+    """
+    now = datetime.utcnow()
+    due = db.select(OutboxEvent.id).where(
+        OutboxEvent.status == 'pending',
+        OutboxEvent.available_at <= now,
+        db.or_(OutboxEvent.claimed_until.is_(None), OutboxEvent.claimed_until < now)
+    ).order_by(OutboxEvent.id).limit(batch_size).scalar_subquery()
+
+    rows = db.session.execute(
+        db.update(OutboxEvent.__table__).where(OutboxEvent.__table__.c.id.in_(due)).values(
+            claimed_until=now + timedelta(seconds=lease_seconds),
+            attempts=OutboxEvent.__table__.c.attempts + 1
+        ).returning(
+            OutboxEvent.__table__.c.id,
+            OutboxEvent.__table__.c.kind,
+            OutboxEvent.__table__.c.payload,
+            OutboxEvent.__table__.c.attempts
+        )
+    ).all()
+    db.session.commit()
+    return sorted(rows, key=lambda row: row.id)
+
+
+def _deliver(rows):
+    """Run the handlers and mark the events done in one transaction, False if another claim took over"""
+    by_kind = {}
+    for row in rows:
+        by_kind.setdefault(row.kind, []).append(json.loads(row.payload))
+    for kind, payloads in by_kind.items():
+        HANDLERS[kind](payloads)
+
+    table = OutboxEvent.__table__
+    marked = db.session.execute(db.update(table).where(
+        tuple_(table.c.id, table.c.attempts).in_([(row.id, row.attempts) for row in rows]),
+        table.c.status == 'pending'
+    ).values(status='done', processed_at=datetime.utcnow(), claimed_until=None)).rowcount
+    if marked != len(rows):
+        db.session.rollback()
+        return False
+    db.session.commit()
+    return True
+
+
+def _retry_later(row, error, max_attempts):
+    """Put an event back with exponential backoff, or mark it failed after max_attempts"""
+    table = OutboxEvent.__table__
+    failed = row.attempts >= max_attempts
+    delay = min(MAX_RETRY_DELAY, 2 ** row.attempts)
+    db.session.execute(db.update(table).where(
+        table.c.id == row.id, table.c.attempts == row.attempts, table.c.status == 'pending'
+    ).values(
+        status='failed' if failed else 'pending',
+        available_at=datetime.utcnow() + timedelta(seconds=delay),
+        claimed_until=None,
+        last_error=f'{type(error).__name__}: {error}'[:1000]
+    ))
+    db.session.commit()
+    _count('failed' if failed else 'retried')
+
+
+def deliver_outbox_batch(rows, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """Deliver claimed events, as one transaction when possible, returns how many were delivered.
+
+    When the batch fails as a whole, its events are retried one by one so a
+    single bad event cannot hold the others back.
+    """
+    if not rows:
+        return 0
+    try:
+        if _deliver(rows):
+            _count('delivered', len(rows))
+            return len(rows)
+    except Exception:
+        db.session.rollback()
+        if len(rows) == 1:
+            raise
+
+    delivered = 0
+    for row in rows:
+        try:
+            if _deliver([row]):
+                delivered += 1
+            else:
+                _count('duplicates')
+        except Exception as error:
+            db.session.rollback()
+            _retry_later(row, error, max_attempts)
+    _count('delivered', delivered)
+    return delivered
+
+
+def process_outbox_once(app):
+    """Claim and deliver one batch, returns (claimed, delivered)"""
+    config = app.config
+    started = time.monotonic()
+    rows = claim_outbox_batch(
+        config.get('OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        config.get('OUTBOX_LEASE', DEFAULT_LEASE)
+    )
+    if not rows:
+        return 0, 0
+
+    try:
+        delivered = deliver_outbox_batch(rows, config.get('OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+    except Exception as error:
+        db.session.rollback()
+        _retry_later(rows[0], error, config.get('OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS))
+        delivered = 0
+
+    with _stats_lock:
+        _stats['batches'] += 1
+        _stats['last_batch_at'] = datetime.utcnow()
+        _stats['last_batch_seconds'] = round(time.monotonic() - started, 4)
+    return len(rows), delivered
+
+
+def purge_delivered_events(retention_seconds):
+    """Delete delivered events older than the retention, a batch at a time, returns how many were deleted"""
+    cutoff = datetime.utcnow() - timedelta(seconds=retention_seconds)
+    old = db.select(OutboxEvent.id).where(
+        OutboxEvent.status == 'done', OutboxEvent.processed_at < cutoff
+    ).limit(PURGE_BATCH_SIZE).scalar_subquery()
+    result = db.session.execute(db.delete(OutboxEvent).where(OutboxEvent.id.in_(old)))
+    db.session.commit()
+    return result.rowcount
+
+
+def get_outbox_stats(app):
+    """Get the backlog size and lag of the outbox, with this process's delivery counters"""
+    pending = db.session.query(
+        db.func.count(OutboxEvent.id), db.func.min(OutboxEvent.created_at)
+    ).filter(OutboxEvent.status == 'pending').one()
+    failed = db.session.query(db.func.count(OutboxEvent.id)).filter(OutboxEvent.status == 'failed').scalar()
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        'backlog': pending[0],
+        'lag_seconds': round((datetime.utcnow() - pending[1]).total_seconds(), 3) if pending[1] else 0,
+        'failed_events': failed,
+        'delivered': stats['delivered'],
+        'duplicates': stats['duplicates'],
+        'retried': stats['retried'],
+        'failed': stats['failed'],
+        'batches': stats['batches'],
+        'last_batch_at': stats['last_batch_at'].isoformat() if stats['last_batch_at'] else None,
+        'last_batch_seconds': stats['last_batch_seconds'],
+        'worker_thread_alive': _worker is not None and _worker.is_alive()
+    }
+
+
+def run_outbox_worker(app, stop=None):
+    """Drain the outbox until stop is set, sleeping between polls when it is empty"""
+    config = app.config
+    batch_size = config.get('OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    interval = config.get('OUTBOX_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+    retention = config.get('OUTBOX_RETENTION', DEFAULT_RETENTION)
+    last_purge = 0.0
+
+    while stop is None or not stop.is_set():
+        claimed = 0
+        with app.app_context():
+            try:
+                claimed, _ = process_outbox_once(app)
+                if time.monotonic() - last_purge >= 60:
+                    last_purge = time.monotonic()
+                    purge_delivered_events(retention)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Outbox delivery failed')
+            finally:
+                db.session.remove()
+
+        # A full batch means there is more waiting
+        if claimed < batch_size:
+            _wake.clear()
+            _wake.wait(interval)
+
+
+def start_outbox_worker(app):
+    """Start the in-process outbox worker thread, once, if OUTBOX_WORKER_THREAD is on"""
+    global _worker
+    if not app.config.get('OUTBOX_WORKER_THREAD', False):
+        return
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive():
+            return
+        _worker = threading.Thread(target=run_outbox_worker, args=(app,), name='outbox-worker', daemon=True)
+        _worker.start()
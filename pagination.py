@@ -0,0 +1,128 @@
+from flask import current_app
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import tuple_
+import base64
+import math
+import threading
+import time
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+# History totals are counted at most once per TTL per key, overridable through
+# the HISTORY_TOTAL_CACHE_TTL app config key
+DEFAULT_TOTAL_CACHE_TTL = 30  # seconds
+TOTAL_CACHE_SIZE = 10000
+
+_totals = OrderedDict()
+_totals_lock = threading.Lock()
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque cursor token"""
+    raw = f'{created_at.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a cursor token back to (created_at, id), raises ValueError if it is invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        created_at, row_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('invalid cursor') from e
+
+
+def get_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """Parse a page size argument, clamped to 1..MAX_PAGE_SIZE"""
+    if value is None:
+        return default
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def keyset_page(query, created_column, id_column, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Get one newest-first page of a query ordered on (created_at, id).
+
+    Rows after the cursor are selected with a row-value comparison, so an
+    index on the filter columns followed by (created_at, id) serves every
+    page at the same cost. Returns (items, next_cursor), next_cursor is None
+    on the last page.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_column, id_column) < tuple_(created_at, row_id))
+
+    items = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+    return items, next_cursor
+
+
+def cached_count(key, query):
+    """Count a query's rows, reusing the count for the same key for HISTORY_TOTAL_CACHE_TTL seconds"""
+    now = time.monotonic()
+    with _totals_lock:
+        cached = _totals.get(key)
+        if cached and cached[1] > now:
+            _totals.move_to_end(key)
+            return cached[0]
+
+    total = query.order_by(None).count()
+    expires = now + current_app.config.get('HISTORY_TOTAL_CACHE_TTL', DEFAULT_TOTAL_CACHE_TTL)
+    with _totals_lock:
+        _totals[key] = (total, expires)
+        _totals.move_to_end(key)
+        while len(_totals) > TOTAL_CACHE_SIZE:
+            _totals.popitem(last=False)
+    return total
+
+
+def paginate_history(query, created_column, id_column, args, total_key):
+    """Page a newest-first history from request args, returns (items, pagination fields).
+
+    With ?cursor= the page is keyset-based and the total is only counted
+    when include_total=1. Without one, the old page/per_page arguments work
+    as before (page 1 being the same as no cursor), with the total included
+    by default; next_cursor is returned either way so clients can move over.
+    Totals come from cached_count(), keyed by total_key.
+    """
+    limit = get_page_size(args.get('per_page') or args.get('limit'))
+    cursor = args.get('cursor')
+    include_total = args.get('include_total', '0' if cursor else '1').lower() not in ('0', 'false')
+
+    if cursor:
+        items, next_cursor = keyset_page(query, created_column, id_column, cursor, limit)
+        fields = {'next_cursor': next_cursor}
+    else:
+        page = max(1, int(args.get('page', 1)))
+        items = query.order_by(created_column.desc(), id_column.desc()).offset(
+            (page - 1) * limit
+        ).limit(limit + 1).all()
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = encode_cursor(getattr(items[-1], created_column.key), getattr(items[-1], id_column.key))
+        fields = {'next_cursor': next_cursor, 'current_page': page}
+
+    if include_total:
+        total = cached_count(total_key, query)
+        fields['total'] = total
+        fields['pages'] = math.ceil(total / limit)
+    return items, fields
+
+
+def parse_date_range(date_from, date_to):
+    """Parse ISO date/datetime bounds into (start, end) datetimes, a date-only end is inclusive"""
+    start = datetime.fromisoformat(date_from) if date_from else None
+    end = None
+    if date_to:
+        end = datetime.fromisoformat(date_to)
+        if len(date_to) == 10:
+            end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return start, end
@@ -0,0 +1,94 @@
+from flask import current_app
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+import os
+import threading
+
+# Hashing defaults, overridable through the PASSWORD_HASH_* app config keys.
+# Hashing runs in a separate process pool so a login burst cannot tie up
+# every request thread; PASSWORD_HASH_WORKERS = 0 hashes inline instead.
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+DEFAULT_HASH_WORKERS = 2
+DEFAULT_HASH_MAX_PENDING = 16  # queued + running jobs before callers get PasswordHashingBusy
+DEFAULT_HASH_TIMEOUT = 10  # seconds
+
+_executor = None
+_executor_pid = None
+_pending = None
+_lock = threading.Lock()
+
+
+class PasswordHashingBusy(Exception):
+    """The hashing pool is full or too slow, the caller should retry later"""
+
+
+def get_hash_method():
+    """Get the configured werkzeug hash method with its cost parameters spelled out"""
+    method = current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+    if method == 'scrypt':
+        return 'scrypt:32768:8:1'
+    if method in ('pbkdf2', 'pbkdf2:sha256'):
+        return f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+    return method
+
+
+def _get_executor(workers, max_pending):
+    """Get this process's hashing pool, creating it after startup or a fork"""
+    global _executor, _executor_pid, _pending
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(max_workers=workers)
+            _executor_pid = os.getpid()
+            _pending = threading.BoundedSemaphore(max_pending)
+        return _executor, _pending
+
+
+def _reset_executor():
+    global _executor
+    with _lock:
+        _executor = None
+
+
+def _run(func, *args):
+    """Run a hashing function in the pool, raises PasswordHashingBusy when it is saturated"""
+    config = current_app.config
+    workers = config.get('PASSWORD_HASH_WORKERS', DEFAULT_HASH_WORKERS)
+    if not workers:
+        return func(*args)
+
+    executor, pending = _get_executor(workers, config.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_HASH_MAX_PENDING))
+    if not pending.acquire(blocking=False):
+        raise PasswordHashingBusy()
+
+    try:
+        future = executor.submit(func, *args)
+    except BrokenProcessPool:
+        pending.release()
+        _reset_executor()
+        raise
+    # The slot is held until the job really finishes, even if we stop waiting for it
+    future.add_done_callback(lambda f: pending.release())
+
+    try:
+        return future.result(timeout=config.get('PASSWORD_HASH_TIMEOUT', DEFAULT_HASH_TIMEOUT))
+    except FutureTimeoutError:
+        raise PasswordHashingBusy()
+    except BrokenProcessPool:
+        _reset_executor()
+        raise
+
+
+def hash_password(password):
+    """Hash a password with the configured method"""
+    return _run(generate_password_hash, password, get_hash_method())
+
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash"""
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Check if a stored hash was made with a different method or cost than configured"""
+    return password_hash.split('$', 1)[0] != get_hash_method()
@@ -0,0 +1,144 @@
+from src.models.user import db
+from datetime import datetime
+import secrets
+import threading
+
+# Pool sizing, overridable through the REFERRAL_CODE_POOL_* app config keys.
+# The refiller tops the pool back up to TARGET whenever it drops below
+# LOW_WATER, checking every REFILL_INTERVAL seconds or as soon as a claim
+# finds the pool empty.
+DEFAULT_POOL_TARGET = 5000
+DEFAULT_POOL_LOW_WATER = 1000
+DEFAULT_POOL_REFILL_INTERVAL = 5  # seconds
+
+_wake = threading.Event()
+_refiller = None
+_refiller_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    'claimed': 0,
+    'fallback': 0,
+    'refilled': 0,
+    'last_refill_at': None
+}
+
+
+class ReferralCodePool(db.Model):
+    """A generated referral code that no user has yet"""
+    code = db.Column(db.String(10), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def new_referral_code():
+    """Generate a random referral code, not checked for uniqueness"""
+    return secrets.token_urlsafe(6)[:6].upper()
+
+
+def _count(key, amount=1):
+    with _stats_lock:
+        _stats[key] += amount
+
+
+def claim_referral_code():
+    """Take a free code out of the pool, in the caller's transaction.
+
+    The DELETE ... RETURNING removes and returns one code in a single
+    statement, so two registrations can never claim the same code. Returns
+    None when the pool is empty, after waking the refiller.
+    """
+    any_code = db.select(ReferralCodePool.code).limit(1).scalar_subquery()
+    code = db.session.execute(
+        db.delete(ReferralCodePool).where(ReferralCodePool.code == any_code).returning(ReferralCodePool.code)
+    ).scalar()
+
+    if code is None:
+        _count('fallback')
+        _wake.set()
+        return None
+
+    _count('claimed')
+    return code
+
+
+def discard_referral_code(code):
+    """Drop a code from the pool after it was handed out some other way"""
+    db.session.execute(db.delete(ReferralCodePool).where(ReferralCodePool.code == code))
+
+
+def refill_referral_code_pool(target):
+    """Top the pool up towards target in one bulk insert, returns how many codes were added.
+
+    Codes already in the pool or already taken by a user are skipped, so a
+    round can add fewer than asked for; the next round makes up the rest.
+    """
+    available = db.session.query(db.func.count(ReferralCodePool.code)).scalar()
+    needed = target - available
+    if needed <= 0:
+        return 0
+
+    now = datetime.utcnow()
+    codes = {new_referral_code() for _ in range(needed)}
+    result = db.session.execute(
+        db.text(
+            'INSERT OR IGNORE INTO referral_code_pool (code, created_at) '
+            'SELECT :code, :created_at WHERE NOT EXISTS (SELECT 1 FROM user WHERE referral_code = :code)'
+        ),
+        [{'code': code, 'created_at': now} for code in codes]
+    )
+    db.session.commit()
+
+    added = max(result.rowcount, 0)
+    _count('refilled', added)
+    with _stats_lock:
+        _stats['last_refill_at'] = now
+    return added
+
+
+def get_referral_code_pool_stats(app):
+    """Get pool occupancy and claim counters for this process"""
+    available = db.session.query(db.func.count(ReferralCodePool.code)).scalar()
+    target = app.config.get('REFERRAL_CODE_POOL_TARGET', DEFAULT_POOL_TARGET)
+    with _stats_lock:
+        stats = dict(_stats)
+    return {
+        'available': available,
+        'target': target,
+        'low_water': app.config.get('REFERRAL_CODE_POOL_LOW_WATER', DEFAULT_POOL_LOW_WATER),
+        'occupancy': round(available / target, 4) if target else None,
+        'claimed': stats['claimed'],
+        'fallback': stats['fallback'],
+        'refilled': stats['refilled'],
+        'last_refill_at': stats['last_refill_at'].isoformat() if stats['last_refill_at'] else None
+    }
+
+
+def _refill_loop(app):
+    target = app.config.get('REFERRAL_CODE_POOL_TARGET', DEFAULT_POOL_TARGET)
+    low_water = app.config.get('REFERRAL_CODE_POOL_LOW_WATER', DEFAULT_POOL_LOW_WATER)
+    interval = app.config.get('REFERRAL_CODE_POOL_REFILL_INTERVAL', DEFAULT_POOL_REFILL_INTERVAL)
+
+    while True:
+        with app.app_context():
+            try:
+                available = db.session.query(db.func.count(ReferralCodePool.code)).scalar()
+                if available < low_water or _wake.is_set():
+                    refill_referral_code_pool(target)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('Referral code pool refill failed')
+            finally:
+                db.session.remove()
+        _wake.clear()
+        _wake.wait(interval)
+
+
+def start_referral_code_refiller(app):
+    """Start the background refill thread for this process, once, unless REFERRAL_CODE_REFILLER_THREAD is off"""
+    global _refiller
+    if not app.config.get('REFERRAL_CODE_REFILLER_THREAD', True):
+        return
+    with _refiller_lock:
+        if _refiller is not None and _refiller.is_alive():
+            return
+        _refiller = threading.Thread(target=_refill_loop, args=(app,), name='referral-code-refiller', daemon=True)
+        _refiller.start()
@@ -0,0 +1,178 @@
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from src.models.user import db, User, Transaction, UserTask, money_piasters
+from src.models.admin_events import publish_admin_event
+from datetime import datetime, timedelta
+
+# Metrics kept per (UTC) day. count is the number of events and
+# amount_piasters their total; deactivations is net of reactivations.
+REPORT_METRICS = (
+    'signups',
+    'deactivations',
+    'topups',
+    'withdrawals',
+    'task_rewards',
+    'referral_commissions',
+)
+
+# Longest range a time series can be asked for
+MAX_REPORT_DAYS = 366
+
+
+class DailyReport(db.Model):
+    """One metric's count and amount on one day, kept up to date as users and transactions are written"""
+    metric = db.Column(db.String(30), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    amount_piasters = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'metric': self.metric,
+            'day': self.day.isoformat(),
+            'count': self.count,
+            'amount': self.amount_piasters / 100
+        }
+
+
+def record_reports(rows):
+    """Add ``(metric, day, count, amount_piasters)`` rows to the daily reports, in the caller's transaction.
+
+    Rows for the same metric and day are summed first, then every report is
+    bumped by one executemany upsert.
+    """
+    totals = {}
+    for metric, day, count, amount_piasters in rows:
+        total = totals.setdefault((metric, day), [0, 0])
+        total[0] += count
+        total[1] += amount_piasters
+    if not totals:
+        return
+
+    stmt = sqlite_insert(DailyReport)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyReport.metric, DailyReport.day],
+        set_={
+            'count': DailyReport.count + stmt.excluded.count,
+            'amount_piasters': DailyReport.amount_piasters + stmt.excluded.amount_piasters
+        }
+    )
+    db.session.execute(stmt, [
+        {'metric': metric, 'day': day, 'count': count, 'amount_piasters': amount_piasters}
+        for (metric, day), (count, amount_piasters) in totals.items()
+    ])
+    for (metric, day), (count, amount_piasters) in totals.items():
+        publish_admin_event('report_delta', {
+            'metric': metric, 'day': day.isoformat(), 'count': count, 'amount': amount_piasters / 100
+        })
+
+
+def record_report(metric, count=1, amount_piasters=0, day=None):
+    """Add one event to today's (or day's) report for metric, in the caller's transaction"""
+    record_reports([(metric, day or datetime.utcnow().date(), count, amount_piasters)])
+
+
+def compute_daily_reports():
+    """Replace every daily report with one computed from the user, transaction and task tables, in the caller's transaction.
+
+    Deactivations are counted on the user's signup day, the day an account
+    was frozen is not stored anywhere. Topups and withdrawals decided before
+    decided_at was stored are counted on the day the row was last updated,
+    which is their approval day unless an admin edited them afterwards.
+    """
+    from src.models.commissions import CommissionRollup  # imports this module
+
+    def transactions(transaction_type):
+        # Topups and withdrawals count on the day they were approved
+        approved_on = db.func.date(
+            db.func.coalesce(Transaction.decided_at, Transaction.updated_at, Transaction.created_at)
+        )
+        return db.select(
+            approved_on,
+            db.func.count(Transaction.id),
+            db.func.sum(money_piasters(Transaction.amount_piasters, Transaction.amount))
+        ).where(
+            Transaction.type == transaction_type, Transaction.status == 'completed'
+        ).group_by(approved_on)
+
+    # Commissions folded into a daily roll-up count once per commission, itemized ones once per row
+    rolled_up = db.select(CommissionRollup.transaction_id).where(CommissionRollup.transaction_id.is_not(None))
+    commissions = db.union_all(
+        db.select(
+            db.func.date(Transaction.created_at).label('day'),
+            db.literal(1).label('commissions'),
+            money_piasters(Transaction.amount_piasters, Transaction.amount).label('amount_piasters')
+        ).where(Transaction.type == 'referral_commission', Transaction.id.not_in(rolled_up)),
+        db.select(
+            db.func.date(CommissionRollup.day),
+            CommissionRollup.commissions,
+            CommissionRollup.amount_piasters
+        )
+    ).subquery()
+
+    sources = {
+        'signups': db.select(
+            db.func.date(User.created_at), db.func.count(User.id), db.literal(0)
+        ).group_by(db.func.date(User.created_at)),
+        'deactivations': db.select(
+            db.func.date(User.created_at), db.func.count(User.id), db.literal(0)
+        ).where(User.is_active.is_(False)).group_by(db.func.date(User.created_at)),
+        'topups': transactions('topup'),
+        'withdrawals': transactions('withdrawal'),
+        'task_rewards': db.select(
+            db.func.date(UserTask.completed_at),
+            db.func.count(UserTask.id),
+            db.func.sum(money_piasters(UserTask.reward_piasters, UserTask.reward_amount))
+        ).group_by(db.func.date(UserTask.completed_at)),
+        'referral_commissions': db.select(
+            commissions.c.day, db.func.sum(commissions.c.commissions), db.func.sum(commissions.c.amount_piasters)
+        ).group_by(commissions.c.day),
+    }
+
+    db.session.execute(db.delete(DailyReport))
+    count = 0
+    for metric, source in sources.items():
+        source = source.add_columns(db.literal(metric))
+        count += db.session.execute(
+            db.insert(DailyReport).from_select(['day', 'count', 'amount_piasters', 'metric'], source)
+        ).rowcount
+    return count
+
+
+def rebuild_daily_reports():
+    """Recompute every daily report, returns the row count"""
+    count = compute_daily_reports()
+    db.session.commit()
+    return count
+
+
+def get_report_series(metrics, start_day, end_day):
+    """Get a zero-filled daily series for each metric from start_day to end_day inclusive, from the reports alone"""
+    rows = db.session.query(DailyReport).filter(
+        DailyReport.metric.in_(metrics), DailyReport.day >= start_day, DailyReport.day <= end_day
+    ).all()
+    found = {(row.metric, row.day): row for row in rows}
+
+    days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+    series = {}
+    for metric in metrics:
+        points = []
+        for day in days:
+            row = found.get((metric, day))
+            points.append({
+                'day': day.isoformat(),
+                'count': row.count if row else 0,
+                'amount': row.amount_piasters / 100 if row else 0
+            })
+        series[metric] = points
+    return series
+
+
+def get_report_totals():
+    """Get each metric's all-time (count, amount_piasters), summed over the daily reports"""
+    totals = {metric: (0, 0) for metric in REPORT_METRICS}
+    rows = db.session.query(
+        DailyReport.metric, db.func.sum(DailyReport.count), db.func.sum(DailyReport.amount_piasters)
+    ).group_by(DailyReport.metric).all()
+    for metric, count, amount_piasters in rows:
+        totals[metric] = (count, amount_piasters)
+    return totals
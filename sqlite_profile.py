@@ -0,0 +1,78 @@
+from sqlalchemy import event
+
+# Pragmas applied to every new SQLite connection, overridable through the
+# SQLITE_PRAGMAS app config key. WAL lets readers run alongside the single
+# writer, and busy_timeout makes writers wait for the lock instead of
+# failing straight away with "database is locked".
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # milliseconds
+    'mmap_size': 268435456,  # 256 MiB
+    'cache_size': -65536,  # negative means KiB, so 64 MiB per connection
+    'temp_store': 'MEMORY'
+}
+
+# Pool sizing for the app engine, merged under SQLALCHEMY_ENGINE_OPTIONS
+DEFAULT_ENGINE_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+    'pool_recycle': 3600
+}
+
+SYNCHRONOUS_NAMES = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+TEMP_STORE_NAMES = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+
+
+def configure_engine_options(app):
+    """Fill in the default pool options for any that the app config does not set"""
+    options = dict(DEFAULT_ENGINE_OPTIONS)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+    app.config.setdefault('SQLITE_PRAGMAS', dict(DEFAULT_SQLITE_PRAGMAS))
+
+
+def apply_sqlite_profile(app, engine):
+    """Run the configured pragmas on every connection the engine opens"""
+    pragmas = app.config.get('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def get_sqlite_tuning_report(app, engine):
+    """Get the pragmas actually in effect on a pooled connection, next to the configured ones"""
+    with engine.connect() as connection:
+        def pragma(name):
+            return connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+        in_effect = {
+            'journal_mode': pragma('journal_mode'),
+            'synchronous': SYNCHRONOUS_NAMES.get(pragma('synchronous'), pragma('synchronous')),
+            'busy_timeout': pragma('busy_timeout'),
+            'mmap_size': pragma('mmap_size'),
+            'cache_size': pragma('cache_size'),
+            'temp_store': TEMP_STORE_NAMES.get(pragma('temp_store'), pragma('temp_store')),
+            'page_size': pragma('page_size'),
+            'sqlite_version': connection.exec_driver_sql('SELECT sqlite_version()').scalar()
+        }
+
+    pool = engine.pool
+    return {
+        'configured': app.config.get('SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS),
+        'in_effect': in_effect,
+        'pool': {
+            'class': type(pool).__name__,
+            'size': pool.size() if hasattr(pool, 'size') else None,
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+            'overflow': pool.overflow() if hasattr(pool, 'overflow') else None,
+            'status': pool.status()
+        }
+    }
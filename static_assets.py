@@ -0,0 +1,159 @@
+from flask import request, Response, send_file
+from collections import namedtuple
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, without it only .gz variants are built
+    brotli = None
+
+# Vite emits content-hashed names like assets/index-BRYSvtWK.js, safe to cache
+# forever: an 8 character hash after the last hyphen, in its assets directory.
+# Anything else (apple-touch-icon.png, site-manifest.json) may change on redeploy.
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_]{8}\.\w+$')
+HASHED_ASSETS_DIR = 'assets/'
+IMMUTABLE_MAX_AGE = 31536000  # one year
+
+# Precompressed variants, in order of preference, as (Content-Encoding, suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_EXTENSIONS = {'.js', '.mjs', '.css', '.html', '.svg', '.json', '.txt', '.map', '.xml', '.ico'}
+MIN_COMPRESS_SIZE = 1024  # bytes
+
+StaticAsset = namedtuple('StaticAsset', ['path', 'mimetype', 'hashed', 'variants'])
+InMemoryAsset = namedtuple('InMemoryAsset', ['body', 'gzip_body', 'etag', 'mimetype'])
+
+
+def accepted_encodings():
+    """Get the content codings the client accepts, with q > 0"""
+    return {encoding for encoding, _ in ENCODINGS if request.accept_encodings[encoding] > 0}
+
+
+def build_in_memory_asset(body, mimetype):
+    """Hold a response body in memory, plain and gzipped, with a strong ETag"""
+    return InMemoryAsset(
+        body=body,
+        gzip_body=gzip.compress(body, compresslevel=9),
+        etag=hashlib.sha256(body).hexdigest()[:32],
+        mimetype=mimetype
+    )
+
+
+def serve_in_memory(asset, cache_control):
+    """Send an in-memory asset, gzipped when accepted, or a 304 when If-None-Match has it"""
+    use_gzip = 'gzip' in accepted_encodings()
+    etag = asset.etag + ('-gz' if use_gzip else '')
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(asset.gzip_body if use_gzip else asset.body, mimetype=asset.mimetype)
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+class StaticAssetIndex:
+    """Static folder indexed once at startup, served without touching the filesystem metadata per request"""
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.assets = {}
+        self.index_page = None
+        if folder and os.path.isdir(folder):
+            self.scan()
+
+    def scan(self):
+        suffixes = tuple(suffix for _, suffix in ENCODINGS)
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith(suffixes):
+                    continue
+                file_path = os.path.join(root, name)
+                url_path = os.path.relpath(file_path, self.folder).replace(os.sep, '/')
+                variants = {
+                    encoding: file_path + suffix
+                    for encoding, suffix in ENCODINGS
+                    if os.path.exists(file_path + suffix)
+                }
+                self.assets[url_path] = StaticAsset(
+                    path=file_path,
+                    mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    hashed=url_path.startswith(HASHED_ASSETS_DIR) and bool(HASHED_NAME.search(name)),
+                    variants=variants
+                )
+
+        index_asset = self.assets.get('index.html')
+        if index_asset:
+            with open(index_asset.path, 'rb') as f:
+                self.index_page = build_in_memory_asset(f.read(), 'text/html')
+
+    def serve(self, path):
+        """Serve a static file, or the SPA index.html for any path that is not one"""
+        asset = self.assets.get(path) if path else None
+        if asset is None or path == 'index.html':
+            return self.serve_index()
+
+        encoding, file_path = None, asset.path
+        accepted = accepted_encodings() if asset.variants else ()
+        for candidate, _ in ENCODINGS:
+            if candidate in accepted and candidate in asset.variants:
+                encoding, file_path = candidate, asset.variants[candidate]
+                break
+
+        response = send_file(
+            file_path,
+            mimetype=asset.mimetype,
+            conditional=True,
+            max_age=IMMUTABLE_MAX_AGE if asset.hashed else 0
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        response.cache_control.public = True
+        if asset.hashed:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def serve_index(self):
+        """Serve index.html from memory, revalidated by ETag on every load"""
+        if self.index_page is None:
+            return "index.html not found", 404
+        return serve_in_memory(self.index_page, 'no-cache')
+
+
+def compress_static_assets(folder):
+    """Write .gz (and .br when brotli is installed) next to every compressible file, returns the files written"""
+    written = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            file_path = os.path.join(root, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            if os.path.getsize(file_path) < MIN_COMPRESS_SIZE:
+                continue
+
+            source_mtime = os.path.getmtime(file_path)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+
+            compressors = [('.gz', lambda d: gzip.compress(d, compresslevel=9))]
+            if brotli is not None:
+                compressors.append(('.br', lambda d: brotli.compress(d, quality=11)))
+
+            for suffix, compress in compressors:
+                target = file_path + suffix
+                if os.path.exists(target) and os.path.getmtime(target) >= source_mtime:
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compress(data))
+                written.append(target)
+    return written
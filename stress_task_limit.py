@@ -0,0 +1,133 @@
+"""Stress run for the daily task limit.
+
+Fires parallel /api/tasks/complete-task requests at a set of users on a
+scratch database and checks that nobody got more tasks than their VIP level
+allows, that the daily counters match the task rows and that the ledger
+still balances. Exits non-zero on any violation.
+
+    python src/stress_task_limit.py --users 20 --requests-per-user 50 --threads 32
+"""
+import argparse
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+# Same import root as main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--requests-per-user', type=int, default=50)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--vip-level', default='V5', help='VIP level given to every user, sets the daily limit')
+    parser.add_argument('--database', help='SQLite file to use, a temporary one by default')
+    return parser.parse_args()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0
+
+
+def main():
+    args = parse_args()
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='stress-'), 'stress.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+
+    from src.main import app
+    from src.models.user import db, User, UserTask, UserDailyTaskCount
+    from src.models.ledger import verify_ledger
+
+    # Cheap hashes, the scratch users only exist for this run
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+
+    with app.app_context():
+        run_tag = f'{int(time.time()) % 100000:05d}'
+        users = [User(phone=f'0199{run_tag}{i:04d}', password='stress') for i in range(args.users)]
+        for user in users:
+            user.vip_level = args.vip_level
+        db.session.add_all(users)
+        db.session.commit()
+        limits = {user.id: user.get_max_daily_tasks() for user in users}
+
+    jobs = queue.Queue()
+    plan = [user_id for user_id in limits for _ in range(args.requests_per_user)]
+    random.shuffle(plan)
+    for user_id in plan:
+        jobs.put(user_id)
+
+    results = []
+    results_lock = threading.Lock()
+    start = threading.Barrier(args.threads)
+
+    def worker():
+        client = app.test_client()
+        start.wait()
+        while True:
+            try:
+                user_id = jobs.get_nowait()
+            except queue.Empty:
+                return
+            with client.session_transaction() as session:
+                session['user_id'] = user_id
+            began = time.perf_counter()
+            response = client.post('/api/tasks/complete-task', json={'task_type': 'survey'})
+            elapsed = time.perf_counter() - began
+            with results_lock:
+                results.append((user_id, response.status_code, elapsed))
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    began = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - began
+
+    statuses = Counter(status for _, status, _ in results)
+    accepted = Counter(user_id for user_id, status, _ in results if status == 201)
+    latencies = [elapsed for _, _, elapsed in results]
+
+    violations = []
+    with app.app_context():
+        task_rows = dict(db.session.query(UserTask.user_id, db.func.count(UserTask.id)).filter(
+            UserTask.user_id.in_(limits)
+        ).group_by(UserTask.user_id).all())
+        counters = dict(db.session.query(UserDailyTaskCount.user_id, db.func.sum(UserDailyTaskCount.count)).filter(
+            UserDailyTaskCount.user_id.in_(limits)
+        ).group_by(UserDailyTaskCount.user_id).all())
+        for user_id, limit in limits.items():
+            rows = task_rows.get(user_id, 0)
+            if rows > limit:
+                violations.append(f'user {user_id}: {rows} tasks, limit {limit}')
+            if counters.get(user_id, 0) != rows:
+                violations.append(f'user {user_id}: counter {counters.get(user_id, 0)} != {rows} task rows')
+            if accepted[user_id] != rows:
+                violations.append(f'user {user_id}: {accepted[user_id]} accepted responses != {rows} task rows')
+        unbalanced, mismatches = verify_ledger()
+        violations += [f'unbalanced journal {journal_id}' for journal_id in unbalanced]
+        violations += [f'user {user_id}: balance {balance} != ledger {total}' for user_id, balance, total in mismatches]
+
+    print(f'database:   {database}')
+    print(f'requests:   {len(results)} in {wall:.2f}s ({len(results) / wall:.0f} req/s, {args.threads} threads)')
+    print(f'latency:    p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms')
+    print(f'statuses:   {dict(sorted(statuses.items()))}')
+    print(f'accepted:   {sum(accepted.values())} of {sum(limits.values())} available slots')
+    if violations:
+        print(f'FAILED, {len(violations)} violations:')
+        for violation in violations:
+            print(f'  {violation}')
+        return 1
+    print('OK: no user went over the daily limit')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,32 +1,53 @@
 from flask import Blueprint, request, jsonify, session
-from src.models.user import db, User, UserTask, Transaction
+from src.models.user import db, User, UserTask, Transaction, UserDailyTaskCount, UserEarnings, UserCounters
+from src.models.user import record_earnings, money_piasters, claim_daily_task_slot, bump_user_counters, get_user_counters, get_upline
+from src.models.outbox import enqueue_event
+from src.models.reports import record_report
+from src.models.ledger import post_balance_changes, to_piasters, from_piasters, TASK_REWARDS_ACCOUNT
+from src.routes.cached_responses import build_cached_json, cached_json_response, PRIVATE_REVALIDATE_CACHE
+from src.routes.idempotency import idempotent
+from src.routes.pagination import paginate_history
 from datetime import datetime, timedelta
+import random
 
 tasks_bp = Blueprint('tasks', __name__)
 
-def calculate_referral_commissions(user, amount):
-    """Calculate and create referral commissions for task rewards"""
-    from src.models.user import Referral
-    
-    referrals = Referral.query.filter_by(referred_id=user.id).all()
-    
-    for referral in referrals:
-        commission_amount = amount * referral.commission_rate
-        
-        # Create commission transaction
-        commission_transaction = Transaction(
-            user_id=referral.referrer_id,
-            type='referral_commission',
-            amount=commission_amount,
-            status='completed',
-            description=f'عمولة إحالة من المستوى {referral.level} - مهمة {user.phone}'
-        )
-        db.session.add(commission_transaction)
-        
-        # Add to referrer's balance
-        referrer = User.query.get(referral.referrer_id)
-        if referrer:
-            referrer.balance += commission_amount
+# Mock survey questions - in real app these would come from database
+SURVEY_QUESTIONS = [
+    {
+        'id': 1,
+        'question': 'ما هو رأيك في جودة الخدمات المصرفية الإلكترونية؟',
+        'type': 'multiple_choice',
+        'options': ['ممتازة', 'جيدة', 'متوسطة', 'ضعيفة']
+    },
+    {
+        'id': 2,
+        'question': 'كم مرة تستخدم التطبيقات المصرفية في الأسبوع؟',
+        'type': 'multiple_choice',
+        'options': ['يومياً', '3-5 مرات', '1-2 مرة', 'نادراً']
+    },
+    {
+        'id': 3,
+        'question': 'ما هي أهم الميزات التي تبحث عنها في التطبيق المصرفي؟',
+        'type': 'multiple_choice',
+        'options': ['الأمان', 'سهولة الاستخدام', 'السرعة', 'الخدمات المتنوعة']
+    },
+    {
+        'id': 4,
+        'question': 'هل تفضل استخدام التطبيقات المحمولة أم المواقع الإلكترونية؟',
+        'type': 'multiple_choice',
+        'options': ['التطبيقات المحمولة', 'المواقع الإلكترونية', 'كلاهما', 'لا أفضل أي منهما']
+    },
+    {
+        'id': 5,
+        'question': 'ما مدى رضاك عن خدمة العملاء في البنوك؟',
+        'type': 'multiple_choice',
+        'options': ['راضي جداً', 'راضي', 'محايد', 'غير راضي']
+    }
+]
+
+# Serialized once per process, one body and ETag per question
+survey_question_responses = None
 
 @tasks_bp.route('/can-do-task', methods=['GET'])
 def can_do_task():
@@ -38,15 +59,9 @@ def can_do_task():
         if not user:
             return jsonify({'error': 'المستخدم غير موجود'}), 404
         
-        # Check if user can do task today
-        can_do = user.can_do_task_today()
-        
         # Get today's completed tasks count
-        today = datetime.utcnow().date()
-        today_tasks = UserTask.query.filter(
-            UserTask.user_id == user.id,
-            db.func.date(UserTask.completed_at) == today
-        ).count()
+        today_tasks = user.get_tasks_completed_today()
+        can_do = today_tasks < user.get_max_daily_tasks()
         
         return jsonify({
             'can_do_task': can_do,
@@ -60,6 +75,7 @@ def can_do_task():
         return jsonify({'error': 'حدث خطأ في التحقق من المهام'}), 500
 
 @tasks_bp.route('/complete-task', methods=['POST'])
+@idempotent
 def complete_task():
     if 'user_id' not in session:
         return jsonify({'error': 'غير مسجل الدخول'}), 401
@@ -72,36 +88,52 @@ def complete_task():
         if not user:
             return jsonify({'error': 'المستخدم غير موجود'}), 404
         
-        # Check if user can do task today
-        if not user.can_do_task_today():
+        # Claim one of today's task slots; the limit check and the count are one statement
+        if not claim_daily_task_slot(user.id, user.get_max_daily_tasks()):
+            db.session.rollback()
             return jsonify({'error': 'لقد أكملت المهام المتاحة لليوم'}), 400
         
         # Get reward amount based on VIP level
-        reward_amount = user.get_daily_reward()
+        reward_piasters = to_piasters(user.get_daily_reward())
+        reward_amount = from_piasters(reward_piasters)
         
         # Create task record
         user_task = UserTask(
             user_id=user.id,
             task_type=task_type,
-            reward_amount=reward_amount
+            reward_amount=reward_amount,
+            reward_piasters=reward_piasters
         )
         db.session.add(user_task)
+        bump_user_counters(user.id, tasks_completed=1)
+        record_report('task_rewards', amount_piasters=reward_piasters)
         
         # Create reward transaction
         reward_transaction = Transaction(
             user_id=user.id,
             type='task_reward',
             amount=reward_amount,
+            amount_piasters=reward_piasters,
             status='completed',
             description=f'مكافأة إتمام مهمة يومية - {task_type}'
         )
         db.session.add(reward_transaction)
+        db.session.flush()
         
         # Add reward to user balance
-        user.balance += reward_amount
+        post_balance_changes('task_reward', TASK_REWARDS_ACCOUNT, [(user.id, reward_piasters, reward_transaction.id)])
+        record_earnings([(user.id, 'task_reward', reward_piasters)])
         
-        # Calculate referral commissions
-        calculate_referral_commissions(user, reward_amount)
+        # Referral commissions are paid by the outbox worker, after this commit
+        if get_upline(user.id):
+            enqueue_event('referral_commission', {
+                'user_id': user.id,
+                'phone': user.phone,
+                'amount_piasters': reward_piasters,
+                'transaction_id': reward_transaction.id,
+                'task_id': user_task.id,
+                'day': datetime.utcnow().date().isoformat()
+            })
         
         db.session.commit()
         
@@ -122,23 +154,56 @@ def get_task_history():
         return jsonify({'error': 'غير مسجل الدخول'}), 401
     
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
+        query = UserTask.query.filter_by(user_id=session['user_id'])
         
-        tasks = UserTask.query.filter_by(user_id=session['user_id']).order_by(
-            UserTask.completed_at.desc()
-        ).paginate(page=page, per_page=per_page, error_out=False)
+        tasks, pagination = paginate_history(
+            query, UserTask.completed_at, UserTask.id, request.args,
+            total_key=('tasks', session['user_id'])
+        )
         
         return jsonify({
-            'tasks': [t.to_dict() for t in tasks.items],
-            'total': tasks.total,
-            'pages': tasks.pages,
-            'current_page': page
+            'tasks': [t.to_dict() for t in tasks],
+            **pagination
         }), 200
         
+    except ValueError:
+        return jsonify({'error': 'معاملات غير صحيحة'}), 400
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في جلب سجل المهام'}), 500
 
+def query_task_stats(user_id):
+    """Get (total, weekly, monthly, earnings) task stats in one indexed read, None if the user has no counters yet.
+
+    Weekly and monthly are the last 7 and 30 days, rolling: whole days are
+    summed from the daily counts and the partial first day is counted from
+    the user's tasks on it.
+    """
+    now = datetime.utcnow()
+    
+    def tasks_since(start):
+        next_day = start.date() + timedelta(days=1)
+        whole_days = db.select(db.func.coalesce(db.func.sum(UserDailyTaskCount.count), 0)).where(
+            UserDailyTaskCount.user_id == user_id, UserDailyTaskCount.day >= next_day
+        ).scalar_subquery()
+        first_day = db.select(db.func.count(UserTask.id)).where(
+            UserTask.user_id == user_id,
+            UserTask.completed_at >= start,
+            UserTask.completed_at < datetime.combine(next_day, datetime.min.time())
+        ).scalar_subquery()
+        return whole_days + first_day
+    
+    task_earnings = db.select(
+        money_piasters(UserEarnings.task_earnings_piasters, UserEarnings.task_earnings) / 100.0
+    ).where(UserEarnings.user_id == user_id).scalar_subquery()
+    return db.session.execute(
+        db.select(
+            UserCounters.tasks_completed,
+            tasks_since(now - timedelta(days=7)),
+            tasks_since(now - timedelta(days=30)),
+            db.func.coalesce(task_earnings, 0)
+        ).where(UserCounters.user_id == user_id)
+    ).first()
+
 @tasks_bp.route('/stats', methods=['GET'])
 def get_task_stats():
     if 'user_id' not in session:
@@ -147,27 +212,11 @@ def get_task_stats():
     try:
         user_id = session['user_id']
         
-        # Total tasks completed
-        total_tasks = UserTask.query.filter_by(user_id=user_id).count()
-        
-        # Tasks completed this week
-        week_ago = datetime.utcnow() - timedelta(days=7)
-        weekly_tasks = UserTask.query.filter(
-            UserTask.user_id == user_id,
-            UserTask.completed_at >= week_ago
-        ).count()
-        
-        # Tasks completed this month
-        month_ago = datetime.utcnow() - timedelta(days=30)
-        monthly_tasks = UserTask.query.filter(
-            UserTask.user_id == user_id,
-            UserTask.completed_at >= month_ago
-        ).count()
-        
-        # Total earnings from tasks
-        total_task_earnings = db.session.query(db.func.sum(UserTask.reward_amount)).filter(
-            UserTask.user_id == user_id
-        ).scalar() or 0
+        stats = query_task_stats(user_id)
+        if stats is None:
+            get_user_counters(user_id)
+            stats = query_task_stats(user_id)
+        total_tasks, weekly_tasks, monthly_tasks, total_task_earnings = stats
         
         return jsonify({
             'total_tasks': total_tasks,
@@ -185,49 +234,19 @@ def get_survey_questions():
     if 'user_id' not in session:
         return jsonify({'error': 'غير مسجل الدخول'}), 401
     
-    # Mock survey questions - in real app these would come from database
-    questions = [
-        {
-            'id': 1,
-            'question': 'ما هو رأيك في جودة الخدمات المصرفية الإلكترونية؟',
-            'type': 'multiple_choice',
-            'options': ['ممتازة', 'جيدة', 'متوسطة', 'ضعيفة']
-        },
-        {
-            'id': 2,
-            'question': 'كم مرة تستخدم التطبيقات المصرفية في الأسبوع؟',
-            'type': 'multiple_choice',
-            'options': ['يومياً', '3-5 مرات', '1-2 مرة', 'نادراً']
-        },
-        {
-            'id': 3,
-            'question': 'ما هي أهم الميزات التي تبحث عنها في التطبيق المصرفي؟',
-            'type': 'multiple_choice',
-            'options': ['الأمان', 'سهولة الاستخدام', 'السرعة', 'الخدمات المتنوعة']
-        },
-        {
-            'id': 4,
-            'question': 'هل تفضل استخدام التطبيقات المحمولة أم المواقع الإلكترونية؟',
-            'type': 'multiple_choice',
-            'options': ['التطبيقات المحمولة', 'المواقع الإلكترونية', 'كلاهما', 'لا أفضل أي منهما']
-        },
-        {
-            'id': 5,
-            'question': 'ما مدى رضاك عن خدمة العملاء في البنوك؟',
-            'type': 'multiple_choice',
-            'options': ['راضي جداً', 'راضي', 'محايد', 'غير راضي']
-        }
-    ]
+    global survey_question_responses
+    if survey_question_responses is None:
+        survey_question_responses = [
+            build_cached_json({'question': question}) for question in SURVEY_QUESTIONS
+        ]
     
     # Return a random question
-    import random
-    selected_question = random.choice(questions)
+    selected_response = random.choice(survey_question_responses)
     
-    return jsonify({
-        'question': selected_question
-    }), 200
+    return cached_json_response(selected_response, PRIVATE_REVALIDATE_CACHE)
 
 @tasks_bp.route('/submit-survey', methods=['POST'])
+@idempotent
 def submit_survey():
     """Submit survey answers and complete task"""
     if 'user_id' not in session:
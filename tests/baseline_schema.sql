@@ -0,0 +1,74 @@
+-- Schema of a database created by the app before the migration runner existed
+
+CREATE TABLE user (
+	id INTEGER NOT NULL,
+	phone VARCHAR(20) NOT NULL,
+	password_hash VARCHAR(255) NOT NULL,
+	payment_password_hash VARCHAR(255),
+	referral_code VARCHAR(10) NOT NULL,
+	referred_by VARCHAR(10),
+	nickname VARCHAR(100),
+	balance FLOAT,
+	vip_level VARCHAR(10),
+	vip_expiry DATETIME,
+	credit_score INTEGER,
+	is_active BOOLEAN,
+	created_at DATETIME,
+	last_login DATETIME,
+	PRIMARY KEY (id),
+	UNIQUE (phone),
+	UNIQUE (referral_code)
+);
+
+CREATE TABLE vip_package (
+	id INTEGER NOT NULL,
+	level VARCHAR(10) NOT NULL,
+	name VARCHAR(100) NOT NULL,
+	price FLOAT NOT NULL,
+	daily_tasks INTEGER NOT NULL,
+	daily_reward FLOAT NOT NULL,
+	monthly_income FLOAT NOT NULL,
+	yearly_income FLOAT NOT NULL,
+	is_active BOOLEAN,
+	created_at DATETIME,
+	PRIMARY KEY (id),
+	UNIQUE (level)
+);
+
+CREATE TABLE "transaction" (
+	id INTEGER NOT NULL,
+	user_id INTEGER NOT NULL,
+	type VARCHAR(50) NOT NULL,
+	amount FLOAT NOT NULL,
+	status VARCHAR(20),
+	description TEXT,
+	payment_method VARCHAR(50),
+	receipt_url VARCHAR(255),
+	admin_notes TEXT,
+	created_at DATETIME,
+	updated_at DATETIME,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES user (id)
+);
+
+CREATE TABLE user_task (
+	id INTEGER NOT NULL,
+	user_id INTEGER NOT NULL,
+	task_type VARCHAR(50),
+	reward_amount FLOAT NOT NULL,
+	completed_at DATETIME,
+	PRIMARY KEY (id),
+	FOREIGN KEY(user_id) REFERENCES user (id)
+);
+
+CREATE TABLE referral (
+	id INTEGER NOT NULL,
+	referrer_id INTEGER NOT NULL,
+	referred_id INTEGER NOT NULL,
+	level INTEGER NOT NULL,
+	commission_rate FLOAT NOT NULL,
+	created_at DATETIME,
+	PRIMARY KEY (id),
+	FOREIGN KEY(referrer_id) REFERENCES user (id),
+	FOREIGN KEY(referred_id) REFERENCES user (id)
+);
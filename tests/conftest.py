@@ -0,0 +1,131 @@
+"""Shared fixtures: the app on a temporary SQLite database, emptied after every test.
+
+The tests import the app as it is deployed (src.main, src.models.*, with this
+directory at src/tests), so they run from the directory above src/:
+
+    python -m pytest src/tests
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Same import root as main.py
+IMPORT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, IMPORT_ROOT)
+
+DEPLOYED = os.path.isfile(os.path.join(IMPORT_ROOT, 'src', 'main.py'))
+NOT_DEPLOYED = 'not in the deployed layout: copy this directory to src/tests and run python -m pytest src/tests'
+
+if DEPLOYED:
+    # Read by main.py when it is first imported
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tests-'), 'test.db')}"
+
+
+class NotDeployedModule(pytest.File):
+    """Stands in for a test module that cannot be imported without the src package"""
+
+    def collect(self):
+        yield NotDeployedTest.from_parent(self, name=self.path.stem)
+
+
+class NotDeployedTest(pytest.Item):
+    def runtest(self):
+        pytest.skip(NOT_DEPLOYED)
+
+    def reportinfo(self):
+        return self.path, None, self.name
+
+
+def pytest_pycollect_makemodule(module_path, parent):
+    if not DEPLOYED:
+        return NotDeployedModule.from_parent(parent, path=module_path)
+
+
+# Rows every test starts from: the applied migrations and the VIP packages
+KEPT_TABLES = {'schema_migration', 'vip_package'}
+
+_phones = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from src.main import app
+
+    # Cheap hashes and no background threads; tests run the outbox by hand
+    app.config['PASSWORD_HASH_WORKERS'] = 0
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    app.config['REFERRAL_CODE_REFILLER_THREAD'] = False
+    app.config['OUTBOX_WORKER_THREAD'] = False
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture(autouse=True)
+def clean_database(app):
+    yield
+    from src.models.user import db, get_ancestors
+    from src.routes import pagination
+
+    with app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            if table.name not in KEPT_TABLES:
+                db.session.execute(table.delete())
+        db.session.commit()
+    # Row ids are reused once the tables are empty
+    get_ancestors.cache_clear()
+    with pagination._totals_lock:
+        pagination._totals.clear()
+
+
+@pytest.fixture
+def make_user(app):
+    """Register a user, returns (client logged in as them, their to_dict())"""
+    from src.models.user import db, User
+
+    def make(referrer=None, vip_level=None):
+        client = app.test_client()
+        response = client.post('/api/auth/register', json={
+            'phone': f'010{next(_phones):08d}',
+            'password': 'secret',
+            'referral_code': referrer['referral_code'] if referrer else ''
+        })
+        assert response.status_code == 201, response.get_json()
+        user = response.get_json()['user']
+        if vip_level:
+            with app.app_context():
+                db.session.get(User, user['id']).vip_level = vip_level
+                db.session.commit()
+        return client, user
+
+    return make
+
+
+@pytest.fixture
+def admin_client(app):
+    """Client logged in to the admin API"""
+    def make(name='admin'):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['admin_user'] = name
+        return client
+
+    return make
+
+
+@pytest.fixture
+def fund(app, admin_client):
+    """Credit a user through an approved topup, the way real money gets in"""
+    admin = admin_client('funding-admin')
+
+    def fund(client, amount):
+        response = client.post('/api/transactions/topup', json={'amount': amount, 'payment_method': 'vodafone_cash'})
+        assert response.status_code == 201
+        transaction_id = response.get_json()['transaction']['id']
+        assert admin.post('/api/admin/transactions/approve', json={'transaction_id': transaction_id}).status_code == 200
+        return transaction_id
+
+    return fund
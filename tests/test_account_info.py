@@ -0,0 +1,45 @@
+import json
+
+from src.routes import admin
+
+
+def test_account_info_sums_each_users_completed_transactions(app, make_user, admin_client, fund):
+    client, user = make_user()
+    fund(client, 100)
+    fund(client, 0.5)
+    client.post('/api/transactions/topup', json={'amount': 40, 'payment_method': 'vodafone_cash'})  # still pending
+    withdrawal = client.post('/api/transactions/withdraw', json={'amount': 30}).get_json()['transaction']
+    admin = admin_client()
+    assert admin.post('/api/admin/transactions/approve', json={'transaction_id': withdrawal['id']}).status_code == 200
+    _, idle = make_user()
+
+    rows = admin.get('/api/admin/account_info').get_json()
+
+    assert [row['user_id'] for row in rows] == [user['id'], idle['id']]
+    assert (rows[0]['total_deposits'], rows[0]['total_withdrawals']) == (100.5, 30.0)
+    assert (rows[1]['total_deposits'], rows[1]['total_withdrawals']) == (0.0, 0.0)
+
+
+def test_account_info_streams_every_batch(app, make_user, admin_client, monkeypatch):
+    monkeypatch.setattr(admin, 'ACCOUNT_INFO_BATCH_SIZE', 2)
+    ids = [make_user()[1]['id'] for _ in range(5)]
+
+    response = admin_client().get('/api/admin/account_info?format=ndjson')
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['user_id'] for line in response.get_data(as_text=True).splitlines()] == ids
+
+
+def test_account_info_pages_with_the_next_after_id_header(app, make_user, admin_client):
+    ids = [make_user()[1]['id'] for _ in range(3)]
+    admin = admin_client()
+
+    first = admin.get('/api/admin/account_info?limit=2')
+    assert [row['user_id'] for row in first.get_json()] == ids[:2]
+    assert first.headers['X-Next-After-Id'] == str(ids[1])
+
+    last = admin.get(f"/api/admin/account_info?limit=2&after_id={first.headers['X-Next-After-Id']}")
+    assert [row['user_id'] for row in last.get_json()] == ids[2:]
+    assert 'X-Next-After-Id' not in last.headers
+
+    assert admin.get('/api/admin/account_info?limit=x').status_code == 400
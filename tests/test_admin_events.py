@@ -0,0 +1,59 @@
+import json
+
+from src.models.user import db
+from src.models.admin_events import BUFFER_SIZE, publish_admin_event, read_admin_events, get_admin_event_stats
+
+
+def last_event_id():
+    return get_admin_event_stats()['last_event_id']
+
+
+def test_events_are_published_when_their_transaction_commits(app):
+    start = last_event_id()
+    with app.app_context():
+        # Published inside an open transaction, as the routes do
+        db.session.execute(db.select(1))
+        publish_admin_event('dropped', {})
+        db.session.rollback()
+        db.session.execute(db.select(1))
+        publish_admin_event('kept', {'n': 1})
+        assert read_admin_events(start, 0) == ([], None)
+        db.session.commit()
+
+    events, reset_id = read_admin_events(start, 0)
+    assert reset_id is None
+    assert [(kind, json.loads(data)) for _, kind, data in events] == [('kept', {'n': 1})]
+
+
+def test_the_buffer_is_bounded_and_readers_left_behind_are_reset(app):
+    start = last_event_id()
+    with app.app_context():
+        for n in range(BUFFER_SIZE + 5):
+            publish_admin_event('filler', {'n': n})
+        db.session.commit()
+
+    assert get_admin_event_stats()['buffered'] == BUFFER_SIZE
+    assert read_admin_events(start, 0) == ([], last_event_id())
+    # An id from before a restart is reset too
+    assert read_admin_events(last_event_id() + 10, 0) == ([], last_event_id())
+
+
+def test_the_dashboard_stream_pushes_new_pending_transactions(app, make_user, admin_client, monkeypatch):
+    monkeypatch.setitem(app.config, 'ADMIN_EVENTS_HEARTBEAT', 0.05)
+    monkeypatch.setitem(app.config, 'ADMIN_EVENTS_MAX_STREAM', 0.2)
+    start = last_event_id()
+    client, user = make_user()
+    client.post('/api/transactions/topup', json={'amount': 5, 'payment_method': 'vodafone_cash'})
+
+    response = admin_client().get('/api/admin/events', headers={'Last-Event-ID': str(start)})
+    assert response.mimetype == 'text/event-stream'
+    messages = response.get_data(as_text=True).split('\n\n')
+
+    assert messages[0] == 'retry: 3000'
+    created = [m for m in messages if 'event: transaction_created' in m]
+    assert len(created) == 1
+    data = json.loads(created[0].split('data: ', 1)[1])
+    assert (data['user_id'], data['type'], data['status']) == (user['id'], 'topup', 'pending')
+    assert ': keep-alive' in messages
+
+    assert app.test_client().get('/api/admin/events').status_code == 403
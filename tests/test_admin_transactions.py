@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+
+def request_topup(client):
+    response = client.post('/api/transactions/topup', json={'amount': 5, 'payment_method': 'bank_transfer'})
+    return response.get_json()['transaction']['id']
+
+
+def test_admin_transactions_filter_and_page_by_cursor(app, make_user, admin_client):
+    client, user = make_user()
+    other, _ = make_user()
+    ids = [request_topup(client) for _ in range(3)]
+    request_topup(other)
+    admin = admin_client()
+
+    first = admin.get(f"/api/admin/transactions?user_id={user['id']}&limit=2").get_json()
+    rest = admin.get(f"/api/admin/transactions?user_id={user['id']}&limit=2&cursor={first['next_cursor']}").get_json()
+    assert [t['id'] for t in first['transactions'] + rest['transactions']] == ids[::-1]
+    assert rest['next_cursor'] is None
+
+
+def test_admin_transactions_filter_by_status_type_and_date(app, make_user, admin_client, fund):
+    client, _ = make_user()
+    approved = fund(client, 10)
+    pending = request_topup(client)
+    withdrawal = client.post('/api/transactions/withdraw', json={'amount': 1}).get_json()['transaction']['id']
+    admin = admin_client()
+    today = datetime.utcnow().date()  # created_at is UTC
+
+    def ids(query):
+        return [t['id'] for t in admin.get(f'/api/admin/transactions?{query}').get_json()['transactions']]
+
+    assert ids('status=pending') == [withdrawal, pending]
+    assert ids('status=pending&type=topup') == [pending]
+    assert ids('status=completed') == [approved]
+    assert ids(f'date_from={today.isoformat()}') == [withdrawal, pending, approved]
+    assert ids(f'date_to={(today - timedelta(days=1)).isoformat()}') == []
+    assert admin.get('/api/admin/transactions?date_from=yesterday').status_code == 400
@@ -0,0 +1,48 @@
+import pytest
+
+from src.models.user import db, VIPPackage
+from src.routes import tasks
+
+
+@pytest.mark.parametrize('path', ['/api/vip/packages', '/api/vip/packages/V1', '/api/vip/benefits'])
+def test_an_unchanged_catalog_is_a_bodyless_304(app, path):
+    client = app.test_client()
+    first = client.get(path)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'public, max-age=60'
+
+    again = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+    assert client.get(path, headers={'If-None-Match': '"stale"'}).data == first.data
+
+
+def test_the_etag_changes_with_the_catalog(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'VIP_CATALOG_STAMP_FILE', str(tmp_path / 'vip_catalog.stamp'))
+    client = app.test_client()
+    etag = client.get('/api/vip/packages').headers['ETag']
+    with app.app_context():
+        package = VIPPackage.query.filter_by(level='V1').one()
+        reward = package.daily_reward
+        package.daily_reward = reward + 1
+        db.session.commit()
+        try:
+            changed = client.get('/api/vip/packages', headers={'If-None-Match': etag})
+            assert changed.status_code == 200
+            assert changed.headers['ETag'] != etag
+        finally:
+            package.daily_reward = reward
+            db.session.commit()
+
+
+def test_survey_questions_are_revalidated_privately(app, make_user):
+    client, _ = make_user()
+    first = client.get('/api/tasks/survey-questions')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+    # The question is picked at random, a client holding all of them always gets a 304
+    every_etag = ', '.join(f'"{cached.etag}"' for cached in tasks.survey_question_responses)
+    assert client.get('/api/tasks/survey-questions', headers={'If-None-Match': every_etag}).status_code == 304
+    assert app.test_client().get('/api/tasks/survey-questions').status_code == 401
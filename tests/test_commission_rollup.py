@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+
+from src.models.user import db, User, Transaction
+from src.models.outbox import process_outbox_once
+from src.models.ledger import verify_ledger
+
+
+@pytest.fixture
+def rollup(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'REFERRAL_COMMISSION_ROLLUP', True)
+
+
+def complete_tasks(app, client, count):
+    for _ in range(count):
+        assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+        with app.app_context():
+            process_outbox_once(app)
+
+
+def test_commissions_fold_into_one_running_transaction_per_level_and_day(app, make_user, rollup):
+    _, grandparent = make_user()
+    _, parent = make_user(referrer=grandparent)
+    client, _ = make_user(referrer=parent, vip_level='V3')
+    complete_tasks(app, client, 3)
+
+    with app.app_context():
+        commissions = Transaction.query.filter_by(type='referral_commission').order_by(Transaction.referral_level).all()
+        assert [(t.user_id, t.referral_level, t.amount_piasters) for t in commissions] == [
+            (parent['id'], 1, 3 * 5200), (grandparent['id'], 2, 3 * 1560)
+        ]
+        assert db.session.get(User, parent['id']).balance_piasters == 3 * 5200
+        assert verify_ledger() == ([], [])
+
+
+def test_a_rollup_is_itemized_page_by_page(app, make_user, rollup):
+    parent_client, parent = make_user()
+    client, child = make_user(referrer=parent, vip_level='V3')
+    complete_tasks(app, client, 3)
+    day = datetime.utcnow().date().isoformat()
+
+    first = parent_client.get(f'/api/transactions/commissions/{day}/1?limit=2').get_json()
+    rest = parent_client.get(f"/api/transactions/commissions/{day}/1?limit=2&cursor={first['next_cursor']}").get_json()
+    items = first['commissions'] + rest['commissions']
+
+    assert rest['next_cursor'] is None
+    assert len({item['task_id'] for item in items}) == 3
+    assert {(item['phone'], item['commission_rate'], item['commission']) for item in items} == {(child['phone'], 0.10, 52)}
+    assert (first['rollup']['commissions'], first['rollup']['amount']) == (3, sum(item['commission'] for item in items))
+
+    # Someone else's roll-up is not theirs to itemize
+    assert client.get(f'/api/transactions/commissions/{day}/1').get_json() == {'rollup': None, 'commissions': [], 'next_cursor': None}
+    assert parent_client.get('/api/transactions/commissions/not-a-day/1').status_code == 400
@@ -0,0 +1,80 @@
+from datetime import date
+
+from sqlalchemy import event
+
+from src.models.user import db, User, Transaction, get_ancestors
+from src.models.commissions import pay_referral_commissions
+from src.models.ledger import LedgerEntry, USER_ACCOUNT, verify_ledger
+
+
+def chain(make_user, length):
+    users = [make_user()[1]]
+    for _ in range(length - 1):
+        users.append(make_user(referrer=users[-1])[1])
+    return users
+
+
+def count_statements(app, run):
+    statements = []
+
+    def count(*args):
+        statements.append(args[2])
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            run()
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+    return len(statements)
+
+
+def test_every_level_of_the_upline_is_paid(app, make_user):
+    users = chain(make_user, 4)
+    earner = users[-1]
+
+    with app.app_context():
+        paid = pay_referral_commissions([(earner['id'], earner['phone'], 10000, date.today(), None)])
+        db.session.commit()
+        assert sorted(paid, key=lambda commission: commission[1]) == [
+            (users[2]['id'], 1, 1000), (users[1]['id'], 2, 300), (users[0]['id'], 3, 100)
+        ]
+        balances = [db.session.get(User, user['id']).balance_piasters for user in users]
+        assert balances == [100, 300, 1000, 0]
+        assert Transaction.query.filter_by(type='referral_commission').count() == 3
+        assert verify_ledger() == ([], [])
+
+
+def test_statement_count_does_not_grow_with_the_sources(app, make_user):
+    users = chain(make_user, 4)
+    earners = [make_user(referrer=users[-1])[1] for _ in range(3)]
+
+    with app.app_context():
+        for earner in earners:
+            get_ancestors(earner['id'])
+
+    def pay(sources):
+        return lambda: pay_referral_commissions([
+            (earner['id'], earner['phone'], 10000, date.today(), None) for earner in sources
+        ])
+
+    assert count_statements(app, pay(earners[:1])) == count_statements(app, pay(earners))
+
+
+def test_each_commission_is_journaled_against_its_own_transaction(app, make_user):
+    users = chain(make_user, 2)
+    earners = [make_user(referrer=users[-1])[1] for _ in range(3)]
+
+    with app.app_context():
+        pay_referral_commissions([
+            (earner['id'], earner['phone'], amount, date.today(), None)
+            for earner, amount in zip(earners, (10000, 20000, 10000))
+        ])
+        db.session.commit()
+        legs = db.session.query(Transaction, LedgerEntry).join(
+            LedgerEntry, LedgerEntry.transaction_id == Transaction.id
+        ).filter(LedgerEntry.account == USER_ACCOUNT).all()
+        assert len(legs) == 6
+        for transaction, leg in legs:
+            assert (leg.user_id, leg.amount) == (transaction.user_id, transaction.amount_piasters)
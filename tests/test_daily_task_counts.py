@@ -0,0 +1,32 @@
+from datetime import datetime, timedelta
+
+from src.models.user import db, User, UserTask, UserDailyTaskCount, rebuild_daily_task_counts
+
+
+def test_completions_are_counted_for_today(app, make_user):
+    client, user = make_user(vip_level='V2')  # 2 tasks a day
+    for _ in range(2):
+        assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+
+    status = client.get('/api/tasks/can-do-task').get_json()
+    assert (status['tasks_completed_today'], status['can_do_task']) == (2, False)
+    assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 400
+
+
+def test_rebuild_counts_each_day_of_the_history(app, make_user):
+    _, user = make_user()
+    now = datetime.utcnow()
+    with app.app_context():
+        for days_ago in (0, 0, 1, 3):
+            db.session.add(UserTask(
+                user_id=user['id'], task_type='survey', reward_amount=1, reward_piasters=100,
+                completed_at=now - timedelta(days=days_ago)
+            ))
+        db.session.commit()
+
+        assert rebuild_daily_task_counts() == 3
+        counts = {row.day: row.count for row in UserDailyTaskCount.query.filter_by(user_id=user['id'])}
+        assert counts == {
+            now.date(): 2, (now - timedelta(days=1)).date(): 1, (now - timedelta(days=3)).date(): 1
+        }
+        assert db.session.get(User, user['id']).get_tasks_completed_today() == 2
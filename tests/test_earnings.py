@@ -0,0 +1,39 @@
+from src.models.user import db, User, Transaction, UserEarnings, record_earnings, rebuild_user_earnings
+
+
+def test_earnings_summary_follows_completed_tasks(app, make_user):
+    client, user = make_user(vip_level='V3')
+    for _ in range(2):
+        assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+
+    assert client.get('/api/transactions/earnings').get_json()['task_earnings'] == 1040
+    with app.app_context():
+        assert db.session.get(User, user['id']).to_dict()['total_earnings'] == 1040
+
+
+def test_summary_matches_a_rebuild_from_the_transactions(app, make_user):
+    _, first = make_user()
+    _, second = make_user()
+    with app.app_context():
+        db.session.add_all([
+            Transaction(user_id=first['id'], type='task_reward', amount=5.2, amount_piasters=520, status='completed'),
+            Transaction(user_id=first['id'], type='referral_commission', amount=0.16, amount_piasters=16, status='completed'),
+            Transaction(user_id=second['id'], type='task_reward', amount=1.0, amount_piasters=100, status='pending'),
+        ])
+        record_earnings([
+            (first['id'], 'task_reward', 520),
+            (first['id'], 'referral_commission', 16),
+            (second['id'], 'topup', 9999),
+        ])
+        db.session.commit()
+
+        def summaries():
+            return {
+                row.user_id: (row.task_earnings_piasters, row.referral_earnings_piasters, row.total_earnings_piasters)
+                for row in UserEarnings.query.all()
+            }
+
+        kept = summaries()
+        assert kept == {first['id']: (520, 16, 536)}
+        rebuild_user_earnings()
+        assert summaries()[first['id']] == kept[first['id']]
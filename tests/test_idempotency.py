@@ -0,0 +1,52 @@
+from src.models.user import db, Transaction
+from src.routes.idempotency import IdempotencyKey
+
+TOPUP = {'amount': 25, 'payment_method': 'vodafone_cash'}
+
+
+def topup(client, key, body=TOPUP):
+    return client.post('/api/transactions/topup', json=body, headers={'Idempotency-Key': key})
+
+
+def test_a_retried_request_is_replayed_not_repeated(app, make_user):
+    client, _ = make_user()
+    first = topup(client, 'retry-1')
+    again = topup(client, 'retry-1')
+
+    assert (first.status_code, again.status_code) == (201, 201)
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json() == first.get_json()
+    with app.app_context():
+        assert Transaction.query.filter_by(type='topup').count() == 1
+
+
+def test_reusing_a_key_for_a_different_request_is_refused(app, make_user):
+    client, _ = make_user()
+    assert topup(client, 'reused').status_code == 201
+    assert topup(client, 'reused', {**TOPUP, 'amount': 30}).status_code == 422
+
+
+def test_keys_are_scoped_to_the_user(app, make_user):
+    first, _ = make_user()
+    second, _ = make_user()
+    assert topup(first, 'shared').status_code == 201
+    response = topup(second, 'shared')
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+
+
+def test_a_duplicate_of_an_unfinished_request_gets_a_409(app, make_user):
+    client, _ = make_user()
+    assert topup(client, 'in-flight').status_code == 201
+    with app.app_context():
+        # As if the first request were still running
+        db.session.execute(db.update(IdempotencyKey).values(state='pending'))
+        db.session.commit()
+
+    app.config['IDEMPOTENCY_WAIT_TIMEOUT'] = 0
+    try:
+        response = topup(client, 'in-flight')
+    finally:
+        app.config.pop('IDEMPOTENCY_WAIT_TIMEOUT')
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from src.models.migrations import MIGRATIONS
+
+IMPORT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+BASELINE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_schema.sql')
+
+
+@pytest.fixture
+def legacy_database(tmp_path):
+    """A database as the app left it before any migration, with one referred user's history in it"""
+    path = tmp_path / 'legacy.db'
+    now = datetime.utcnow()
+    yesterday = now - timedelta(days=1)
+    connection = sqlite3.connect(path)
+    with open(BASELINE_SCHEMA) as f:
+        connection.executescript(f.read())
+    connection.executemany(
+        'INSERT INTO user (id, phone, password_hash, referral_code, referred_by, balance, vip_level, is_active, created_at)'
+        ' VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)',
+        [
+            (1, '01000000001', 'x', 'AAAAAA', None, 15.6, 'V3', yesterday),
+            (2, '01000000002', 'x', 'BBBBBB', 'AAAAAA', 600.0, 'V3', yesterday),
+        ]
+    )
+    connection.execute(
+        'INSERT INTO referral (referrer_id, referred_id, level, commission_rate, created_at) VALUES (1, 2, 1, 0.03, ?)',
+        (yesterday,)
+    )
+    connection.executemany(
+        'INSERT INTO "transaction" (user_id, type, amount, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+        [
+            (2, 'topup', 80.0, 'completed', yesterday, yesterday),
+            (2, 'task_reward', 520.0, 'completed', now, now),
+            (1, 'referral_commission', 15.6, 'completed', now, now),
+        ]
+    )
+    connection.execute(
+        'INSERT INTO user_task (user_id, task_type, reward_amount, completed_at) VALUES (2, ?, 520.0, ?)', ('survey', now)
+    )
+    connection.commit()
+    connection.close()
+    return path
+
+
+def boot(database):
+    """Import the app against database in a fresh interpreter, the way a deploy starts it"""
+    result = subprocess.run(
+        [sys.executable, '-c', 'import src.main'],
+        cwd=IMPORT_ROOT,
+        env={**os.environ, 'DATABASE_URL': f'sqlite:///{database}'},
+        capture_output=True,
+        text=True,
+        timeout=120
+    )
+    assert result.returncode == 0, result.stderr
+    return sqlite3.connect(database)
+
+
+def test_the_app_starts_on_a_pre_migration_database(legacy_database):
+    connection = boot(legacy_database)
+
+    assert connection.execute('SELECT max(version) FROM schema_migration').fetchone()[0] == MIGRATIONS[-1][0]
+    reports = dict(connection.execute(
+        'SELECT metric, amount_piasters FROM daily_report WHERE metric IN (?, ?)', ('topups', 'task_rewards')
+    ).fetchall())
+    assert reports == {'topups': 8000, 'task_rewards': 52000}
+
+
+def test_starting_again_applies_nothing(legacy_database):
+    boot(legacy_database).close()
+    connection = boot(legacy_database)
+    assert connection.execute('SELECT count(*) FROM schema_migration').fetchone()[0] == len(MIGRATIONS)
+
+
+def test_earnings_are_summed_for_existing_users(legacy_database):
+    connection = boot(legacy_database)
+
+    earnings = connection.execute(
+        'SELECT user_id, task_earnings_piasters, referral_earnings_piasters, total_earnings_piasters'
+        ' FROM user_earnings ORDER BY user_id'
+    ).fetchall()
+    assert earnings == [(1, 0, 1560, 1560), (2, 52000, 0, 52000)]
+
+
+def test_tasks_already_done_today_count_against_the_limit(legacy_database):
+    connection = boot(legacy_database)
+
+    counts = connection.execute('SELECT user_id, day, count FROM user_daily_task_count').fetchall()
+    assert counts == [(2, datetime.utcnow().date().isoformat(), 1)]
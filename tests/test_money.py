@@ -0,0 +1,120 @@
+from sqlalchemy import event
+
+from src.models.user import db, User, Transaction, UserEarnings, rebuild_user_earnings
+from src.models.ledger import LedgerEntry, to_piasters, apply_rate, post_balance_changes, verify_ledger, convert_money_columns
+
+
+def test_amounts_round_half_up_to_whole_piasters():
+    assert to_piasters(0.1 + 0.2) == 30
+    assert to_piasters(19.995) == 2000
+    assert apply_rate(5, 0.10) == 1
+    assert apply_rate(52000, 0.03) == 1560
+
+
+def test_withdrawal_funds_are_checked_in_piasters(app, make_user, fund):
+    client, user = make_user()
+    fund(client, 0.3)
+
+    assert client.post('/api/transactions/withdraw', json={'amount': 0.31}).status_code == 400
+    assert client.post('/api/transactions/withdraw', json={'amount': 0.1 + 0.2}).status_code == 201
+
+
+
+def test_vip_funds_are_checked_in_piasters(app, make_user, fund):
+    client, user = make_user()
+    fund(client, 1500)
+    with app.app_context():
+        # A float balance that drifted below the price, the piaster balance is what counts
+        db.session.get(User, user['id']).balance = 1499.9999999
+        db.session.commit()
+
+    response = client.post('/api/vip/subscribe', json={'level': 'V1'})
+    assert response.status_code == 200, response.get_json()
+
+
+def test_vip_funds_fall_back_to_the_float_balance_before_conversion(app, make_user):
+    client, user = make_user()
+    with app.app_context():
+        db.session.get(User, user['id']).balance_piasters = None
+        db.session.get(User, user['id']).balance = 1499.99
+        db.session.commit()
+
+    assert client.post('/api/vip/subscribe', json={'level': 'V1'}).status_code == 400
+
+
+def test_account_info_sums_deposits_in_piasters(app, make_user, admin_client, fund):
+    client, user = make_user()
+    for _ in range(3):
+        fund(client, 0.1)
+    with app.app_context():
+        # A topup approved before the piaster columns existed
+        db.session.add(Transaction(user_id=user['id'], type='topup', amount=0.7, status='completed'))
+        db.session.commit()
+
+    row = admin_client().get('/api/admin/account_info').get_json()[0]
+    assert row['total_deposits'] == 1.0
+
+def test_approved_topup_credits_balance_through_the_ledger(app, make_user, fund):
+    client, user = make_user()
+    fund(client, 12.34)
+    fund(client, 0.66)
+
+    with app.app_context():
+        assert db.session.get(User, user['id']).balance_piasters == 1300
+        assert verify_ledger() == ([], [])
+
+
+def test_every_leg_of_a_posting_is_written_by_one_statement(app, make_user):
+    users = [make_user()[1] for _ in range(3)]
+    inserts = []
+
+    def count(conn, cursor, statement, *args):
+        if statement.startswith('INSERT INTO ledger_entry'):
+            inserts.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            post_balance_changes('bonus', 'system:bonuses', [(user['id'], 250, None) for user in users])
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        assert len(inserts) == 1
+        assert LedgerEntry.query.filter_by(kind='bonus').count() == 6
+        assert verify_ledger() == ([], [])
+
+
+def test_earnings_summary_matches_a_rebuild(app, make_user):
+    _, referrer = make_user(vip_level='V3')
+    client, user = make_user(referrer=referrer, vip_level='V3')
+    for _ in range(3):
+        assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+
+    def summaries():
+        return {
+            row.user_id: (row.task_earnings_piasters, row.referral_earnings_piasters, row.total_earnings_piasters)
+            for row in UserEarnings.query.all()
+        }
+
+    with app.app_context():
+        kept = summaries()
+        assert kept[user['id']] == (156000, 0, 156000)
+        rebuild_user_earnings()
+        db.session.commit()
+        assert summaries() == kept
+
+
+def test_convert_money_fills_earnings_written_before_the_piaster_columns(app, make_user):
+    client, user = make_user(vip_level='V3')
+    assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+
+    with app.app_context():
+        db.session.execute(db.update(UserEarnings).values(
+            task_earnings_piasters=None, referral_earnings_piasters=None, total_earnings_piasters=None
+        ))
+        db.session.commit()
+        assert db.session.get(User, user['id']).get_task_earnings() == 520
+
+        assert convert_money_columns(10)['user_earnings'] == 3
+        earnings = db.session.get(UserEarnings, user['id'])
+        assert (earnings.task_earnings_piasters, earnings.total_earnings_piasters) == (52000, 52000)
@@ -0,0 +1,46 @@
+from src.models.user import db, User, Transaction
+from src.models.outbox import OutboxEvent, process_outbox_once, claim_outbox_batch, deliver_outbox_batch
+from src.models.ledger import verify_ledger
+
+
+def complete_task(client):
+    assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+
+
+def balance(app, user):
+    with app.app_context():
+        return db.session.get(User, user['id']).balance_piasters
+
+
+def test_commissions_are_paid_once_when_the_outbox_is_processed(app, make_user):
+    _, grandparent = make_user()
+    _, parent = make_user(referrer=grandparent)
+    client, _ = make_user(referrer=parent, vip_level='V3')
+    complete_task(client)
+
+    # The task committed, its commissions wait in the outbox
+    assert balance(app, parent) == 0
+    with app.app_context():
+        assert process_outbox_once(app) == (1, 1)
+        assert process_outbox_once(app) == (0, 0)
+        assert OutboxEvent.query.one().status == 'done'
+        assert Transaction.query.filter_by(type='referral_commission').count() == 2
+        assert verify_ledger() == ([], [])
+    assert (balance(app, parent), balance(app, grandparent)) == (5200, 1560)
+
+
+def test_a_worker_whose_lease_ran_out_cannot_deliver(app, make_user):
+    _, parent = make_user()
+    client, _ = make_user(referrer=parent, vip_level='V3')
+    complete_task(client)
+
+    with app.app_context():
+        stale = claim_outbox_batch(10, lease_seconds=-1)
+        current = claim_outbox_batch(10, lease_seconds=30)
+        assert [row.id for row in stale] == [row.id for row in current]
+
+        assert deliver_outbox_batch(stale) == 0
+        assert balance(app, parent) == 0
+        assert deliver_outbox_batch(current) == 1
+        assert deliver_outbox_batch(current) == 0
+    assert balance(app, parent) == 5200
@@ -0,0 +1,45 @@
+def request_topup(client):
+    response = client.post('/api/transactions/topup', json={'amount': 5, 'payment_method': 'bank_transfer'})
+    return response.get_json()['transaction']['id']
+
+
+def test_cursor_pages_cover_the_history_once_newest_first(app, make_user):
+    client, _ = make_user()
+    ids = [request_topup(client) for _ in range(7)]
+
+    seen = []
+    page = client.get('/api/transactions/history?limit=3').get_json()
+    while True:
+        seen += [t['id'] for t in page['transactions']]
+        if page['next_cursor'] is None:
+            break
+        # Rows added between pages do not shift the pages still to come
+        request_topup(client)
+        page = client.get(f"/api/transactions/history?limit=3&cursor={page['next_cursor']}").get_json()
+
+    assert seen == ids[::-1]
+
+
+def test_an_invalid_cursor_is_a_400(app, make_user):
+    client, _ = make_user()
+    assert client.get('/api/transactions/history?cursor=not-a-cursor').status_code == 400
+
+
+def test_old_page_parameters_still_work_with_a_total(app, make_user):
+    client, _ = make_user()
+    ids = [request_topup(client) for _ in range(5)]
+
+    second = client.get('/api/transactions/history?page=2&per_page=2').get_json()
+    assert [t['id'] for t in second['transactions']] == ids[::-1][2:4]
+    assert (second['current_page'], second['total'], second['pages']) == (2, 5, 3)
+
+
+def test_task_history_pages_by_cursor(app, make_user):
+    client, _ = make_user(vip_level='V3')
+    for _ in range(3):
+        assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+
+    first = client.get('/api/tasks/history?per_page=2').get_json()
+    rest = client.get(f"/api/tasks/history?per_page=2&cursor={first['next_cursor']}").get_json()
+    assert len(first['tasks']) + len(rest['tasks']) == 3
+    assert rest['next_cursor'] is None and 'total' not in rest
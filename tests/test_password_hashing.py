@@ -0,0 +1,51 @@
+import pytest
+
+from src.models import user as user_model
+from src.models.passwords import PasswordHashingBusy
+from src.models.user import db, User
+
+
+@pytest.fixture
+def saturate_pool(monkeypatch):
+    """Make every hash and verify fail the way a saturated pool does, monkeypatch.undo() lifts it"""
+    def busy(*args):
+        raise PasswordHashingBusy()
+
+    def saturate():
+        monkeypatch.setattr(user_model, 'hash_password', busy)
+        monkeypatch.setattr(user_model, 'verify_password', busy)
+
+    return saturate
+
+
+def assert_busy(response):
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_a_saturated_pool_is_a_503_and_registers_no_one(app, saturate_pool):
+    saturate_pool()
+
+    assert_busy(app.test_client().post('/api/auth/register', json={'phone': '01099999999', 'password': 'secret'}))
+    with app.app_context():
+        assert User.query.filter_by(phone='01099999999').count() == 0
+
+
+def test_a_saturated_pool_is_a_503_on_every_password_route(app, make_user, fund, saturate_pool, monkeypatch):
+    client, user = make_user()
+    fund(client, 1500)
+    assert client.post('/api/auth/set-payment-password', json={'payment_password': '1234'}).status_code == 200
+    subscribe = {'level': 'V1', 'payment_password': '1234'}
+    saturate_pool()
+
+    assert_busy(client.post('/api/auth/login', json={'phone': user['phone'], 'password': 'secret'}))
+    assert_busy(client.post('/api/auth/change-password', json={'current_password': 'secret', 'new_password': 'other'}))
+    assert_busy(client.post('/api/auth/set-payment-password', json={'payment_password': '5678'}))
+    assert_busy(client.post('/api/vip/subscribe', json=subscribe, headers={'Idempotency-Key': 'subscribe'}))
+
+    # Nothing was written and the idempotency key was released, so the retry runs
+    monkeypatch.undo()
+    response = client.post('/api/vip/subscribe', json=subscribe, headers={'Idempotency-Key': 'subscribe'})
+    assert response.status_code == 200, response.get_json()
+    with app.app_context():
+        assert db.session.get(User, user['id']).vip_level == 'V1'
@@ -0,0 +1,37 @@
+from src.models.user import db, Referral, get_upline
+
+
+def test_registration_links_every_ancestor_up_to_the_configured_depth(app, make_user):
+    users = [make_user()[1]]
+    for _ in range(4):
+        users.append(make_user(referrer=users[-1])[1])
+
+    with app.app_context():
+        rows = db.session.query(Referral.referrer_id, Referral.level, Referral.commission_rate).filter(
+            Referral.referred_id == users[-1]['id']
+        ).order_by(Referral.level).all()
+    assert rows == [(users[3]['id'], 1, 0.10), (users[2]['id'], 2, 0.03), (users[1]['id'], 3, 0.01)]
+
+
+def test_upline_applies_the_current_depth_and_rates(app, make_user):
+    _, grandparent = make_user()
+    _, parent = make_user(referrer=grandparent)
+    _, child = make_user(referrer=parent)
+
+    with app.app_context():
+        assert get_upline(child['id']) == ((parent['id'], 1, 0.10), (grandparent['id'], 2, 0.03))
+
+        rates, depth = app.config['REFERRAL_COMMISSION_RATES'], app.config['REFERRAL_MAX_DEPTH']
+        app.config['REFERRAL_COMMISSION_RATES'] = (0.2,)
+        app.config['REFERRAL_MAX_DEPTH'] = 1
+        try:
+            # The ancestors are cached, the depth and rates are not
+            assert get_upline(child['id']) == ((parent['id'], 1, 0.2),)
+        finally:
+            app.config['REFERRAL_COMMISSION_RATES'], app.config['REFERRAL_MAX_DEPTH'] = rates, depth
+
+
+def test_users_without_a_referrer_have_no_upline(app, make_user):
+    _, user = make_user()
+    with app.app_context():
+        assert get_upline(user['id']) == ()
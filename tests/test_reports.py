@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from src.models.user import db
+from src.models.outbox import process_outbox_once
+from src.models.reports import DailyReport, rebuild_daily_reports
+
+
+def report_rows():
+    return sorted((row.metric, row.day, row.count, row.amount_piasters) for row in DailyReport.query.all())
+
+
+def test_reports_recorded_as_things_happen_match_a_backfill(app, make_user, admin_client, fund):
+    _, parent = make_user()
+    client, child = make_user(referrer=parent, vip_level='V3')
+    fund(client, 12.34)
+    assert client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code == 201
+    withdrawal = client.post('/api/transactions/withdraw', json={'amount': 2}).get_json()['transaction']['id']
+    admin = admin_client()
+    assert admin.post('/api/admin/transactions/approve', json={'transaction_id': withdrawal}).status_code == 200
+    assert admin.post('/api/admin/users/toggle_status', json={'user_id': parent['id'], 'action': 'freeze'}).status_code == 200
+    with app.app_context():
+        process_outbox_once(app)
+
+    report = admin.get('/api/admin/reports').get_json()
+    assert report == {
+        'total_users': 2,
+        'active_users': 1,
+        'total_deposits': 12.34,
+        'total_withdrawals': 2.0,
+        'total_task_rewards': 520.0,
+        'total_referral_commissions': 52.0
+    }
+
+    with app.app_context():
+        recorded = report_rows()
+        rebuild_daily_reports()
+        assert report_rows() == recorded
+
+
+def test_report_series_are_zero_filled_per_day(app, make_user, admin_client):
+    make_user()
+    today = datetime.utcnow().date()
+    admin = admin_client()
+
+    response = admin.get(f'/api/admin/reports/series?metrics=signups,topups&date_from={(today - timedelta(days=2)).isoformat()}')
+    series = response.get_json()['series']
+    assert [point['count'] for point in series['signups']] == [0, 0, 1]
+    assert [point['amount'] for point in series['topups']] == [0, 0, 0]
+
+    assert admin.get('/api/admin/reports/series?metrics=nope').status_code == 400
+    assert admin.get(f'/api/admin/reports/series?date_from={today.isoformat()}&date_to=2000-01-01').status_code == 400
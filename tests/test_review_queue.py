@@ -0,0 +1,82 @@
+from src.models.user import db, User, Transaction
+from src.models.ledger import verify_ledger
+
+
+def request_topups(client, count):
+    ids = []
+    for _ in range(count):
+        response = client.post('/api/transactions/topup', json={'amount': 10, 'payment_method': 'bank_transfer'})
+        ids.append(response.get_json()['transaction']['id'])
+    return ids
+
+
+def claim(admin, **data):
+    response = admin.post('/api/admin/transactions/queue/claim', json=data)
+    assert response.status_code == 200
+    return [t['id'] for t in response.get_json()['transactions']]
+
+
+def decide(admin, decisions):
+    response = admin.post('/api/admin/transactions/queue/decide', json={'decisions': [
+        {'transaction_id': transaction_id, 'action': action} for transaction_id, action in decisions.items()
+    ]})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_admins_claim_disjoint_batches_oldest_first(app, make_user, admin_client):
+    client, _ = make_user()
+    ids = request_topups(client, 3)
+    first, second = admin_client('first'), admin_client('second')
+
+    assert claim(first, limit=2) == ids[:2]
+    assert claim(second, limit=2) == ids[2:]
+    # Claiming again renews the admin's own leases
+    assert claim(first, limit=2) == ids[:2]
+
+
+def test_only_the_lease_holder_decides(app, make_user, admin_client):
+    client, user = make_user()
+    ids = request_topups(client, 2)
+    first, second = admin_client('first'), admin_client('second')
+    claim(first)
+
+    assert decide(second, {ids[0]: 'approve'})['skipped'] == [ids[0]]
+    result = decide(first, {ids[0]: 'approve', ids[1]: 'reject'})
+    assert result['decided'] == [{'id': ids[0], 'status': 'completed'}, {'id': ids[1], 'status': 'rejected'}]
+    assert decide(first, {ids[0]: 'approve'})['skipped'] == [ids[0]]
+
+    with app.app_context():
+        assert db.session.get(User, user['id']).balance_piasters == 1000
+        assert all(db.session.get(Transaction, transaction_id).decided_at for transaction_id in ids)
+
+
+def test_released_rows_go_back_to_the_queue(app, make_user, admin_client):
+    client, _ = make_user()
+    ids = request_topups(client, 1)
+    first, second = admin_client('first'), admin_client('second')
+    claim(first)
+
+    response = first.post('/api/admin/transactions/queue/release', json={'transaction_ids': ids})
+    assert response.get_json() == {'released': 1}
+    assert claim(second) == ids
+
+
+def test_unfunded_withdrawal_returns_to_the_queue(app, make_user, admin_client, fund):
+    client, user = make_user()
+    fund(client, 50)
+    withdrawals = [
+        client.post('/api/transactions/withdraw', json={'amount': 40}).get_json()['transaction']['id']
+        for _ in range(2)
+    ]
+    admin = admin_client()
+    claim(admin, type='withdrawal')
+
+    result = decide(admin, {transaction_id: 'approve' for transaction_id in withdrawals})
+    assert result['decided'] == [{'id': withdrawals[0], 'status': 'completed'}]
+    assert result['insufficient_balance'] == [withdrawals[1]]
+    with app.app_context():
+        unfunded = db.session.get(Transaction, withdrawals[1])
+        assert (unfunded.status, unfunded.claimed_by, unfunded.decided_at) == ('pending', None, None)
+        assert db.session.get(User, user['id']).balance_piasters == 1000
+        assert verify_ledger() == ([], [])
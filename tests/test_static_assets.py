@@ -0,0 +1,22 @@
+import pytest
+
+from src.routes.static_assets import StaticAssetIndex
+
+
+@pytest.mark.parametrize('path, hashed', [
+    ('assets/index-BRYSvtWK.js', True),
+    ('assets/index-CL7jBThG.css', True),
+    ('assets/vendor-a1_B2c3D.js', True),
+    ('site-manifest.json', False),
+    ('assets/logo.svg', False),
+    ('assets/apple-touch-icon.png', False),
+    ('assets/index-BRYSvtW.js', False),
+    ('index-BRYSvtWK.js', False),
+    ('favicon.ico', False),
+])
+def test_only_vite_hashed_build_output_is_immutable(tmp_path, path, hashed):
+    file_path = tmp_path / path
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    file_path.write_text('x')
+
+    assert StaticAssetIndex(str(tmp_path)).assets[path].hashed is hashed
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from src.models.user import db, UserCounters, UserTask, rebuild_daily_task_counts, rebuild_user_counters
+
+
+def test_summary_counters_follow_every_write_and_match_a_rebuild(app, make_user, admin_client, fund):
+    client, user = make_user()
+    fund(client, 50)
+    fund(client, 20)
+    withdrawal = client.post('/api/transactions/withdraw', json={'amount': 10}).get_json()['transaction']['id']
+    client.post('/api/transactions/topup', json={'amount': 5, 'payment_method': 'vodafone_cash'})
+    assert admin_client().post('/api/admin/transactions/reject', json={'transaction_id': withdrawal}).status_code == 200
+
+    summary = client.get('/api/transactions/summary').get_json()
+    assert summary == {'total_topups': 2, 'total_withdrawals': 0, 'pending_transactions': 1, 'rejected_transactions': 1}
+
+    with app.app_context():
+        kept = db.session.get(UserCounters, user['id']).to_dict()
+        rebuild_user_counters()
+        rebuilt = db.session.get(UserCounters, user['id']).to_dict()
+        assert {**rebuilt, 'updated_at': None} == {**kept, 'updated_at': None}
+
+
+def test_weekly_and_monthly_stats_are_rolling_windows(app, make_user):
+    client, user = make_user()
+    now = datetime.utcnow()
+    with app.app_context():
+        for hours_ago in (1, 7 * 24 - 1, 7 * 24 + 1, 30 * 24 - 1, 30 * 24 + 1):
+            db.session.add(UserTask(
+                user_id=user['id'], task_type='survey', reward_amount=1, reward_piasters=100,
+                completed_at=now - timedelta(hours=hours_ago)
+            ))
+        db.session.commit()
+        rebuild_daily_task_counts()
+        db.session.commit()
+
+    stats = client.get('/api/tasks/stats').get_json()
+    assert (stats['weekly_tasks'], stats['monthly_tasks']) == (2, 4)
@@ -0,0 +1,48 @@
+from collections import Counter
+from datetime import date, timedelta
+import threading
+
+from src.models.user import db, UserTask, UserDailyTaskCount, claim_daily_task_slot
+from src.models.ledger import verify_ledger
+
+
+def test_parallel_completions_stop_at_the_daily_limit(app, make_user):
+    _, user = make_user(vip_level='V3')  # 4 tasks a day
+    statuses = Counter()
+    statuses_lock = threading.Lock()
+    start = threading.Barrier(8)
+
+    def worker():
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user['id']
+        start.wait()
+        for _ in range(3):
+            status = client.post('/api/tasks/complete-task', json={'task_type': 'survey'}).status_code
+            with statuses_lock:
+                statuses[status] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == {201: 4, 400: 20}
+    with app.app_context():
+        assert UserTask.query.filter_by(user_id=user['id']).count() == 4
+        assert db.session.query(db.func.sum(UserDailyTaskCount.count)).filter_by(user_id=user['id']).scalar() == 4
+        assert verify_ledger() == ([], [])
+
+
+
+def test_slots_are_counted_per_day(app, make_user):
+    _, user = make_user()
+    today = date.today()
+    with app.app_context():
+        assert claim_daily_task_slot(user['id'], 2, today - timedelta(days=1))
+        assert claim_daily_task_slot(user['id'], 2, today - timedelta(days=1))
+        assert not claim_daily_task_slot(user['id'], 2, today - timedelta(days=1))
+        assert claim_daily_task_slot(user['id'], 2, today)
+        assert not claim_daily_task_slot(user['id'], 0, today)
+        db.session.commit()
@@ -0,0 +1,38 @@
+from src.models.user import db, TeamStats, Transaction, rebuild_team_stats
+
+
+def team_rows(referrer_id):
+    return sorted(
+        (row.level, row.members, row.topup_piasters)
+        for row in TeamStats.query.filter_by(referrer_id=referrer_id).all()
+    )
+
+
+def test_team_topups_are_rolled_up_per_level_as_they_are_approved(app, make_user, fund):
+    leader_client, leader = make_user()
+    child_client, child = make_user(referrer=leader)
+    grandchild_client, _ = make_user(referrer=child)
+    fund(child_client, 100)
+    fund(grandchild_client, 12.34)
+    # Pending topups do not count
+    grandchild_client.post('/api/transactions/topup', json={'amount': 99, 'payment_method': 'vodafone_cash'})
+
+    earnings = leader_client.get('/api/transactions/earnings').get_json()
+    assert (earnings['level_1_referrals'], earnings['total_team_referrals']) == (1, 2)
+    assert (earnings['level_1_topup_amount'], earnings['total_team_topup_amount']) == (100, 112.34)
+
+    with app.app_context():
+        kept = team_rows(leader['id'])
+        assert kept == [(1, 1, 10000), (2, 1, 1234)]
+        rebuild_team_stats()
+        assert team_rows(leader['id']) == kept
+
+
+def test_team_rebuild_counts_topups_from_before_the_piaster_columns(app, make_user):
+    _, leader = make_user()
+    _, child = make_user(referrer=leader)
+    with app.app_context():
+        db.session.add(Transaction(user_id=child['id'], type='topup', amount=0.29, status='completed'))
+        db.session.commit()
+        rebuild_team_stats()
+        assert team_rows(leader['id']) == [(1, 1, 29)]
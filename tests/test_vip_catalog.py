@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from src.models import vip_catalog
+from src.models.user import db, VIPPackage
+from src.models.vip_catalog import get_vip_catalog
+
+
+@pytest.fixture
+def catalog(app, tmp_path, monkeypatch):
+    """A freshly loaded catalog with its own stamp file, V1 is put back afterwards"""
+    monkeypatch.setitem(app.config, 'VIP_CATALOG_STAMP_FILE', str(tmp_path / 'vip_catalog.stamp'))
+    with app.app_context():
+        reward = VIPPackage.query.filter_by(level='V1').one().daily_reward
+        vip_catalog.load_vip_catalog()
+        yield
+        db.session.rollback()
+        db.session.execute(db.update(VIPPackage).where(VIPPackage.level == 'V1').values(daily_reward=reward))
+        db.session.commit()
+        vip_catalog.load_vip_catalog()
+
+
+def set_v1_reward(reward):
+    VIPPackage.query.filter_by(level='V1').one().daily_reward = reward
+
+
+def test_a_committed_package_edit_reloads_the_catalog(app, catalog):
+    before = get_vip_catalog()
+    set_v1_reward(123)
+    db.session.commit()
+
+    after = get_vip_catalog()
+    assert after is not before
+    assert after.get_daily_reward('V1') == 123
+    assert os.path.exists(app.config['VIP_CATALOG_STAMP_FILE'])
+
+
+def test_a_rolled_back_package_edit_keeps_the_catalog(app, catalog):
+    before = get_vip_catalog()
+    set_v1_reward(123)
+    db.session.flush()
+    db.session.rollback()
+
+    assert get_vip_catalog() is before
+
+
+def test_an_edit_in_another_worker_is_noticed_through_the_stamp_file(app, catalog, monkeypatch):
+    monkeypatch.setitem(app.config, 'VIP_CATALOG_CHECK_INTERVAL', 0)
+    before = get_vip_catalog()
+    # Another worker's commit: the row changes and the stamp file is touched, this worker's copy stays
+    db.session.execute(db.update(VIPPackage).where(VIPPackage.level == 'V1').values(daily_reward=123))
+    db.session.commit()
+    assert get_vip_catalog() is before
+    with open(app.config['VIP_CATALOG_STAMP_FILE'], 'w') as f:
+        f.write('other worker')
+
+    assert get_vip_catalog().get_daily_reward('V1') == 123
+
+
+def test_package_responses_follow_the_catalog(app, catalog):
+    client = app.test_client()
+    assert client.get('/api/vip/packages/V1').get_json()['package']['daily_reward'] != 123
+    set_v1_reward(123)
+    db.session.commit()
+
+    assert client.get('/api/vip/packages/V1').get_json()['package']['daily_reward'] == 123
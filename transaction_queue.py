@@ -0,0 +1,161 @@
+from src.models.user import db, Transaction, bump_user_counters, record_team_topup
+from src.models.ledger import post_balance_changes, transaction_piasters, current_balance, user_table
+from src.models.ledger import DEPOSITS_ACCOUNT, WITHDRAWALS_ACCOUNT
+from src.models.reports import record_reports
+from src.models.admin_events import publish_admin_event
+from datetime import datetime, timedelta
+
+# Review queue settings, overridable through the TRANSACTION_QUEUE_* app config keys
+DEFAULT_LEASE = 300  # seconds a claimed batch is reserved for its admin
+DEFAULT_CLAIM_SIZE = 20
+MAX_CLAIM_SIZE = 100
+
+QUEUE_TYPES = ('topup', 'withdrawal')
+DECISIONS = {'approve': 'completed', 'reject': 'rejected'}
+
+transaction_table = Transaction.__table__
+
+
+def _claimable(admin, now):
+    """Pending rows nobody holds a live lease on, or that admin holds"""
+    return db.or_(
+        transaction_table.c.claimed_until.is_(None),
+        transaction_table.c.claimed_until < now,
+        transaction_table.c.claimed_by == admin
+    )
+
+
+def claim_transactions(admin, transaction_type=None, limit=DEFAULT_CLAIM_SIZE, lease_seconds=DEFAULT_LEASE):
+    """Lease up to limit of the oldest pending topups and withdrawals to an admin, returns the claimed Transactions.
+
+    The oldest due rows are picked off the (type, status, created_at, id)
+    index and leased by one UPDATE, so two admins claiming at once always get
+    different rows. Rows another admin holds a live lease on are skipped;
+    the admin's own are renewed and returned again.
+    """
+    now = datetime.utcnow()
+    types = (transaction_type,) if transaction_type else QUEUE_TYPES
+    due = db.select(transaction_table.c.id).where(
+        transaction_table.c.type.in_(types),
+        transaction_table.c.status == 'pending',
+        _claimable(admin, now)
+    ).order_by(transaction_table.c.created_at, transaction_table.c.id).limit(limit).scalar_subquery()
+
+    claimed_ids = db.session.scalars(
+        db.update(transaction_table).where(transaction_table.c.id.in_(due)).values(
+            claimed_by=admin, claimed_until=now + timedelta(seconds=lease_seconds)
+        ).returning(transaction_table.c.id)
+    ).all()
+    db.session.commit()
+    if not claimed_ids:
+        return []
+    return Transaction.query.filter(Transaction.id.in_(claimed_ids)).order_by(
+        Transaction.created_at, Transaction.id
+    ).all()
+
+
+def release_transactions(admin, transaction_ids):
+    """Hand the admin's leases on the given rows back to the queue, returns how many were released"""
+    result = db.session.execute(db.update(transaction_table).where(
+        transaction_table.c.id.in_(transaction_ids),
+        transaction_table.c.status == 'pending',
+        transaction_table.c.claimed_by == admin
+    ).values(claimed_by=None, claimed_until=None))
+    db.session.commit()
+    return result.rowcount
+
+
+def decide_transactions(admin, decisions, require_claim=True):
+    """Approve or reject pending transactions with one conditional UPDATE, in the caller's transaction.
+
+    ``decisions`` maps transaction ids to 'approve' or 'reject'. Only rows
+    still pending and leased to the admin are decided (with require_claim
+    off, rows nobody else holds a live lease on), so a decision can never
+    land twice. Approved topups credit and approved withdrawals debit the
+    users' balances. A withdrawal the user's balance no longer covers goes
+    back to the queue unclaimed. Returns (decided rows, unfunded withdrawal
+    ids); ids in neither were not decidable.
+    """
+    if not decisions:
+        return [], []
+    now = datetime.utcnow()
+    lease = (
+        db.and_(transaction_table.c.claimed_by == admin, transaction_table.c.claimed_until >= now)
+        if require_claim else _claimable(admin, now)
+    )
+    decided = db.session.execute(
+        db.update(transaction_table).where(
+            transaction_table.c.id.in_(decisions),
+            transaction_table.c.status == 'pending',
+            lease
+        ).values(
+            status=db.case(
+                {transaction_id: DECISIONS[action] for transaction_id, action in decisions.items()},
+                value=transaction_table.c.id
+            ),
+            claimed_by=None,
+            claimed_until=None,
+            decided_at=now,
+            updated_at=now
+        ).returning(
+            transaction_table.c.id,
+            transaction_table.c.user_id,
+            transaction_table.c.type,
+            transaction_table.c.status,
+            transaction_table.c.amount,
+            transaction_table.c.amount_piasters
+        )
+    ).all()
+    decided.sort(key=lambda row: row.id)
+
+    # The UPDATE holds SQLite's write lock, so these balances cannot move
+    # before the withdrawals below are posted
+    withdrawals = [row for row in decided if row.type == 'withdrawal' and row.status == 'completed']
+    unfunded = []
+    if withdrawals:
+        balances = dict(db.session.execute(
+            db.select(user_table.c.id, current_balance).where(user_table.c.id.in_({row.user_id for row in withdrawals}))
+        ).all())
+        for row in withdrawals:
+            amount_piasters = transaction_piasters(row)
+            if balances.get(row.user_id, 0) >= amount_piasters:
+                balances[row.user_id] -= amount_piasters
+            else:
+                unfunded.append(row.id)
+        if unfunded:
+            db.session.execute(db.update(transaction_table).where(
+                transaction_table.c.id.in_(unfunded)
+            ).values(status='pending', decided_at=None))
+            decided = [row for row in decided if row.id not in unfunded]
+
+    # Move the money: topups credit the user, withdrawals debit them
+    approved = [row for row in decided if row.status == 'completed']
+    post_balance_changes('topup', DEPOSITS_ACCOUNT, [
+        (row.user_id, transaction_piasters(row), row.id) for row in approved if row.type == 'topup'
+    ])
+    post_balance_changes('withdrawal', WITHDRAWALS_ACCOUNT, [
+        (row.user_id, -transaction_piasters(row), row.id) for row in approved if row.type == 'withdrawal'
+    ])
+
+    counters = {}
+    for row in decided:
+        user_counters = counters.setdefault(row.user_id, {'transactions_pending': 0})
+        user_counters['transactions_pending'] -= 1
+        if row.status == 'rejected':
+            column = 'transactions_rejected'
+        elif row.type == 'topup':
+            column = 'topups_completed'
+            record_team_topup(row.user_id, transaction_piasters(row))
+        else:
+            column = 'withdrawals_completed'
+        user_counters[column] = user_counters.get(column, 0) + 1
+        publish_admin_event('transaction_status', {'id': row.id, 'status': row.status})
+    for user_id, deltas in counters.items():
+        bump_user_counters(user_id, **deltas)
+
+    today = now.date()
+    record_reports(
+        ('topups' if row.type == 'topup' else 'withdrawals', today, 1, transaction_piasters(row))
+        for row in approved
+    )
+    return decided, unfunded
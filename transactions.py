@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify, session
-from src.models.user import db, User, Transaction, Referral
-from datetime import datetime, timedelta
+from src.models.user import db, User, UserTask, Transaction, TeamStats, bump_user_counters, get_user_counters, money_piasters
+from src.models.ledger import to_piasters, from_piasters, apply_rate
+from src.models.commissions import CommissionRollup, commission_details_query
+from src.models.admin_events import publish_admin_event
+from src.routes.idempotency import idempotent
+from src.routes.pagination import paginate_history, keyset_page, get_page_size
+from datetime import datetime, timedelta, date
 import os
 from werkzeug.utils import secure_filename
 
@@ -12,29 +17,8 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def calculate_referral_commissions(user, amount):
-    """Calculate and create referral commissions"""
-    referrals = Referral.query.filter_by(referred_id=user.id).all()
-    
-    for referral in referrals:
-        commission_amount = amount * referral.commission_rate
-        
-        # Create commission transaction
-        commission_transaction = Transaction(
-            user_id=referral.referrer_id,
-            type='referral_commission',
-            amount=commission_amount,
-            status='completed',
-            description=f'عمولة إحالة من المستوى {referral.level} - {user.phone}'
-        )
-        db.session.add(commission_transaction)
-        
-        # Add to referrer's balance
-        referrer = User.query.get(referral.referrer_id)
-        if referrer:
-            referrer.balance += commission_amount
-
 @transactions_bp.route('/topup', methods=['POST'])
+@idempotent
 def create_topup():
     if 'user_id' not in session:
         return jsonify({'error': 'غير مسجل الدخول'}), 401
@@ -45,10 +29,11 @@ def create_topup():
         if not data or not data.get('amount') or not data.get('payment_method'):
             return jsonify({'error': 'المبلغ وطريقة الدفع مطلوبان'}), 400
         
-        amount = float(data['amount'])
+        amount_piasters = to_piasters(float(data['amount']))
+        amount = from_piasters(amount_piasters)
         payment_method = data['payment_method']
         
-        if amount <= 0:
+        if amount_piasters <= 0:
             return jsonify({'error': 'المبلغ يجب أن يكون أكبر من صفر'}), 400
         
         if payment_method not in ['vodafone_cash', 'bank_transfer']:
@@ -59,12 +44,16 @@ def create_topup():
             user_id=session['user_id'],
             type='topup',
             amount=amount,
+            amount_piasters=amount_piasters,
             status='pending',
             payment_method=payment_method,
             description=f'طلب شحن رصيد بمبلغ {amount} جنيه'
         )
         
         db.session.add(transaction)
+        bump_user_counters(transaction.user_id, transactions_pending=1)
+        db.session.flush()
+        publish_admin_event('transaction_created', transaction.to_dict())
         db.session.commit()
         
         return jsonify({
@@ -123,6 +112,7 @@ def upload_receipt(transaction_id):
         return jsonify({'error': 'حدث خطأ في رفع الإيصال'}), 500
 
 @transactions_bp.route('/withdraw', methods=['POST'])
+@idempotent
 def create_withdrawal():
     if 'user_id' not in session:
         return jsonify({'error': 'غير مسجل الدخول'}), 401
@@ -133,16 +123,19 @@ def create_withdrawal():
         if not data or not data.get('amount'):
             return jsonify({'error': 'المبلغ مطلوب'}), 400
         
-        amount = float(data['amount'])
+        amount_piasters = to_piasters(float(data['amount']))
+        amount = from_piasters(amount_piasters)
         
-        if amount <= 0:
+        if amount_piasters <= 0:
             return jsonify({'error': 'المبلغ يجب أن يكون أكبر من صفر'}), 400
         
         user = User.query.get(session['user_id'])
         if not user:
             return jsonify({'error': 'المستخدم غير موجود'}), 404
         
-        if user.balance < amount:
+        # balance_piasters is NULL until the money migration reaches the user
+        balance_piasters = user.balance_piasters if user.balance_piasters is not None else to_piasters(user.balance)
+        if balance_piasters < amount_piasters:
             return jsonify({'error': 'الرصيد غير كافي'}), 400
         
         # Create withdrawal transaction
@@ -150,11 +143,15 @@ def create_withdrawal():
             user_id=user.id,
             type='withdrawal',
             amount=amount,
+            amount_piasters=amount_piasters,
             status='pending',
             description=f'طلب سحب أرباح بمبلغ {amount} جنيه'
         )
         
         db.session.add(transaction)
+        bump_user_counters(transaction.user_id, transactions_pending=1)
+        db.session.flush()
+        publish_admin_event('transaction_created', transaction.to_dict())
         db.session.commit()
         
         return jsonify({
@@ -173,25 +170,24 @@ def get_transaction_history():
     
     try:
         transaction_type = request.args.get('type', 'all')
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 20))
         
         query = Transaction.query.filter_by(user_id=session['user_id'])
         
         if transaction_type != 'all':
             query = query.filter_by(type=transaction_type)
         
-        transactions = query.order_by(Transaction.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
+        transactions, pagination = paginate_history(
+            query, Transaction.created_at, Transaction.id, request.args,
+            total_key=('transactions', session['user_id'], transaction_type)
         )
         
         return jsonify({
-            'transactions': [t.to_dict() for t in transactions.items],
-            'total': transactions.total,
-            'pages': transactions.pages,
-            'current_page': page
+            'transactions': [t.to_dict() for t in transactions],
+            **pagination
         }), 200
         
+    except ValueError:
+        return jsonify({'error': 'معاملات غير صحيحة'}), 400
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في جلب السجلات'}), 500
 
@@ -201,30 +197,13 @@ def get_transaction_summary():
         return jsonify({'error': 'غير مسجل الدخول'}), 401
     
     try:
-        user_id = session['user_id']
-        
-        # Get summary counts
-        total_topups = Transaction.query.filter_by(
-            user_id=user_id, type='topup', status='completed'
-        ).count()
-        
-        total_withdrawals = Transaction.query.filter_by(
-            user_id=user_id, type='withdrawal', status='completed'
-        ).count()
-        
-        pending_transactions = Transaction.query.filter_by(
-            user_id=user_id, status='pending'
-        ).count()
-        
-        rejected_transactions = Transaction.query.filter_by(
-            user_id=user_id, status='rejected'
-        ).count()
+        counters = get_user_counters(session['user_id'])
         
         return jsonify({
-            'total_topups': total_topups,
-            'total_withdrawals': total_withdrawals,
-            'pending_transactions': pending_transactions,
-            'rejected_transactions': rejected_transactions
+            'total_topups': counters.topups_completed,
+            'total_withdrawals': counters.withdrawals_completed,
+            'pending_transactions': counters.transactions_pending,
+            'rejected_transactions': counters.transactions_rejected
         }), 200
         
     except Exception as e:
@@ -240,41 +219,25 @@ def get_earnings():
         if not user:
             return jsonify({'error': 'المستخدم غير موجود'}), 404
         
-        # Get referral statistics
-        level_1_referrals = Referral.query.filter_by(
-            referrer_id=user.id, level=1
-        ).count()
-        
-        # Get total team referrals (all levels)
-        total_team_referrals = Referral.query.filter_by(
-            referrer_id=user.id
-        ).count()
-        
-        # Get level 1 topup amount
-        level_1_topup_amount = 0
-        level_1_referred_users = [r.referred_id for r in Referral.query.filter_by(
-            referrer_id=user.id, level=1
-        ).all()]
-        
-        if level_1_referred_users:
-            level_1_topup_amount = db.session.query(db.func.sum(Transaction.amount)).filter(
-                Transaction.user_id.in_(level_1_referred_users),
-                Transaction.type == 'topup',
-                Transaction.status == 'completed'
-            ).scalar() or 0
-        
-        # Get total team topup amount
-        all_referred_users = [r.referred_id for r in Referral.query.filter_by(
-            referrer_id=user.id
-        ).all()]
-        
-        total_team_topup_amount = 0
-        if all_referred_users:
-            total_team_topup_amount = db.session.query(db.func.sum(Transaction.amount)).filter(
-                Transaction.user_id.in_(all_referred_users),
-                Transaction.type == 'topup',
-                Transaction.status == 'completed'
-            ).scalar() or 0
+        # Team sizes and topup totals per level, from the per-referrer rollups
+        team = TeamStats.query.filter_by(referrer_id=user.id).all()
+        level_1 = next((t for t in team if t.level == 1), None)
+        
+        level_1_referrals = level_1.members if level_1 else 0
+        total_team_referrals = sum(t.members for t in team)
+        level_1_topup_amount = from_piasters(level_1.topup_piasters) if level_1 else 0
+        total_team_topup_amount = from_piasters(sum(t.topup_piasters for t in team))
+        
+        # Commissions per source level, itemized and rolled-up alike
+        referral_by_level = db.session.query(
+            Transaction.referral_level,
+            db.func.sum(money_piasters(Transaction.amount_piasters, Transaction.amount))
+        ).filter(
+            Transaction.user_id == user.id,
+            Transaction.type == 'referral_commission',
+            Transaction.status == 'completed',
+            Transaction.referral_level.is_not(None)
+        ).group_by(Transaction.referral_level).all()
         
         return jsonify({
             'total_earnings': user.get_total_earnings(),
@@ -283,9 +246,49 @@ def get_earnings():
             'level_1_referrals': level_1_referrals,
             'total_team_referrals': total_team_referrals,
             'level_1_topup_amount': level_1_topup_amount,
-            'total_team_topup_amount': total_team_topup_amount
+            'total_team_topup_amount': total_team_topup_amount,
+            'referral_earnings_by_level': {str(level): from_piasters(total) for level, total in referral_by_level}
         }), 200
         
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في جلب الأرباح'}), 500
 
+@transactions_bp.route('/commissions/<day>/<int:level>', methods=['GET'])
+def get_commission_details(day, level):
+    """Itemize a daily commission roll-up: the downline tasks it was paid on"""
+    if 'user_id' not in session:
+        return jsonify({'error': 'غير مسجل الدخول'}), 401
+    
+    try:
+        day = date.fromisoformat(day)
+        rollup = db.session.get(CommissionRollup, (session['user_id'], level, day))
+        rows, next_cursor = keyset_page(
+            commission_details_query(session['user_id'], level, day),
+            UserTask.completed_at, UserTask.id,
+            cursor=request.args.get('cursor'),
+            limit=get_page_size(request.args.get('limit'))
+        )
+        
+        commissions = []
+        for row in rows:
+            reward_piasters = row.reward_piasters if row.reward_piasters is not None else to_piasters(row.reward_amount)
+            commissions.append({
+                'task_id': row.id,
+                'phone': row.phone,
+                'completed_at': row.completed_at.isoformat(),
+                'reward_amount': from_piasters(reward_piasters),
+                'commission_rate': row.commission_rate,
+                'commission': from_piasters(apply_rate(reward_piasters, row.commission_rate))
+            })
+        
+        # The roll-up being itemized, its amount and commissions are what the pages add up to
+        return jsonify({
+            'rollup': rollup.to_dict() if rollup else None,
+            'commissions': commissions,
+            'next_cursor': next_cursor
+        }), 200
+        
+    except ValueError:
+        return jsonify({'error': 'معاملات غير صحيحة'}), 400
+    except Exception as e:
+        return jsonify({'error': 'حدث خطأ في جلب تفاصيل العمولات'}), 500
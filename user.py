@@ -1,7 +1,9 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
-import secrets
+from functools import lru_cache
+from src.models.passwords import hash_password, verify_password, needs_rehash
 
 db = SQLAlchemy()
 
@@ -13,7 +15,9 @@ class User(db.Model):
     referral_code = db.Column(db.String(10), unique=True, nullable=False)
     referred_by = db.Column(db.String(10), nullable=True)
     nickname = db.Column(db.String(100), nullable=True)
-    balance = db.Column(db.Float, default=0.0)
+    balance = db.Column(db.Float, default=0.0)  # display mirror of balance_piasters
+    # Source of truth, only changed through src.models.ledger; NULL until the money migration reaches the row
+    balance_piasters = db.Column(db.BigInteger, nullable=True, default=0)
     vip_level = db.Column(db.String(10), default='trainee')
     vip_expiry = db.Column(db.DateTime, nullable=True)
     credit_score = db.Column(db.Integer, default=60)
@@ -25,6 +29,7 @@ class User(db.Model):
     transactions = db.relationship('Transaction', backref='user', lazy=True)
     tasks = db.relationship('UserTask', backref='user', lazy=True)
     referrals = db.relationship('Referral', backref='referrer_user', lazy=True, foreign_keys='Referral.referrer_id')
+    earnings = db.relationship('UserEarnings', uselist=False, lazy=True)
 
     def __init__(self, phone, password, referred_by=None):
         self.phone = phone
@@ -33,97 +38,79 @@ class User(db.Model):
         self.referral_code = self.generate_referral_code()
 
     def generate_referral_code(self):
-        """Generate a unique referral code"""
+        """Get a unique referral code, from the pre-generated pool when it has one"""
+        from src.models.referral_codes import claim_referral_code, discard_referral_code, new_referral_code
+        
+        code = claim_referral_code()
+        if code:
+            return code
+        
+        # Pool is empty: fall back to probing the user table
         while True:
-            code = secrets.token_urlsafe(6)[:6].upper()
+            code = new_referral_code()
             if not User.query.filter_by(referral_code=code).first():
+                discard_referral_code(code)
                 return code
 
     def set_password(self, password):
         """Set password hash"""
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        """Check password"""
-        return check_password_hash(self.password_hash, password)
+        """Check password, upgrading the hash to the configured cost when it matches"""
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
     def set_payment_password(self, password):
         """Set payment password hash"""
-        self.payment_password_hash = generate_password_hash(password)
+        self.payment_password_hash = hash_password(password)
 
     def check_payment_password(self, password):
-        """Check payment password"""
-        if not self.payment_password_hash:
+        """Check payment password, upgrading the hash to the configured cost when it matches"""
+        if not self.payment_password_hash or not password:
+            return False
+        if not verify_password(self.payment_password_hash, password):
             return False
-        return check_password_hash(self.payment_password_hash, password)
+        if needs_rehash(self.payment_password_hash):
+            self.set_payment_password(password)
+        return True
 
     def get_total_earnings(self):
-        """Calculate total earnings from all sources"""
-        total = 0
-        for transaction in self.transactions:
-            if transaction.type in ['task_reward', 'referral_commission'] and transaction.status == 'completed':
-                total += transaction.amount
-        return total
+        """Get total earnings from all sources"""
+        return self.earnings.get_amount('total') if self.earnings else 0
 
     def get_referral_earnings(self):
-        """Calculate earnings from referrals"""
-        total = 0
-        for transaction in self.transactions:
-            if transaction.type == 'referral_commission' and transaction.status == 'completed':
-                total += transaction.amount
-        return total
+        """Get earnings from referrals"""
+        return self.earnings.get_amount('referral') if self.earnings else 0
 
     def get_task_earnings(self):
-        """Calculate earnings from tasks"""
-        total = 0
-        for transaction in self.transactions:
-            if transaction.type == 'task_reward' and transaction.status == 'completed':
-                total += transaction.amount
-        return total
+        """Get earnings from tasks"""
+        return self.earnings.get_amount('task') if self.earnings else 0
+
+    def get_tasks_completed_today(self):
+        """Get the number of tasks completed today"""
+        today = datetime.utcnow().date()
+        daily_count = db.session.get(UserDailyTaskCount, (self.id, today))
+        return daily_count.count if daily_count else 0
 
     def can_do_task_today(self):
         """Check if user can do a task today"""
-        today = datetime.utcnow().date()
-        today_tasks = UserTask.query.filter(
-            UserTask.user_id == self.id,
-            db.func.date(UserTask.completed_at) == today
-        ).count()
-        
         # Get max tasks per day based on VIP level
         max_tasks = self.get_max_daily_tasks()
-        return today_tasks < max_tasks
+        return self.get_tasks_completed_today() < max_tasks
 
     def get_max_daily_tasks(self):
         """Get maximum daily tasks based on VIP level"""
-        vip_limits = {
-            'trainee': 1,
-            'V1': 1,
-            'V2': 2,
-            'V3': 4,
-            'V4': 6,
-            'V5': 10,
-            'V6': 15,
-            'V7': 20,
-            'V8': 25,
-            'partner': 100
-        }
-        return vip_limits.get(self.vip_level, 1)
+        from src.models.vip_catalog import get_vip_catalog
+        return get_vip_catalog().get_max_daily_tasks(self.vip_level)
 
     def get_daily_reward(self):
         """Get daily reward amount based on VIP level"""
-        vip_rewards = {
-            'trainee': 50,
-            'V1': 50,
-            'V2': 160,
-            'V3': 520,
-            'V4': 1800,
-            'V5': 6000,
-            'V6': 11700,
-            'V7': 26000,
-            'V8': 52500,
-            'partner': 2600000
-        }
-        return vip_rewards.get(self.vip_level, 50)
+        from src.models.vip_catalog import get_vip_catalog
+        return get_vip_catalog().get_daily_reward(self.vip_level)
 
     def to_dict(self):
         return {
@@ -152,15 +139,31 @@ class User(db.Model):
 
 
 class Transaction(db.Model):
+    __table_args__ = (
+        # Newest-first keyset listings, optionally filtered by status, type or user
+        db.Index('ix_transaction_created', 'created_at', 'id'),
+        db.Index('ix_transaction_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_transaction_type_status_created', 'type', 'status', 'created_at', 'id'),
+        db.Index('ix_transaction_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_transaction_user_type_created', 'user_id', 'type', 'created_at', 'id'),
+        # Per-user totals and history by type and status
+        db.Index('ix_transaction_user_type_status', 'user_id', 'type', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     type = db.Column(db.String(50), nullable=False)  # topup, withdrawal, task_reward, referral_commission
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.Float, nullable=False)  # display mirror of amount_piasters
+    amount_piasters = db.Column(db.BigInteger, nullable=True)  # NULL until the money migration reaches the row
     status = db.Column(db.String(20), default='pending')  # pending, completed, rejected
     description = db.Column(db.Text, nullable=True)
     payment_method = db.Column(db.String(50), nullable=True)
     receipt_url = db.Column(db.String(255), nullable=True)
     admin_notes = db.Column(db.Text, nullable=True)
+    referral_level = db.Column(db.Integer, nullable=True)  # source level of a referral_commission
+    claimed_by = db.Column(db.String(50), nullable=True)  # admin holding the review lease on a pending row
+    claimed_until = db.Column(db.DateTime, nullable=True)
+    decided_at = db.Column(db.DateTime, nullable=True)  # when a topup or withdrawal was approved or rejected
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -176,16 +179,23 @@ class Transaction(db.Model):
             'receipt_url': self.receipt_url,
             'admin_notes': self.admin_notes,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'updated_at': self.updated_at.isoformat(),
+            'decided_at': self.decided_at.isoformat() if self.decided_at else None
         }
 
 
 class UserTask(db.Model):
+    __table_args__ = (
+        db.Index('ix_user_task_user_completed', 'user_id', 'completed_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     task_type = db.Column(db.String(50), default='survey')
-    reward_amount = db.Column(db.Float, nullable=False)
+    reward_amount = db.Column(db.Float, nullable=False)  # display mirror of reward_piasters
+    reward_piasters = db.Column(db.BigInteger, nullable=True)  # NULL until the money migration reaches the row
     completed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    commission_day = db.Column(db.Date, nullable=True)  # day its referral commissions were folded into the roll-ups
 
     def to_dict(self):
         return {
@@ -198,11 +208,19 @@ class UserTask(db.Model):
 
 
 class Referral(db.Model):
+    """Referral closure row: referrer_id is an ancestor of referred_id, level is the depth"""
+    __table_args__ = (
+        # Upline of a user, nearest first
+        db.Index('ix_referral_referred_level', 'referred_id', 'level'),
+        # Team of a user, by level
+        db.Index('ix_referral_referrer_level', 'referrer_id', 'level'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     referrer_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     referred_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    level = db.Column(db.Integer, nullable=False)  # 1, 2, or 3
-    commission_rate = db.Column(db.Float, nullable=False)  # 0.10, 0.03, 0.01
+    level = db.Column(db.Integer, nullable=False)  # 1 up to REFERRAL_MAX_DEPTH
+    commission_rate = db.Column(db.Float, nullable=False)  # from REFERRAL_COMMISSION_RATES
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     def to_dict(self):
@@ -216,6 +234,119 @@ class Referral(db.Model):
         }
 
 
+# Default referral depth and per-level commission rates, overridable through
+# the REFERRAL_MAX_DEPTH and REFERRAL_COMMISSION_RATES app config keys
+DEFAULT_REFERRAL_MAX_DEPTH = 3
+DEFAULT_REFERRAL_COMMISSION_RATES = (0.10, 0.03, 0.01)
+
+# A user's ancestors never change once they are registered, so they can be
+# cached for good; depth and rates come from the app config on every read
+UPLINE_CACHE_SIZE = 100000
+
+
+def get_referral_max_depth():
+    """Get how many levels of the referral tree are tracked"""
+    return current_app.config.get('REFERRAL_MAX_DEPTH', DEFAULT_REFERRAL_MAX_DEPTH)
+
+
+def get_commission_rate(level):
+    """Get the commission rate for a referral level, 0 for levels without a rate"""
+    rates = current_app.config.get('REFERRAL_COMMISSION_RATES', DEFAULT_REFERRAL_COMMISSION_RATES)
+    return rates[level - 1] if 0 < level <= len(rates) else 0.0
+
+
+@lru_cache(maxsize=UPLINE_CACHE_SIZE)
+def get_ancestors(user_id):
+    """Get the user's ancestors as a tuple of (referrer_id, level), nearest first"""
+    rows = db.session.query(
+        Referral.referrer_id, Referral.level
+    ).filter(Referral.referred_id == user_id).order_by(Referral.level).all()
+    return tuple((row.referrer_id, row.level) for row in rows)
+
+
+def get_upline(user_id):
+    """Get the user's upline within the configured depth as a tuple of (referrer_id, level, commission_rate), nearest first"""
+    max_depth = get_referral_max_depth()
+    return tuple(
+        (referrer_id, level, get_commission_rate(level))
+        for referrer_id, level in get_ancestors(user_id) if level <= max_depth
+    )
+
+
+class TeamStats(db.Model):
+    """Rollup of a referrer's team at one level: member count and completed topup total"""
+    referrer_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    level = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    members = db.Column(db.Integer, nullable=False, default=0)
+    topup_piasters = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'referrer_id': self.referrer_id,
+            'level': self.level,
+            'members': self.members,
+            'topup_amount': self.topup_piasters / 100
+        }
+
+
+def add_team_member(user_id):
+    """Count a newly registered user in each ancestor's team, after their Referral rows are written"""
+    members = db.select(Referral.referrer_id, Referral.level, db.literal(1), db.literal(0)).where(
+        Referral.referred_id == user_id
+    )
+    stmt = sqlite_insert(TeamStats).from_select(['referrer_id', 'level', 'members', 'topup_piasters'], members)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TeamStats.referrer_id, TeamStats.level],
+        set_={'members': TeamStats.members + 1}
+    )
+    db.session.execute(stmt)
+
+
+def record_team_topup(user_id, amount_piasters):
+    """Add a completed topup to the team totals of the user's whole upline, in the caller's transaction"""
+    ancestors = get_ancestors(user_id)
+    if not ancestors:
+        return
+    stmt = sqlite_insert(TeamStats)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TeamStats.referrer_id, TeamStats.level],
+        set_={'topup_piasters': TeamStats.topup_piasters + stmt.excluded.topup_piasters}
+    )
+    db.session.execute(stmt, [
+        {'referrer_id': referrer_id, 'level': level, 'members': 0, 'topup_piasters': amount_piasters}
+        for referrer_id, level in ancestors
+    ])
+
+
+def compute_team_stats():
+    """Replace every team rollup with one computed by joining the referral and transaction tables, in the caller's transaction"""
+    topups = db.select(
+        Transaction.user_id,
+        db.func.sum(money_piasters(Transaction.amount_piasters, Transaction.amount)).label('topup_piasters')
+    ).where(
+        Transaction.type == 'topup', Transaction.status == 'completed'
+    ).group_by(Transaction.user_id).subquery()
+
+    rollup = db.select(
+        Referral.referrer_id,
+        Referral.level,
+        db.func.count(Referral.id),
+        db.func.coalesce(db.func.sum(topups.c.topup_piasters), 0)
+    ).outerjoin(topups, topups.c.user_id == Referral.referred_id).group_by(Referral.referrer_id, Referral.level)
+
+    db.session.execute(db.delete(TeamStats))
+    return db.session.execute(
+        db.insert(TeamStats).from_select(['referrer_id', 'level', 'members', 'topup_piasters'], rollup)
+    ).rowcount
+
+
+def rebuild_team_stats():
+    """Recompute every team rollup, returns the row count"""
+    count = compute_team_stats()
+    db.session.commit()
+    return count
+
+
 class VIPPackage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     level = db.Column(db.String(10), unique=True, nullable=False)
@@ -242,3 +373,292 @@ class VIPPackage(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+
+# Transaction types that count as earnings, mapped to their UserEarnings column
+EARNING_COLUMNS = {
+    'task_reward': 'task_earnings_piasters',
+    'referral_commission': 'referral_earnings_piasters'
+}
+
+
+def money_piasters(piasters_column, float_column):
+    """A money amount in piasters, converted on the fly for rows the money migration has not reached"""
+    return db.func.coalesce(piasters_column, db.cast(db.func.round(float_column * 100), db.BigInteger))
+
+
+class UserEarnings(db.Model):
+    """Running earnings totals per user, kept in step with every earning Transaction"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    # The floats are display mirrors of the piaster columns, which are NULL
+    # until the money migration reaches the row
+    task_earnings = db.Column(db.Float, nullable=False, default=0.0)
+    referral_earnings = db.Column(db.Float, nullable=False, default=0.0)
+    total_earnings = db.Column(db.Float, nullable=False, default=0.0)
+    task_earnings_piasters = db.Column(db.BigInteger, nullable=True, default=0)
+    referral_earnings_piasters = db.Column(db.BigInteger, nullable=True, default=0)
+    total_earnings_piasters = db.Column(db.BigInteger, nullable=True, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def get_amount(self, kind):
+        """Get the task, referral or total earnings in pounds, from the piaster column when it is set"""
+        piasters = getattr(self, f'{kind}_earnings_piasters')
+        if piasters is None:
+            return getattr(self, f'{kind}_earnings')
+        return piasters / 100
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'task_earnings': self.get_amount('task'),
+            'referral_earnings': self.get_amount('referral'),
+            'total_earnings': self.get_amount('total'),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+class UserDailyTaskCount(db.Model):
+    """Number of tasks a user completed on a given (UTC) day"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'day': self.day.isoformat(),
+            'count': self.count
+        }
+
+
+def claim_daily_task_slot(user_id, max_tasks, day=None):
+    """Count one task for the user unless they already have max_tasks today, in the caller's transaction.
+
+    The limit check and the increment are a single upsert, so parallel
+    completions for the same user cannot both take the last slot, and no
+    user row is locked. Returns True when a slot was claimed.
+    """
+    if max_tasks <= 0:
+        return False
+    stmt = sqlite_insert(UserDailyTaskCount).values(
+        user_id=user_id,
+        day=day or datetime.utcnow().date(),
+        count=1
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserDailyTaskCount.user_id, UserDailyTaskCount.day],
+        set_={'count': UserDailyTaskCount.count + 1},
+        where=UserDailyTaskCount.count < max_tasks
+    )
+    return db.session.execute(stmt).rowcount == 1
+
+
+def compute_daily_task_counts():
+    """Replace the daily task counters with ones counted from the task history, in the caller's transaction"""
+    day = db.func.date(UserTask.completed_at)
+    counts = db.select(
+        UserTask.user_id,
+        day,
+        db.func.count(UserTask.id)
+    ).group_by(UserTask.user_id, day)
+
+    db.session.execute(db.delete(UserDailyTaskCount))
+    result = db.session.execute(
+        db.insert(UserDailyTaskCount).from_select(['user_id', 'day', 'count'], counts)
+    )
+    return result.rowcount
+
+
+def rebuild_daily_task_counts():
+    """Recompute the daily task counters from the task history, returns the row count"""
+    count = compute_daily_task_counts()
+    db.session.commit()
+    return count
+
+
+def record_earnings(entries):
+    """Add completed earnings to the stored summaries.
+
+    ``entries`` is an iterable of ``(user_id, transaction_type, amount_piasters)``;
+    types that are not earnings are ignored. Amounts are summed per user and
+    applied as one upsert in the caller's transaction, so this must be called
+    wherever a completed task_reward or referral_commission Transaction is written.
+    """
+    totals = {}
+    for user_id, transaction_type, amount_piasters in entries:
+        column = EARNING_COLUMNS.get(transaction_type)
+        if column is None or not amount_piasters:
+            continue
+        row = totals.setdefault(user_id, {'user_id': user_id, 'task_earnings_piasters': 0, 'referral_earnings_piasters': 0})
+        row[column] += amount_piasters
+
+    if not totals:
+        return
+
+    rows = []
+    now = datetime.utcnow()
+    for row in totals.values():
+        row['total_earnings_piasters'] = row['task_earnings_piasters'] + row['referral_earnings_piasters']
+        for kind in ('task', 'referral', 'total'):
+            row[f'{kind}_earnings'] = row[f'{kind}_earnings_piasters'] / 100
+        row['updated_at'] = now
+        rows.append(row)
+
+    stmt = sqlite_insert(UserEarnings)
+    set_ = {'updated_at': stmt.excluded.updated_at}
+    for kind in ('task', 'referral', 'total'):
+        piasters = money_piasters(
+            getattr(UserEarnings, f'{kind}_earnings_piasters'), getattr(UserEarnings, f'{kind}_earnings')
+        ) + stmt.excluded[f'{kind}_earnings_piasters']
+        set_[f'{kind}_earnings_piasters'] = piasters
+        set_[f'{kind}_earnings'] = piasters / 100.0
+    stmt = stmt.on_conflict_do_update(index_elements=[UserEarnings.user_id], set_=set_)
+    db.session.execute(stmt, rows)
+
+
+def compute_user_earnings():
+    """Replace every earnings summary with one computed from the transaction table, in the caller's transaction"""
+    is_completed = Transaction.status == 'completed'
+    amount_piasters = money_piasters(Transaction.amount_piasters, Transaction.amount)
+    task_sum = db.func.sum(db.case(
+        (db.and_(Transaction.type == 'task_reward', is_completed), amount_piasters), else_=0
+    ))
+    referral_sum = db.func.sum(db.case(
+        (db.and_(Transaction.type == 'referral_commission', is_completed), amount_piasters), else_=0
+    ))
+    summary = db.select(
+        Transaction.user_id,
+        task_sum,
+        referral_sum,
+        task_sum + referral_sum,
+        task_sum / 100.0,
+        referral_sum / 100.0,
+        (task_sum + referral_sum) / 100.0,
+        db.func.current_timestamp()
+    ).where(Transaction.type.in_(EARNING_COLUMNS.keys())).group_by(Transaction.user_id)
+
+    db.session.execute(db.delete(UserEarnings))
+    result = db.session.execute(
+        db.insert(UserEarnings).from_select(
+            [
+                'user_id', 'task_earnings_piasters', 'referral_earnings_piasters', 'total_earnings_piasters',
+                'task_earnings', 'referral_earnings', 'total_earnings', 'updated_at'
+            ],
+            summary
+        )
+    )
+    return result.rowcount
+
+
+def rebuild_user_earnings():
+    """Recompute every earnings summary from the transaction table, returns the row count"""
+    count = compute_user_earnings()
+    db.session.commit()
+    return count
+
+
+class UserCounters(db.Model):
+    """Per-user row counts behind the summary and stats screens, kept in step on every write"""
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    topups_completed = db.Column(db.Integer, nullable=False, default=0)
+    withdrawals_completed = db.Column(db.Integer, nullable=False, default=0)
+    transactions_pending = db.Column(db.Integer, nullable=False, default=0)
+    transactions_rejected = db.Column(db.Integer, nullable=False, default=0)
+    tasks_completed = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'user_id': self.user_id,
+            'topups_completed': self.topups_completed,
+            'withdrawals_completed': self.withdrawals_completed,
+            'transactions_pending': self.transactions_pending,
+            'transactions_rejected': self.transactions_rejected,
+            'tasks_completed': self.tasks_completed,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+COUNTER_COLUMNS = ['topups_completed', 'withdrawals_completed', 'transactions_pending', 'transactions_rejected', 'tasks_completed']
+
+
+def _transaction_counts():
+    """Conditional aggregate of the summary counts, one row per user_id"""
+    def count_if(*conditions):
+        return db.func.count(db.case((db.and_(*conditions), 1)))
+
+    return db.select(
+        Transaction.user_id,
+        count_if(Transaction.type == 'topup', Transaction.status == 'completed').label('topups_completed'),
+        count_if(Transaction.type == 'withdrawal', Transaction.status == 'completed').label('withdrawals_completed'),
+        count_if(Transaction.status == 'pending').label('transactions_pending'),
+        count_if(Transaction.status == 'rejected').label('transactions_rejected')
+    ).group_by(Transaction.user_id)
+
+
+def _task_counts():
+    return db.select(
+        UserTask.user_id, db.func.count(UserTask.id).label('tasks_completed')
+    ).group_by(UserTask.user_id)
+
+
+def _counters_select(user_id=None):
+    """Counter rows computed from the transaction and task tables, for one user or all of them"""
+    transactions = _transaction_counts()
+    tasks = _task_counts()
+    users = db.select(User.id)
+    if user_id is not None:
+        transactions = transactions.where(Transaction.user_id == user_id)
+        tasks = tasks.where(UserTask.user_id == user_id)
+        users = users.where(User.id == user_id)
+    transactions = transactions.subquery()
+    tasks = tasks.subquery()
+    users = users.subquery()
+
+    return db.select(
+        users.c.id,
+        *(db.func.coalesce(transactions.c[column], 0) for column in COUNTER_COLUMNS[:4]),
+        db.func.coalesce(tasks.c.tasks_completed, 0),
+        db.func.current_timestamp()
+    ).select_from(users).outerjoin(
+        transactions, transactions.c.user_id == users.c.id
+    ).outerjoin(
+        tasks, tasks.c.user_id == users.c.id
+    ).where(db.true())  # SQLite needs a WHERE before an upsert's ON CONFLICT
+
+
+def bump_user_counters(user_id, **deltas):
+    """Adjust a user's counters in the caller's transaction, e.g. bump_user_counters(1, transactions_pending=1).
+
+    Users without a counter row are left alone: their row is computed in
+    full from the tables the first time it is read.
+    """
+    db.session.execute(
+        db.update(UserCounters).where(UserCounters.user_id == user_id).values({
+            column: getattr(UserCounters, column) + delta for column, delta in deltas.items()
+        }).execution_options(synchronize_session=False)
+    )
+
+
+def get_user_counters(user_id):
+    """Get a user's counters, seeding the row from one aggregate query the first time"""
+    counters = db.session.get(UserCounters, user_id)
+    if counters is None:
+        # One INSERT ... SELECT, so no write can land between the count and the insert
+        db.session.execute(
+            sqlite_insert(UserCounters).from_select(
+                ['user_id', *COUNTER_COLUMNS, 'updated_at'], _counters_select(user_id)
+            ).on_conflict_do_nothing(index_elements=[UserCounters.user_id])
+        )
+        db.session.commit()
+        counters = db.session.get(UserCounters, user_id)
+    return counters
+
+
+def rebuild_user_counters():
+    """Recompute every user's counters from the transaction and task tables, returns the row count"""
+    db.session.execute(db.delete(UserCounters))
+    result = db.session.execute(
+        db.insert(UserCounters).from_select(['user_id', *COUNTER_COLUMNS, 'updated_at'], _counters_select())
+    )
+    db.session.commit()
+    return result.rowcount
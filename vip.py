@@ -1,11 +1,53 @@
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User, VIPPackage, Transaction
+from src.models.passwords import PasswordHashingBusy
+from src.models.vip_catalog import get_vip_catalog
+from src.models.ledger import post_balance_changes, to_piasters, from_piasters, InsufficientBalance, VIP_SALES_ACCOUNT
+from src.routes.cached_responses import build_cached_json, cached_json_response
+from src.routes.idempotency import idempotent
 from datetime import datetime, timedelta
 
 vip_bp = Blueprint('vip', __name__)
 
+# VIP benefits comparison, static so it is serialized once per process
+VIP_BENEFITS = {
+    'trainee': {
+        'daily_tasks': 1,
+        'daily_reward': 50,
+        'monthly_income': 1500,
+        'features': ['مهمة واحدة يومياً', 'مكافأة 50 جنيه', 'دعم أساسي']
+    },
+    'V1': {
+        'daily_tasks': 1,
+        'daily_reward': 50,
+        'monthly_income': 1500,
+        'features': ['مهمة واحدة يومياً', 'مكافأة 50 جنيه', 'دعم متقدم', 'إحصائيات مفصلة']
+    },
+    'V2': {
+        'daily_tasks': 2,
+        'daily_reward': 160,
+        'monthly_income': 4800,
+        'features': ['مهمتان يومياً', 'مكافأة 160 جنيه', 'دعم أولوية', 'تقارير شهرية']
+    },
+    'V3': {
+        'daily_tasks': 4,
+        'daily_reward': 520,
+        'monthly_income': 15600,
+        'features': ['4 مهام يومياً', 'مكافأة 520 جنيه', 'دعم VIP', 'مدير حساب مخصص']
+    }
+}
+
+benefits_response = None
+
+def catalog_response(catalog, key, build):
+    """Get a response body cached on the catalog snapshot, rebuilt whenever the catalog reloads"""
+    cached = catalog.responses.get(key)
+    if cached is None:
+        cached = catalog.responses[key] = build_cached_json(build())
+    return cached
+
 def initialize_vip_packages():
-    """Initialize VIP packages if they don't exist"""
+    """Initialize VIP packages if they don't exist, called once at startup"""
     if VIPPackage.query.count() == 0:
         packages = [
             {
@@ -101,13 +143,9 @@ def initialize_vip_packages():
 def get_vip_packages():
     """Get all available VIP packages"""
     try:
-        initialize_vip_packages()
-        
-        packages = VIPPackage.query.filter_by(is_active=True).order_by(VIPPackage.price).all()
-        
-        return jsonify({
-            'packages': [p.to_dict() for p in packages]
-        }), 200
+        catalog = get_vip_catalog()
+        cached = catalog_response(catalog, 'packages', lambda: {'packages': catalog.packages})
+        return cached_json_response(cached)
         
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في جلب باقات VIP'}), 500
@@ -116,19 +154,20 @@ def get_vip_packages():
 def get_vip_package(level):
     """Get specific VIP package details"""
     try:
-        package = VIPPackage.query.filter_by(level=level, is_active=True).first()
+        catalog = get_vip_catalog()
+        package = catalog.get_package(level)
         
         if not package:
             return jsonify({'error': 'الباقة غير موجودة'}), 404
         
-        return jsonify({
-            'package': package.to_dict()
-        }), 200
+        cached = catalog_response(catalog, ('package', level), lambda: {'package': package})
+        return cached_json_response(cached)
         
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في جلب تفاصيل الباقة'}), 500
 
 @vip_bp.route('/subscribe', methods=['POST'])
+@idempotent
 def subscribe_to_vip():
     """Subscribe to a VIP package"""
     if 'user_id' not in session:
@@ -152,7 +191,7 @@ def subscribe_to_vip():
             return jsonify({'error': 'كلمة مرور الدفع غير صحيحة'}), 400
         
         # Get package details
-        package = VIPPackage.query.filter_by(level=level, is_active=True).first()
+        package = get_vip_catalog().get_package(level)
         if not package:
             return jsonify({'error': 'الباقة غير موجودة'}), 404
         
@@ -164,12 +203,12 @@ def subscribe_to_vip():
         if new_index <= current_index and user.vip_level != 'trainee':
             return jsonify({'error': 'لديك باقة أعلى أو مساوية لهذه الباقة'}), 400
         
-        # Check if user has sufficient balance
-        if user.balance < package.price:
-            return jsonify({'error': 'الرصيد غير كافي لشراء هذه الباقة'}), 400
+        price_piasters = to_piasters(package['price'])
         
-        # Deduct amount from balance
-        user.balance -= package.price
+        # Check if user has sufficient balance, balance_piasters is NULL until the money migration reaches the user
+        balance_piasters = user.balance_piasters if user.balance_piasters is not None else to_piasters(user.balance)
+        if balance_piasters < price_piasters:
+            return jsonify({'error': 'الرصيد غير كافي لشراء هذه الباقة'}), 400
         
         # Update user VIP level
         user.vip_level = level
@@ -179,20 +218,30 @@ def subscribe_to_vip():
         transaction = Transaction(
             user_id=user.id,
             type='vip_subscription',
-            amount=-package.price,  # Negative because it's a deduction
+            amount=-from_piasters(price_piasters),  # Negative because it's a deduction
+            amount_piasters=-price_piasters,
             status='completed',
-            description=f'اشتراك في باقة {package.name}'
+            description=f'اشتراك في باقة {package["name"]}'
         )
         db.session.add(transaction)
+        db.session.flush()
+        
+        # Deduct amount from balance, unless a concurrent debit got there first
+        post_balance_changes('vip_subscription', VIP_SALES_ACCOUNT, [(user.id, -price_piasters, transaction.id)])
         
         db.session.commit()
         
         return jsonify({
-            'message': f'تم الاشتراك في {package.name} بنجاح!',
+            'message': f'تم الاشتراك في {package["name"]} بنجاح!',
             'user': user.to_dict(),
             'transaction': transaction.to_dict()
         }), 200
         
+    except InsufficientBalance:
+        db.session.rollback()
+        return jsonify({'error': 'الرصيد غير كافي لشراء هذه الباقة'}), 400
+    except PasswordHashingBusy:
+        raise  # answered with a 503 by the app's errorhandler
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'حدث خطأ في الاشتراك'}), 500
@@ -210,7 +259,7 @@ def get_current_vip():
         
         current_package = None
         if user.vip_level != 'trainee':
-            current_package = VIPPackage.query.filter_by(level=user.vip_level).first()
+            current_package = get_vip_catalog().get_package(user.vip_level, active_only=False)
         
         # Check if VIP is expired
         is_expired = False
@@ -225,7 +274,7 @@ def get_current_vip():
             'current_level': user.vip_level,
             'vip_expiry': user.vip_expiry.isoformat() if user.vip_expiry else None,
             'is_expired': is_expired,
-            'current_package': current_package.to_dict() if current_package else None,
+            'current_package': current_package,
             'max_daily_tasks': user.get_max_daily_tasks(),
             'daily_reward': user.get_daily_reward()
         }), 200
@@ -236,36 +285,11 @@ def get_current_vip():
 @vip_bp.route('/benefits', methods=['GET'])
 def get_vip_benefits():
     """Get VIP benefits comparison"""
+    global benefits_response
     try:
-        benefits = {
-            'trainee': {
-                'daily_tasks': 1,
-                'daily_reward': 50,
-                'monthly_income': 1500,
-                'features': ['مهمة واحدة يومياً', 'مكافأة 50 جنيه', 'دعم أساسي']
-            },
-            'V1': {
-                'daily_tasks': 1,
-                'daily_reward': 50,
-                'monthly_income': 1500,
-                'features': ['مهمة واحدة يومياً', 'مكافأة 50 جنيه', 'دعم متقدم', 'إحصائيات مفصلة']
-            },
-            'V2': {
-                'daily_tasks': 2,
-                'daily_reward': 160,
-                'monthly_income': 4800,
-                'features': ['مهمتان يومياً', 'مكافأة 160 جنيه', 'دعم أولوية', 'تقارير شهرية']
-            },
-            'V3': {
-                'daily_tasks': 4,
-                'daily_reward': 520,
-                'monthly_income': 15600,
-                'features': ['4 مهام يومياً', 'مكافأة 520 جنيه', 'دعم VIP', 'مدير حساب مخصص']
-            }
-        }
-        
-        return jsonify({'benefits': benefits}), 200
+        if benefits_response is None:
+            benefits_response = build_cached_json({'benefits': VIP_BENEFITS})
+        return cached_json_response(benefits_response)
         
     except Exception as e:
         return jsonify({'error': 'حدث خطأ في جلب مزايا VIP'}), 500
-
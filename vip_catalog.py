@@ -0,0 +1,120 @@
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from src.models.user import VIPPackage
+import os
+import threading
+import time
+
+# Limits for users without a package (trainee, or a level missing from the table)
+DEFAULT_DAILY_TASKS = 1
+DEFAULT_DAILY_REWARD = 50
+
+# How often a worker checks the stamp file for edits made by other workers
+DEFAULT_CHECK_INTERVAL = 1  # seconds
+
+_catalog = None
+_lock = threading.Lock()
+
+
+class VIPCatalog:
+    """Immutable snapshot of the VIPPackage table"""
+
+    def __init__(self, packages, stamp):
+        self.stamp = stamp
+        self.by_level = {p['level']: p for p in packages}
+        self.packages = sorted((p for p in packages if p['is_active']), key=lambda p: p['price'])
+        # Serialized responses built from this snapshot, see vip routes
+        self.responses = {}
+        self.loaded_at = time.monotonic()
+        self.checked_at = self.loaded_at
+
+    def get_package(self, level, active_only=True):
+        """Get a package dict by level, None if there is none"""
+        package = self.by_level.get(level)
+        if package is None or (active_only and not package['is_active']):
+            return None
+        return package
+
+    def get_max_daily_tasks(self, level):
+        package = self.by_level.get(level)
+        return package['daily_tasks'] if package else DEFAULT_DAILY_TASKS
+
+    def get_daily_reward(self, level):
+        package = self.by_level.get(level)
+        return package['daily_reward'] if package else DEFAULT_DAILY_REWARD
+
+
+def _stamp_path():
+    return current_app.config.get('VIP_CATALOG_STAMP_FILE')
+
+
+def _read_stamp():
+    """Get the current invalidation stamp shared by all workers"""
+    path = _stamp_path()
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_vip_catalog():
+    """Load the catalog from the database, replacing this process's copy"""
+    global _catalog
+    with _lock:
+        stamp = _read_stamp()
+        packages = [p.to_dict() for p in VIPPackage.query.all()]
+        _catalog = VIPCatalog(packages, stamp)
+        return _catalog
+
+
+def get_vip_catalog():
+    """Get this process's catalog, reloading it only after an invalidation.
+
+    In steady state this does no database work: other workers' edits are
+    noticed by checking the stamp file's mtime at most once per
+    VIP_CATALOG_CHECK_INTERVAL.
+    """
+    catalog = _catalog
+    if catalog is None:
+        return load_vip_catalog()
+
+    now = time.monotonic()
+    if now - catalog.checked_at >= current_app.config.get('VIP_CATALOG_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL):
+        catalog.checked_at = now
+        if _read_stamp() != catalog.stamp:
+            return load_vip_catalog()
+    return catalog
+
+
+def invalidate_vip_catalog():
+    """Drop the cached catalog here and signal every other worker to reload"""
+    global _catalog
+    path = _stamp_path()
+    if path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(str(time.time_ns()))
+    with _lock:
+        _catalog = None
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_vip_package_changes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, VIPPackage):
+            session.info['vip_catalog_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_vip_package_commit(session):
+    if session.info.pop('vip_catalog_changed', False):
+        invalidate_vip_catalog()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_rolled_back_vip_package_changes(session):
+    session.info.pop('vip_catalog_changed', None)